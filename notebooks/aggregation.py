@@ -0,0 +1,170 @@
+"""Breakdowns of the held rows computed in shards across worker processes.
+
+The financial page rolls billing and stay up by hospital, insurer and
+condition (its billing trend comes from the daily series, timeseries.py).
+With tens of thousands of hospitals the cube has about as many cells as
+there are rows, so these roll-ups are row-sized groupbys.
+Here the key columns are held as integer codes and the measures as
+float64. Both are written once per data version to memory-mapped column
+files that the worker processes open read-only. Each worker sums counts
+and measures per code over its shard of the selected rows with
+``np.bincount``; the parent adds the partial sums. Missing measures are
+left out of their sums and of their own non-missing counts, so means skip
+them as pandas does.
+
+Below ``min_rows`` selected rows, or with a single worker, the same shard
+function runs in-process on the frame's own arrays.
+"""
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cube import MEASURES
+
+KEYS = ['hospital', 'insurance_provider', 'medical_condition']
+# Fewer selected rows than this are aggregated in-process
+PARALLEL_MIN_ROWS = 1_000_000
+
+# Memory maps opened by a worker process, by path
+_MAPS = {}
+
+
+def _column(spec):
+    if isinstance(spec, np.ndarray):
+        return spec
+    path, dtype, length = spec
+    data = _MAPS.get(path)
+    if data is None:
+        data = _MAPS[path] = np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+    return data
+
+
+def _partial(task):
+    """Counts and measure sums per key code over one shard of rows.
+
+    ``rows`` are positions, a slice, or None for all rows. Code 0 stands for
+    a missing key. Returns {key: (codes + 1) x (count, sums..., non-missing
+    counts...) array} and the shard totals under the key None.
+    """
+    columns, sizes, keys, rows = task
+    measures, present = [], []
+    for m in MEASURES:
+        values = _column(columns[m])[rows] if rows is not None else np.asarray(_column(columns[m]))
+        valid = ~np.isnan(values)
+        measures.append(np.where(valid, values, 0.0))
+        present.append(valid.astype('float64'))
+    weights = measures + present
+    result = {None: np.array([len(measures[0])] + [values.sum() for values in weights], dtype='float64')}
+    for key in keys:
+        codes = _column(columns[key])
+        codes = (codes[rows] if rows is not None else np.asarray(codes)).astype(np.intp) + 1
+        size = sizes[key] + 1
+        table = np.empty((size, 1 + len(weights)))
+        table[:, 0] = np.bincount(codes, minlength=size)
+        for i, values in enumerate(weights):
+            table[:, i + 1] = np.bincount(codes, weights=values, minlength=size)
+        result[key] = table
+    return result
+
+
+def _codes(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    codes, uniques = pd.factorize(values)
+    return codes, pd.Index(uniques)
+
+
+class ShardedAggregator:
+    def __init__(self, df, workers=None, min_rows=PARALLEL_MIN_ROWS, keys=KEYS):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self.keys = [k for k in keys if k in df.columns]
+        self._pool = None
+        self._files = None
+        self.update(df)
+
+    def update(self, df):
+        """Point at a new version of the frame (e.g. after a batch)."""
+        self.columns = {m: df[m].to_numpy(dtype='float64') for m in MEASURES}
+        self.categories = {}
+        for key in self.keys:
+            self.columns[key], self.categories[key] = _codes(df[key])
+        self.n = len(df)
+        # Column files are rewritten lazily for the next parallel call
+        self._close_files()
+
+    def _column_files(self):
+        if self._files is None:
+            self._files = tempfile.TemporaryDirectory(prefix='aggregation-')
+            self._specs = {}
+            for name, values in self.columns.items():
+                path = os.path.join(self._files.name, f'{name}.bin')
+                values = np.ascontiguousarray(values)
+                values.tofile(path)
+                self._specs[name] = (path, values.dtype.str, len(values))
+        return self._specs
+
+    def _close_files(self):
+        if self._files is not None:
+            self._files.cleanup()
+            self._files = None
+
+    def close(self):
+        self._close_files()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _shards(self, rows):
+        n = self.n if rows is None else len(rows)
+        if self.workers <= 1 or n < self.min_rows:
+            yield _partial((self.columns, self._sizes(), self.keys, rows))
+            return
+        if self._pool is None:
+            # Spawned, not forked: the dashboard process runs threads
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        specs = self._column_files()
+        bounds = np.linspace(0, n, self.workers + 1).astype(np.int64)
+        # Without a selection each worker reads a plain row range of the files
+        shards = [slice(lo, hi) if rows is None else rows[lo:hi] for lo, hi in zip(bounds, bounds[1:])]
+        tasks = [(specs, self._sizes(), self.keys, shard) for shard in shards]
+        yield from self._pool.map(_partial, tasks)
+
+    def _sizes(self):
+        return {key: len(self.categories[key]) for key in self.keys}
+
+    def aggregate(self, rows=None):
+        """Totals and per-key breakdowns over the given row positions (all if None).
+
+        Returns (totals, breakdowns): totals holds 'count', '<measure>_sum',
+        '<measure>_count' (rows with the measure) and '<measure>_mean';
+        breakdowns maps each key to a frame with the same columns, one row
+        per key value present.
+        """
+        merged = None
+        for part in self._shards(rows):
+            merged = part if merged is None else {k: merged[k] + v for k, v in part.items()}
+        columns = ['count'] + [f'{m}_sum' for m in MEASURES] + [f'{m}_count' for m in MEASURES]
+        totals = dict(zip(columns, merged[None]))
+        for col in ['count'] + [f'{m}_count' for m in MEASURES]:
+            totals[col] = int(totals[col])
+        for m in MEASURES:
+            n = totals[f'{m}_count']
+            totals[f'{m}_mean'] = totals[f'{m}_sum'] / n if n else np.nan
+        breakdowns = {}
+        for key in self.keys:
+            table = merged[key]
+            present = np.flatnonzero(table[:, 0] > 0)
+            index = self.categories[key].take(present - 1, allow_fill=True, fill_value=np.nan)
+            out = pd.DataFrame(table[present], index=index.rename(key), columns=columns)
+            for col in ['count'] + [f'{m}_count' for m in MEASURES]:
+                out[col] = out[col].astype('int64')
+            for m in MEASURES:
+                # Missing (NaN) for a key without any values of the measure
+                out[f'{m}_mean'] = out[f'{m}_sum'] / out[f'{m}_count'].where(out[f'{m}_count'] > 0)
+            breakdowns[key] = out.sort_index()
+        return totals, breakdowns
@@ -0,0 +1,92 @@
+"""Page aggregates of the pandas path against the lazy Polars engine.
+
+    python bench_engines.py --rows 100000 1000000 10000000
+    python bench_engines.py --parquet healthcare_dataset_parquet --repeat 5
+
+Each size runs on a synthetic dataset, generated as bench_suite.py does,
+or on --parquet. For each page and a few representative filter states, the
+aggregates the page draws (``page_figures.page_inputs``) are computed by
+the pandas path (cube, SQL counts, daily series and sharded breakdowns,
+with the store's result cache cleared) and by the page's lazy Polars plan;
+both are checked to agree. Building the store and the Polars frame is
+timed once per size. Polars runs on ``pl.thread_pool_size()`` threads.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+import bench_suite
+import page_figures
+import synthetic
+from storage import load_parquet
+from store import DASHBOARD_COLUMNS, DataStore
+
+STATES = ['all/all/all', 'quarter/female/all', 'month/male/all', 'year/all/largest']
+PAGES = ['general', 'clinical', 'financial']
+
+
+def matches(expected, actual, rtol=1e-9):
+    """Whether two page inputs hold the same keys, labels and values."""
+    if isinstance(expected, dict):
+        return expected.keys() == actual.keys() and all(matches(expected[k], actual[k], rtol) for k in expected)
+    if isinstance(expected, (pd.Series, pd.DataFrame)):
+        if not expected.index.astype(str).equals(actual.index.astype(str)):
+            return False
+        if isinstance(expected, pd.DataFrame) and list(expected.columns) != list(actual.columns):
+            return False
+        return np.allclose(expected.to_numpy(dtype='float64'), actual.to_numpy(dtype='float64'),
+                           rtol=rtol, equal_nan=True)
+    if expected is None or actual is None:
+        return expected is actual
+    return bool(np.isclose(expected, actual, rtol=rtol, equal_nan=True))
+
+
+def run(path, repeat, freq):
+    seconds, store = bench_suite._timed(lambda: DataStore(load_parquet(path, DASHBOARD_COLUMNS)), 1)
+    print(f"{len(store.df):>12,}  {'(build store)':<36}{seconds * 1e3:>10.0f}")
+    seconds, _ = bench_suite._timed(lambda: store.lazy, 1)
+    print(f"{len(store.df):>12,}  {'(build polars frame)':<36}{'':>10}{seconds * 1e3:>10.0f}")
+
+    states = bench_suite.navigation_states(store)
+    for state in STATES:
+        for page in PAGES:
+            filters = states[state]
+            # Hospitals are only filtered on the financial page
+            if page != 'financial' and 'hospital' in filters:
+                continue
+            store.engine = 'pandas'
+            pandas_seconds, expected = bench_suite._timed(
+                lambda: page_figures.page_inputs(store, page, filters, freq), repeat, store.cache.clear)
+            store.engine = 'polars'
+            polars_seconds, actual = bench_suite._timed(
+                lambda: page_figures.page_inputs(store, page, filters, freq), repeat)
+            check = 'ok' if matches(expected, actual) else 'MISMATCH'
+            print(f"{len(store.df):>12,}  {page + ' ' + state:<36}{pandas_seconds * 1e3:>10.1f}"
+                  f"{polars_seconds * 1e3:>10.1f}{pandas_seconds / polars_seconds:>9.2f}x  {check}")
+    store.aggregator.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=bench_suite.DEFAULT_SIZES)
+    parser.add_argument('--parquet', help='benchmark this dataset instead of synthetic ones')
+    parser.add_argument('--data-dir', default=bench_suite.DATA_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--hospitals', type=int, default=synthetic.HOSPITALS)
+    parser.add_argument('--freq', default='M', choices=['D', 'W', 'M', 'Q'], help='trend granularity')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    paths = [args.parquet] if args.parquet else [
+        bench_suite.dataset(rows, args.data_dir, args.seed, args.hospitals) for rows in args.rows
+    ]
+    print(f"polars on {pl.thread_pool_size()} threads")
+    print(f"{'rows':>12}  {'page and filter state':<36}{'pandas ms':>10}{'polars ms':>10}{'speedup':>10}")
+    for path in paths:
+        run(path, args.repeat, args.freq)
+
+
+if __name__ == '__main__':
+    main()
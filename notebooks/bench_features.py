@@ -0,0 +1,83 @@
+"""Build time and size of the feature matrices against the dense encoded CSV.
+
+    python bench_features.py --parquet healthcare_dataset_parquet --workers 4
+
+``dense csv`` renders the notebook's encoded frame (pd.get_dummies with
+drop_first=True over all columns) as CSV, file by file, as pipeline.py
+writes healthcare_dataset_encoded.csv. The feature builder (features.py)
+then runs on a copy of the dataset: with an empty cache on one and on
+--workers processes, again on the unchanged dataset, after a batch of
+--batch-rows admissions is appended, and with the dense uint8 layout.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import features
+from preprocessing import DUMMY_COLS, dummies
+from storage import PARQUET_PATH, PARTITION_COL, append_parquet
+
+
+def dense_csv(parquet_path, out_path):
+    """Write the dataset's get_dummies frame as CSV; returns the rows written."""
+    dataset = ds.dataset(parquet_path, format='parquet', partitioning='hive')
+    categories = {
+        col: sorted(set(dataset.to_table(columns=[col])[col].to_pandas().astype(str).unique()))
+        for col in DUMMY_COLS
+    }
+    rows = 0
+    with open(out_path, 'w', newline='') as f:
+        for i, path in enumerate(sorted(dataset.files)):
+            df = pq.read_table(path).to_pandas()
+            for col in DUMMY_COLS:
+                df[col] = df[col].astype(str)
+            f.write(dummies(df, categories).to_csv(header=i == 0, index=False))
+            rows += len(df)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-rows', type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, 'data')
+        shutil.copytree(args.parquet, data)
+        out, cache = os.path.join(tmp, 'features'), os.path.join(tmp, 'cache')
+
+        print(f"{'case':<28}{'rows':>12}{'seconds':>10}{'encoded':>10}{'MB':>10}{'vs csv':>8}")
+        start = time.perf_counter()
+        rows = dense_csv(data, os.path.join(tmp, 'encoded.csv'))
+        seconds = time.perf_counter() - start
+        csv_bytes = os.path.getsize(os.path.join(tmp, 'encoded.csv'))
+        os.remove(os.path.join(tmp, 'encoded.csv'))
+        print(f"{'dense csv':<28}{rows:>12,}{seconds:>10.2f}{'':>10}{csv_bytes / 1e6:>10.1f}{1:>8.2f}")
+
+        def run(case, **kwargs):
+            result = features.build(data, out, cache, **kwargs)
+            encoded = 'reused' if result['reused'] else f"{result['encoded']}/{result['files']}"
+            print(f"{case:<28}{result['rows']:>12,}{result['seconds']:>10.2f}{encoded:>10}"
+                  f"{result['bytes'] / 1e6:>10.1f}{result['bytes'] / csv_bytes:>8.2f}")
+
+        run('csr, 1 worker', workers=1)
+        shutil.rmtree(cache)
+        shutil.rmtree(out)
+        run(f'csr, {args.workers} workers', workers=args.workers)
+        run('csr, unchanged', workers=args.workers)
+        files = sorted(ds.dataset(data, format='parquet', partitioning='hive').files)
+        batch = pq.read_table(files[0]).to_pandas().head(args.batch_rows).drop(columns=[PARTITION_COL], errors='ignore')
+        append_parquet(batch, data)
+        run(f'csr, +{len(batch):,} rows', workers=args.workers)
+        run('dense uint8', dense=True, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
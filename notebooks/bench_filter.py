@@ -0,0 +1,85 @@
+"""Filter latency of the row index against full boolean-mask scans.
+
+    python bench_filter.py --parquet healthcare_dataset_parquet --sizes 100000 1000000 10000000
+
+For each size the dataset is resampled to that many rows and sorted by
+admission date, as the store holds it. Each filter state is resolved by a
+mask over every row (the previous sidebar code) and by ``RowIndex.select``;
+the positions are checked to be identical.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_sql import scale_dataset
+from row_index import RowIndex
+from storage import PARQUET_PATH, load_parquet
+
+FILTER_COLUMNS = ['date_of_admission', 'gender', 'hospital']
+DEFAULT_SIZES = [100_000, 1_000_000, 10_000_000]
+
+
+def scan(df, start=None, end=None, gender=None, hospital=None):
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (df['date_of_admission'] >= start).to_numpy()
+    if end is not None:
+        mask &= (df['date_of_admission'] <= end).to_numpy()
+    if gender is not None:
+        mask &= (df['gender'] == gender).to_numpy()
+    if hospital is not None:
+        mask &= (df['hospital'] == hospital).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def filter_states(df):
+    dates = df['date_of_admission']
+    start = dates.min() + (dates.max() - dates.min()) * 0.4
+    start, end = start.normalize(), (start + pd.Timedelta(days=90)).normalize()
+    gender = df['gender'].mode()[0]
+    hospital = df['hospital'].mode()[0]
+    return {
+        'quarter': {'start': start, 'end': end},
+        'quarter+gender': {'start': start, 'end': end, 'gender': gender},
+        'all+gender': {'gender': gender},
+        'quarter+gender+hospital': {'start': start, 'end': end, 'gender': gender, 'hospital': hospital},
+    }
+
+
+def _timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    source = load_parquet(args.parquet, FILTER_COLUMNS)
+    print(f"{'rows':>12}  {'filter':<25}{'matches':>10}{'scan ms':>10}{'index ms':>10}{'speedup':>9}")
+    for size in args.sizes:
+        df = scale_dataset(source, size).sort_values('date_of_admission', kind='stable', ignore_index=True)
+        build, index = _timed(lambda: RowIndex(df), 1)
+        print(f"{size:>12,}  {'(build index)':<25}{'':>10}{'':>10}{build * 1e3:>10.1f}")
+        for name, filters in filter_states(df).items():
+            scan_seconds, expected = _timed(lambda: scan(df, **filters), args.repeat)
+            index_seconds, actual = _timed(lambda: index.select(**filters), args.repeat)
+            if not np.array_equal(expected, actual):
+                raise AssertionError(f'{name}: index and scan disagree at {size:,} rows')
+            print(f"{size:>12,}  {name:<25}{len(actual):>10,}{scan_seconds * 1e3:>10.2f}"
+                  f"{index_seconds * 1e3:>10.3f}{scan_seconds / index_seconds:>8.0f}x")
+        del index, df
+
+
+if __name__ == '__main__':
+    main()
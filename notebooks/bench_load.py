@@ -0,0 +1,270 @@
+"""Rerun latency and throughput of a dashboard server against concurrent users.
+
+    python bench_load.py --data /path/to/data_dir --users 1 4 16 32 --actions 20
+
+A local ``streamlit run`` server is started on the app (working directory
+--data, where it finds the Parquet dataset) and driven by scripted
+clients speaking Streamlit's websocket protocol, one thread each, like
+browsers would: every rerun sends the session's widget values and reads
+the server's messages until the script run finishes.
+
+A user opens the dashboard and then makes --actions random changes, each
+one rerun of the app: switching pages, picking another date range, gender
+or (on the financial page) hospital, waiting --think seconds on average
+between them. For each number of users reported are the p50/p95/p99 rerun
+latency (request sent to run finished), the reruns per second over the
+level's wall time, and the growth of the server's RSS per session.
+
+Clients and server share the host, so on few cores the clients' parsing
+competes with the server. Requires psutil and websockets.
+"""
+import argparse
+import datetime
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+from bench_sessions import memory_mb
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'healthcare_dashboard.py')
+PAGES = ["🏠 Home", "📊 General Analysis", "🏥 Clinical Analysis", "💰 Financial Analysis"]
+ACTIONS = ['page', 'dates', 'gender', 'hospital']
+DEFAULT_USERS = [1, 2, 4, 8, 16]
+# delta_path root of st.sidebar elements
+SIDEBAR = 1
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, data, port, timeout):
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', app, '--server.headless=true', f'--server.port={port}',
+         '--server.address=127.0.0.1', '--browser.gatherUsageStats=false', '--server.fileWatcherType=none'],
+        cwd=data, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.2)
+        if proc.poll() is not None:
+            break
+    proc.kill()
+    raise RuntimeError('the dashboard server did not start')
+
+
+class Session:
+    """One browser-like session of a dashboard server.
+
+    Keeps the values it set on widgets and sends them with every rerun;
+    ``widgets`` holds the sidebar's radio, selectbox and date input
+    elements of the last run, by type.
+    """
+
+    def __init__(self, port, timeout):
+        from websockets.sync.client import connect
+        self.timeout = timeout
+        self.widgets = {}
+        self.errors = []
+        self.states = {}
+        self.page = PAGES[0]
+        self.ws = connect(f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'],
+                          max_size=None, open_timeout=timeout)
+
+    def set_value(self, widget, kind, value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        state = WidgetState(id=widget.id)
+        if kind == 'date_input':
+            state.string_array_value.data[:] = [day.isoformat() for day in value]
+        else:
+            state.string_value = value
+        self.states[widget.id] = state
+
+    def rerun(self):
+        """Run the app with the set widget values; returns seconds to the end of the run."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        start = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        elements = {}
+        while True:
+            forward = ForwardMsg.FromString(self.ws.recv(timeout=self.timeout))
+            if forward.HasField('script_finished'):
+                break
+            if forward.HasField('delta') and forward.delta.WhichOneof('type') == 'new_element':
+                elements[tuple(forward.metadata.delta_path)] = forward.delta.new_element
+        seconds = time.perf_counter() - start
+
+        self.widgets = {'radio': [], 'selectbox': [], 'date_input': []}
+        self.errors = []
+        for path, element in sorted(elements.items()):
+            kind = element.WhichOneof('type')
+            if kind == 'exception':
+                self.errors.append(element.exception.message)
+            elif kind in self.widgets and path[0] == SIDEBAR:
+                self.widgets[kind].append(getattr(element, kind))
+        # Widgets that are gone would be dropped by a browser too
+        ids = {w.id for widgets in self.widgets.values() for w in widgets}
+        self.states = {key: state for key, state in self.states.items() if key in ids}
+        return seconds
+
+    def __enter__(self):
+        self.ws.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self.ws.__exit__(*exc)
+
+
+def _date(text):
+    return datetime.date.fromisoformat(text.replace('/', '-'))
+
+
+def random_action(session, rng):
+    """Change one random widget of a session's page; returns the action."""
+    widgets = session.widgets
+    action = rng.choice(ACTIONS)
+    if action == 'page' or not widgets['date_input']:
+        session.page = rng.choice([p for p in PAGES if p != session.page])
+        session.set_value(widgets['radio'][0], 'radio', session.page)
+        return 'page'
+    if action == 'dates':
+        widget = widgets['date_input'][0]
+        lo, hi = _date(widget.min), _date(widget.max)
+        start = lo + datetime.timedelta(days=rng.randrange((hi - lo).days + 1))
+        end = start + datetime.timedelta(days=rng.randrange((hi - start).days + 1))
+        session.set_value(widget, 'date_input', (start, end))
+        return 'dates'
+    # Gender is the first selectbox; hospital the second, on the financial page only
+    if action == 'hospital' and len(widgets['selectbox']) > 1:
+        widget = widgets['selectbox'][1]
+        action = 'hospital'
+    else:
+        widget, action = widgets['selectbox'][0], 'gender'
+    session.set_value(widget, 'selectbox', rng.choice(widget.options))
+    return action
+
+
+def run_user(port, timeout, actions, think, seed, ready, start, done, out):
+    # One session: opened before the level starts, then ``actions`` timed reruns;
+    # it stays open until ``done``, so the server's RSS is measured with it
+    rng = random.Random(seed)
+    latencies, errors = out['latencies'], out['errors'] = [], []
+    released = False
+    try:
+        with Session(port, timeout) as session:
+            session.rerun()
+            ready.release()
+            released = True
+            start.wait()
+            try:
+                for _ in range(actions):
+                    random_action(session, rng)
+                    latencies.append(session.rerun())
+                    errors += session.errors
+                    if think:
+                        time.sleep(rng.expovariate(1 / think))
+            except Exception as exc:
+                errors.append(repr(exc))
+            out['finished'] = time.perf_counter()
+            done.wait()
+    except Exception as exc:
+        errors.append(repr(exc))
+    finally:
+        if not released:
+            ready.release()
+
+
+def run_level(server, port, users, actions, think, timeout, seed):
+    before = memory_mb(server.pid)['rss']
+    ready, start, done = threading.Semaphore(0), threading.Event(), threading.Event()
+    results = [{} for _ in range(users)]
+    threads = [
+        threading.Thread(target=run_user,
+                         args=(port, timeout, actions, think, seed + i, ready, start, done, results[i]))
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        ready.acquire()
+    began = time.perf_counter()
+    start.set()
+    while any(thread.is_alive() and 'finished' not in result for thread, result in zip(threads, results)):
+        time.sleep(0.05)
+    seconds = max([r['finished'] for r in results if 'finished' in r], default=time.perf_counter()) - began
+    after = memory_mb(server.pid)['rss']
+    done.set()
+    for thread in threads:
+        thread.join()
+    latencies = np.array([t for r in results for t in r.get('latencies', [])]) * 1e3
+    percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [np.nan] * 3
+    return {
+        'users': users,
+        'reruns': len(latencies),
+        'p50': percentiles[0], 'p95': percentiles[1], 'p99': percentiles[2],
+        'throughput': len(latencies) / seconds,
+        'mb_per_session': (after - before) / users,
+        'errors': [e for r in results for e in r.get('errors', [])],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=APP_PATH)
+    parser.add_argument('--data', default='.', help='directory holding the dataset')
+    parser.add_argument('--users', type=int, nargs='+', default=DEFAULT_USERS)
+    parser.add_argument('--actions', type=int, default=20, help='reruns per user')
+    parser.add_argument('--think', type=float, default=0.0, help="mean seconds between a user's actions")
+    parser.add_argument('--port', type=int, help='server port (default: a free one)')
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    port = args.port or free_port()
+    started = time.perf_counter()
+    server = start_server(os.path.abspath(args.app), args.data, port, args.timeout)
+    try:
+        # A first session waits for the store and warms every page's default view
+        with Session(port, args.timeout) as warm:
+            warm.rerun()
+            for page in PAGES[1:]:
+                warm.set_value(warm.widgets['radio'][0], 'radio', page)
+                warm.rerun()
+            if warm.errors:
+                raise RuntimeError(warm.errors[0])
+        print(f"server ready in {time.perf_counter() - started:.1f}s, {memory_mb(server.pid)['rss']:,.0f} MB RSS")
+
+        print(f"{'users':>6}{'reruns':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'reruns/s':>10}"
+              f"{'MB/session':>12}{'errors':>8}")
+        for users in args.users:
+            r = run_level(server, port, users, args.actions, args.think, args.timeout, args.seed)
+            print(f"{r['users']:>6}{r['reruns']:>8}{r['p50']:>9.0f}{r['p95']:>9.0f}{r['p99']:>9.0f}"
+                  f"{r['throughput']:>10.1f}{r['mb_per_session']:>12.1f}{len(r['errors']):>8}")
+            for error in sorted(set(r['errors']))[:3]:
+                print(f"      {error}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Scaling of the sharded financial breakdowns with the number of workers.
+
+    python bench_parallel.py --parquet healthcare_dataset_parquet --rows 20000000 --workers 1 2 4 8
+
+The dataset is resampled to --rows rows and its hospitals are split into
+--hospitals distinct names, so the breakdowns have the cardinality of a
+large network. The pandas column is the groupby the financial page ran per
+key; each worker count is timed after a warm-up call (pool start-up and
+column files excluded), and its breakdowns are checked against pandas.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregation import KEYS, ShardedAggregator
+from bench_sql import scale_dataset
+from cube import MEASURES
+from storage import PARQUET_PATH, load_parquet
+
+BENCH_COLUMNS = ['date_of_admission', 'hospital', 'insurance_provider', 'medical_condition'] + MEASURES
+
+
+def make_dataset(parquet_path, rows, hospitals, seed=0):
+    df = scale_dataset(load_parquet(parquet_path, BENCH_COLUMNS), rows, seed)
+    df['admission_month'] = pd.Categorical(df['date_of_admission'].dt.to_period('M').dt.to_timestamp())
+    split = np.random.default_rng(seed).integers(0, max(hospitals // df['hospital'].nunique(), 1), rows)
+    names = df['hospital'].astype(str) + ' #' + pd.Series(split).astype(str)
+    df['hospital'] = names.astype('category')
+    return df
+
+
+def pandas_breakdowns(df):
+    return {
+        key: df.groupby(key, observed=True)[MEASURES].agg(['sum', 'count'])
+        for key in KEYS
+    }
+
+
+def same_breakdowns(expected, actual):
+    for key in KEYS:
+        e = expected[key]
+        a = actual[key].loc[e.index]
+        for m in MEASURES:
+            if not np.allclose(e[(m, 'sum')].to_numpy(), a[f'{m}_sum'].to_numpy(), rtol=1e-9):
+                return False
+        if not (e[(MEASURES[0], 'count')].to_numpy() == a['count'].to_numpy()).all():
+            return False
+    return True
+
+
+def _timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--rows', type=int, default=20_000_000)
+    parser.add_argument('--hospitals', type=int, default=40_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_dataset(args.parquet, args.rows, args.hospitals)
+    print(f"{len(df):,} rows, {df['hospital'].nunique():,} hospitals")
+    pandas_seconds, expected = _timed(lambda: pandas_breakdowns(df), args.repeat)
+    print(f"{'engine':<14}{'seconds':>9}{'speedup':>9}  check")
+    print(f"{'pandas':<14}{pandas_seconds:>9.3f}{1:>8.1f}x")
+    base = None
+    for workers in args.workers:
+        aggregator = ShardedAggregator(df, workers=workers, min_rows=0)
+        aggregator.aggregate()
+        seconds, (_, actual) = _timed(aggregator.aggregate, args.repeat)
+        aggregator.close()
+        base = base or seconds
+        check = 'ok' if same_breakdowns(expected, actual) else 'DIFFERS'
+        print(f"{f'{workers} workers':<14}{seconds:>9.3f}{base / seconds:>8.1f}x  {check}"
+              f"  ({pandas_seconds / seconds:.1f}x pandas)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Throughput of the chunked pipeline against the notebook's preprocessing.
+
+    python bench_preprocessing.py healthcare_dataset.csv --check
+
+The notebook path is a verbatim copy of Healthcare_Analysis.ipynb sections
+3-8 and needs scikit-learn. With --check the two outputs are compared:
+non-scaled columns must be identical, scaled columns equal within 1e-9.
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from perf import measure
+from pipeline import DEFAULT_CHUNKSIZE, run_pipeline
+from preprocessing import clean_name
+
+
+def notebook_preprocess(input_path, output_path, encoded_path):
+    from sklearn.preprocessing import LabelEncoder, MinMaxScaler, RobustScaler, StandardScaler
+
+    df = pd.read_csv(input_path)
+    df_clean = df.copy()
+    df_clean.columns = df_clean.columns.str.strip().str.lower().str.replace(" ", "_")
+    df_clean["name"] = df_clean["name"].apply(clean_name)
+    gender_map = {"Male": "Male", "M": "Male", "Female": "Female", "F": "Female"}
+    df_clean["gender"] = df_clean["gender"].str.strip().str.title().map(gender_map)
+    text_cols = [
+        "blood_type", "medical_condition", "doctor", "hospital", "insurance_provider",
+        "admission_type", "medication", "test_results"
+    ]
+    for col in text_cols:
+        df_clean[col] = df_clean[col].astype(str).str.strip().str.title()
+    df_clean["date_of_admission"] = pd.to_datetime(df_clean["date_of_admission"])
+    df_clean["discharge_date"] = pd.to_datetime(df_clean["discharge_date"])
+    df_clean["billing_amount"] = df_clean["billing_amount"].abs()
+
+    for col in df_clean.columns:
+        if df_clean[col].isnull().any():
+            if df_clean[col].dtype == "object":
+                df_clean[col] = df_clean[col].fillna(df_clean[col].mode()[0])
+            else:
+                df_clean[col] = df_clean[col].fillna(df_clean[col].median())
+
+    df_clean["length_of_stay"] = (df_clean["discharge_date"] - df_clean["date_of_admission"]).dt.days
+    df_clean["age_valid"] = df_clean["age"].between(0, 120)
+    df_clean["stay_valid"] = df_clean["length_of_stay"] >= 0
+    df_clean["billing_valid"] = df_clean["billing_amount"] > 0
+    df_clean["validation_score"] = df_clean[["age_valid", "stay_valid", "billing_valid"]].mean(axis=1)
+
+    for col in ["gender", "admission_type", "test_results"]:
+        df_clean[col + "_enc"] = LabelEncoder().fit_transform(df_clean[col])
+    df_encoded = pd.get_dummies(
+        df_clean,
+        columns=["blood_type", "medical_condition", "insurance_provider", "medication"],
+        drop_first=True
+    )
+
+    num_cols = ["age", "billing_amount", "room_number", "length_of_stay"]
+    df_clean[[c + "_minmax" for c in num_cols]] = MinMaxScaler().fit_transform(df_clean[num_cols])
+    df_clean[[c + "_zscore" for c in num_cols]] = StandardScaler().fit_transform(df_clean[num_cols])
+    df_clean[[c + "_robust" for c in num_cols]] = RobustScaler().fit_transform(df_clean[num_cols])
+
+    df_clean.to_csv(output_path, index=False)
+    df_encoded.to_csv(encoded_path, index=False)
+    return len(df_clean)
+
+
+def compare(expected_path, actual_path):
+    expected = pd.read_csv(expected_path, keep_default_na=False)
+    actual = pd.read_csv(actual_path, keep_default_na=False)
+    if list(expected.columns) != list(actual.columns) or len(expected) != len(actual):
+        return ['column names or row count differ']
+    problems = []
+    for col in expected.columns:
+        if col.endswith(('_minmax', '_zscore', '_robust')):
+            same = np.allclose(expected[col], actual[col], rtol=1e-9, atol=1e-12)
+        else:
+            same = expected[col].equals(actual[col])
+        if not same:
+            problems.append(col)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', nargs='?', default='healthcare_dataset.csv')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--skip-notebook', action='store_true')
+    parser.add_argument('--check', action='store_true', help='compare pipeline output with the notebook')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = {name: os.path.join(tmp, f'{name}.csv') for name in ('nb', 'nb_enc', 'pl', 'pl_enc')}
+        # The pipeline runs first so its peak RSS is not the notebook's
+        with measure() as pl:
+            result = run_pipeline(args.input, out['pl'], out['pl_enc'], None, args.chunksize, tmp, args.workers)
+        rows = result['rows']
+        print(f"pipeline  {rows:>12,} rows {pl['seconds']:8.1f}s {rows / pl['seconds']:>12,.0f} rows/sec"
+              f"  peak RSS {pl['peak_rss_mb']:,.0f} MB")
+        if not args.skip_notebook:
+            with measure() as nb:
+                rows = notebook_preprocess(args.input, out['nb'], out['nb_enc'])
+            print(f"notebook  {rows:>12,} rows {nb['seconds']:8.1f}s {rows / nb['seconds']:>12,.0f} rows/sec"
+                  f"  peak RSS {nb['peak_rss_mb']:,.0f} MB")
+
+        if args.check and not args.skip_notebook:
+            for expected, actual in (('nb', 'pl'), ('nb_enc', 'pl_enc')):
+                problems = compare(out[expected], out[actual])
+                print(f"{os.path.basename(out[actual])}: {'matches notebook' if not problems else 'differs in ' + ', '.join(problems)}")
+
+
+if __name__ == '__main__':
+    main()
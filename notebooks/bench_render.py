@@ -0,0 +1,74 @@
+"""Peak RSS of rendering each dashboard page, measured headlessly.
+
+Every page renders in a fresh interpreter through Streamlit's AppTest: the
+app is first run on the home page (loading the data), then the page is
+rendered twice, cold and again with the same filters, while RSS is sampled:
+
+    python bench_render.py --data /path/to/data_dir
+    python bench_render.py --app /path/to/other/healthcare_dashboard.py
+
+The data directory is the working directory of the app, i.e. where it finds
+the Parquet dataset. ``--app`` allows comparing two versions of the app.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from perf import rss_mb, track_peak
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'healthcare_dashboard.py')
+PAGES = {
+    'general': "📊 General Analysis",
+    'clinical': "🏥 Clinical Analysis",
+    'financial': "💰 Financial Analysis",
+}
+
+
+def run_page(app, page, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(app)))
+    at = AppTest.from_file(app, default_timeout=timeout)
+    at.run()
+    result = {'loaded_mb': rss_mb()}
+    for run in ('cold', 'rerun'):
+        with track_peak() as stats:
+            if run == 'cold':
+                at.sidebar.radio[0].set_value(PAGES[page]).run()
+            else:
+                at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        result[run] = stats
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=APP_PATH)
+    parser.add_argument('--data', default='.', help='directory holding the dataset')
+    parser.add_argument('--pages', nargs='+', choices=list(PAGES), default=list(PAGES))
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--page', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.page:
+        print(json.dumps(run_page(args.app, args.page, args.timeout)))
+        return
+
+    print(f"{'page':<12}{'loaded MB':>11}{'cold peak +MB':>15}{'cold s':>8}{'rerun peak +MB':>16}{'rerun s':>9}")
+    for page in args.pages:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--page', page,
+             '--app', os.path.abspath(args.app), '--timeout', str(args.timeout)],
+            cwd=args.data, check=True, capture_output=True, text=True
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{page:<12}{r['loaded_mb']:>11.0f}{r['cold']['peak_delta_mb']:>15.1f}{r['cold']['seconds']:>8.2f}"
+              f"{r['rerun']['peak_delta_mb']:>16.1f}{r['rerun']['seconds']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Memory of the dashboard against concurrent sessions and server processes.
+
+    python bench_sessions.py --data /path/to/data_dir --sessions 1 10 25 50 --processes 1 2 4
+
+Sessions: dashboard sessions are opened one after another in one process
+through Streamlit's AppTest and kept alive, each on the financial page with
+its own filters (a different date range and gender). All of them use the
+process's one store, so each only adds its filter state, row positions and
+cached results; the process RSS is reported after each count.
+
+Processes: --processes server-like processes each build the store, either
+from a private copy of the rows loaded from Parquet or attached to the
+published Arrow file (see shared.py). Reported per process are RSS, USS
+(pages only that process holds) and PSS (shared pages split between the
+processes that map them); the PSS total is what the host pays.
+
+The data directory is the working directory of the app, i.e. where it finds
+the Parquet dataset. Requires psutil.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import subprocess
+import sys
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'healthcare_dashboard.py')
+FINANCIAL = "💰 Financial Analysis"
+DEFAULT_SESSIONS = [1, 5, 10, 25, 50]
+DEFAULT_PROCESSES = [1, 2, 4]
+
+
+def memory_mb(pid=None):
+    import psutil
+    info = psutil.Process(pid).memory_full_info()
+    return {'rss': info.rss / 1e6, 'uss': info.uss / 1e6, 'pss': getattr(info, 'pss', info.uss) / 1e6}
+
+
+def run_sessions(app, counts, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    def open_session():
+        at = AppTest.from_file(app, default_timeout=timeout)
+        at.run()
+        return at.sidebar.radio[0].set_value(FINANCIAL).run()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(app)))
+    # A first session loads the shared store, so the counts do not include it
+    open_session()
+    gc.collect()
+    results, sessions = [], []
+    before = memory_mb()['rss']
+    for count in range(1, max(counts) + 1):
+        at = open_session()
+        start, end = at.sidebar.date_input[0].value
+        # A different filter state per session
+        start = max(start, end - datetime.timedelta(weeks=4 * count))
+        at.sidebar.date_input[0].set_value((start, end))
+        at.sidebar.selectbox[0].set_value(at.sidebar.selectbox[0].options[count % 3]).run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        sessions.append(at)
+        if count in counts:
+            rss = memory_mb()['rss']
+            results.append({'sessions': count, 'rss': rss, 'per_session': (rss - before) / count})
+    return {'before': before, 'results': results}
+
+
+def hold_store(mode):
+    # One server process's data: build the store, report, wait to be released
+    from preprocessing import load_stats
+    import shared
+    from storage import ensure_parquet, load_parquet
+    from store import DASHBOARD_COLUMNS, DataStore, prepare_frame
+
+    path = ensure_parquet()
+    if mode == 'shared':
+        df, parts = shared.load(path, DASHBOARD_COLUMNS, prepare_frame)
+    else:
+        df, parts = load_parquet(path, DASHBOARD_COLUMNS), None
+    store = DataStore(df, stats=load_stats(), parquet_path=path, parts=parts)
+    del df
+    print('ready', flush=True)
+    sys.stdin.read()
+    store.aggregator.close()
+
+
+def run_processes(count, mode, data):
+    procs = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--hold', mode], cwd=data,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(count)
+    ]
+    try:
+        for proc in procs:
+            if proc.stdout.readline().strip() != 'ready':
+                raise RuntimeError(f'{mode} process {proc.pid} failed')
+        # Measured once every process holds its store
+        usage = [memory_mb(proc.pid) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.communicate('')
+    return {key: sum(u[key] for u in usage) / count for key in ('rss', 'uss', 'pss')} | \
+        {'total_pss': sum(u['pss'] for u in usage)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=APP_PATH)
+    parser.add_argument('--data', default='.', help='directory holding the dataset')
+    parser.add_argument('--sessions', type=int, nargs='*', default=DEFAULT_SESSIONS)
+    parser.add_argument('--processes', type=int, nargs='*', default=DEFAULT_PROCESSES)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--session-counts', type=int, nargs='+', help=argparse.SUPPRESS)
+    parser.add_argument('--hold', choices=['private', 'shared'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hold:
+        hold_store(args.hold)
+        return
+    if args.session_counts:
+        print(json.dumps(run_sessions(args.app, args.session_counts, args.timeout)))
+        return
+
+    if args.processes:
+        print(f"{'processes':<11}{'store':<9}{'RSS MB':>9}{'USS MB':>9}{'PSS MB':>9}{'total PSS MB':>14}")
+        for count in args.processes:
+            for mode in ('private', 'shared'):
+                r = run_processes(count, mode, args.data)
+                print(f"{count:<11}{mode:<9}{r['rss']:>9.0f}{r['uss']:>9.0f}{r['pss']:>9.0f}{r['total_pss']:>14.0f}")
+    if args.sessions:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--session-counts', *map(str, args.sessions),
+             '--app', os.path.abspath(args.app), '--timeout', str(args.timeout)],
+            cwd=args.data, check=True, capture_output=True, text=True
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"\nstore loaded: {r['before']:.0f} MB RSS")
+        print(f"{'sessions':<10}{'RSS MB':>9}{'+MB per session':>17}")
+        for row in r['results']:
+            print(f"{row['sessions']:<10}{row['rss']:>9.0f}{row['per_session']:>17.2f}")
+
+
+if __name__ == '__main__':
+    main()
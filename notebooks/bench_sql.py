@@ -0,0 +1,159 @@
+"""Time the health.sql queries in DuckDB against the equivalent pandas code.
+
+    python bench_sql.py --parquet healthcare_dataset_parquet --sizes 1000000 10000000 50000000
+
+For each size the dataset is resampled (with replacement) to that many rows
+and held in memory once; DuckDB scans the same DataFrame the pandas code
+groups, so the timings compare the engines rather than the I/O. With
+--check the results are compared (numeric columns, order-insensitive, within
+the two-decimal rounding of the SQL).
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from sql_engine import SQLEngine, load_queries
+from storage import PARQUET_PATH, load_parquet
+
+QUERY_COLUMNS = [
+    'age', 'gender', 'blood_type', 'medical_condition', 'date_of_admission',
+    'hospital', 'insurance_provider', 'billing_amount', 'admission_type',
+    'medication', 'test_results', 'length_of_stay'
+]
+DEFAULT_SIZES = [1_000_000, 10_000_000, 50_000_000]
+
+
+def scale_dataset(df, rows, seed=0):
+    """Resample ``df`` with replacement to ``rows`` rows."""
+    take = np.random.default_rng(seed).integers(0, len(df), rows)
+    return df.take(take).reset_index(drop=True)
+
+
+def _share(counts, within=None):
+    total = counts.groupby(level=within, observed=True).transform('sum') if within else counts.sum()
+    return (counts * 100.0 / total).round(2)
+
+
+def _summary(df, by, col, prefix):
+    stats = df.groupby(by, observed=True)[col].agg(['size', 'mean', 'min', 'max'])
+    stats.columns = ['patient_count', f'avg_{prefix}', f'min_{prefix}', f'max_{prefix}']
+    stats[f'avg_{prefix}'] = stats[f'avg_{prefix}'].round(2)
+    return stats
+
+
+def _counts(df, by, name, within=None, sort=None):
+    counts = df.groupby(by, observed=True).size().rename(name)
+    result = counts.to_frame()
+    result['percentage'] = _share(counts, within)
+    if sort:
+        result = result.reset_index().sort_values(sort[0], ascending=sort[1])
+    return result
+
+
+def _age_group(age):
+    return pd.Series(np.select(
+        [age.between(0, 30), age.between(31, 50), age.between(51, 70)],
+        ['0-30', '31-50', '51-70'], '71+'
+    ), index=age.index)
+
+
+def _stay_group(stay):
+    return pd.Series(np.select(
+        [stay <= 7, stay.between(8, 14), stay.between(15, 21)],
+        ['1-7 days', '8-14 days', '15-21 days'], '22+ days'
+    ), index=stay.index)
+
+
+def _billing(df, by):
+    stats = _summary(df, by, 'billing_amount', 'billing')
+    return stats.round({'min_billing': 2, 'max_billing': 2}).sort_values('avg_billing', ascending=False)
+
+
+def _top_medication(df):
+    counts = df.groupby(['medical_condition', 'medication'], observed=True).size().rename('usage_count')
+    ranked = counts.reset_index().sort_values('usage_count', ascending=False, kind='stable')
+    return ranked.drop_duplicates('medical_condition').sort_values('medical_condition')
+
+
+# pandas equivalents of the health.sql queries, by query number
+PANDAS_QUERIES = {
+    1: lambda df: _counts(df, 'medical_condition', 'patient_count', sort=('patient_count', False)),
+    2: lambda df: _summary(df, _age_group(df['age']), 'length_of_stay', 'stay').sort_index(),
+    3: lambda df: _billing(df, 'medical_condition'),
+    4: lambda df: _summary(df, 'admission_type', 'length_of_stay', 'stay').sort_values('avg_stay', ascending=False),
+    5: _top_medication,
+    6: lambda df: _counts(df, ['blood_type', 'medical_condition'], 'patient_count', within='blood_type',
+                          sort=(['blood_type', 'patient_count'], [True, False])),
+    7: lambda df: _counts(df, ['medical_condition', 'test_results'], 'result_count', within='medical_condition',
+                          sort=(['medical_condition', 'result_count'], [True, False])),
+    8: lambda df: _counts(df, 'hospital', 'patient_count', sort=('patient_count', False)).head(10),
+    9: lambda df: _billing(df, 'insurance_provider'),
+    10: lambda df: _summary(df, ['medical_condition', 'gender'], 'length_of_stay', 'stay').sort_index(),
+    11: lambda df: _summary(df, 'medical_condition', 'age', 'age').sort_values('avg_age', ascending=False),
+    12: lambda df: _counts(df, 'gender', 'patient_count'),
+    13: lambda df: _counts(df, ['admission_type', 'test_results'], 'result_count', within='admission_type',
+                           sort=(['admission_type', 'result_count'], [True, False])),
+    14: lambda df: _counts(df, df['date_of_admission'].dt.month.rename('admission_month'), 'admission_count',
+                           sort=('admission_count', False)),
+    15: lambda df: _billing(df, _stay_group(df['length_of_stay'])).sort_index(),
+}
+
+
+def same_result(expected, actual):
+    """Numeric columns match as multisets, allowing for SQL's half-up rounding."""
+    expected = expected.reset_index().select_dtypes('number')
+    actual = actual.select_dtypes('number')
+    if expected.shape[0] != actual.shape[0]:
+        return False
+    for col in actual.columns:
+        if col not in expected.columns:
+            continue
+        a = np.sort(expected[col].to_numpy(dtype='float64'))
+        b = np.sort(actual[col].to_numpy(dtype='float64'))
+        if not np.allclose(a, b, rtol=0, atol=0.011):
+            return False
+    return True
+
+
+def _timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    source = load_parquet(args.parquet, QUERY_COLUMNS)
+    queries = load_queries()
+    print(f"{'rows':>12}{'query':>7}{'pandas s':>10}{'duckdb s':>10}{'speedup':>9}" + ('  check' if args.check else ''))
+    for size in args.sizes:
+        df = scale_dataset(source, size)
+        engine = SQLEngine(df)
+        totals = [0.0, 0.0]
+        for number, (_, sql) in sorted(queries.items()):
+            pd_seconds, expected = _timed(lambda: PANDAS_QUERIES[number](df), args.repeat)
+            db_seconds, actual = _timed(lambda: engine.query(sql), args.repeat)
+            totals[0] += pd_seconds
+            totals[1] += db_seconds
+            line = f"{size:>12,}{number:>7}{pd_seconds:>10.3f}{db_seconds:>10.3f}{pd_seconds / db_seconds:>8.1f}x"
+            if args.check:
+                line += '  ok' if same_result(expected, actual) else '  DIFFERS'
+            print(line)
+        print(f"{size:>12,}{'all':>7}{totals[0]:>10.3f}{totals[1]:>10.3f}{totals[0] / totals[1]:>8.1f}x")
+        del engine, df
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compare cold-load time and RSS of the CSV and Parquet loaders.
+
+Each loader runs in a fresh interpreter so that timings and memory are
+measured from a cold process:
+
+    python bench_storage.py --csv healthcare_dataset_preprocessed.csv
+
+``compact`` is the dashboard's load: its columns from Parquet with the
+narrowed dtypes the store holds. Bytes per row are those of the loaded
+frame; the last column compares them with the CSV load.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from perf import measure
+from storage import (CSV_PATH, PAGE_COLUMNS, PARQUET_PATH, bytes_per_row, compact, ensure_parquet,
+                     load_csv, load_parquet)
+from store import DASHBOARD_COLUMNS
+
+CASES = ['csv', 'parquet', 'compact'] + [f'parquet:{page}' for page in PAGE_COLUMNS]
+
+
+def run_case(case, csv_path, parquet_path):
+    with measure() as stats:
+        if case == 'csv':
+            data = load_csv(csv_path)
+        elif case == 'compact':
+            data = compact(load_parquet(parquet_path, DASHBOARD_COLUMNS))
+        else:
+            page = case.partition(':')[2]
+            columns = PAGE_COLUMNS[page] if page else None
+            data = load_parquet(parquet_path, columns)
+    stats['rows'] = len(data)
+    stats['columns'] = data.shape[1]
+    stats['frame_mb'] = data.memory_usage(deep=True).sum() / 1e6
+    stats['bytes_per_row'] = bytes_per_row(data).sum()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.csv, args.parquet)))
+        return
+
+    ensure_parquet(args.csv, args.parquet)
+    print(f"{'case':<20}{'rows':>12}{'cols':>6}{'seconds':>10}{'rss MB':>10}{'frame MB':>10}"
+          f"{'B/row':>8}{'vs csv':>8}")
+    csv_bytes = None
+    for case in CASES:
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run(
+                [sys.executable, __file__, '--case', case, '--csv', args.csv, '--parquet', args.parquet],
+                check=True, capture_output=True, text=True
+            )
+            runs.append(json.loads(out.stdout))
+        best = min(runs, key=lambda r: r['seconds'])
+        csv_bytes = csv_bytes or best['bytes_per_row']
+        print(f"{case:<20}{best['rows']:>12,}{best['columns']:>6}{best['seconds']:>10.3f}"
+              f"{best['rss_delta_mb']:>10.1f}{best['frame_mb']:>10.1f}{best['bytes_per_row']:>8.0f}"
+              f"{csv_bytes / best['bytes_per_row']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
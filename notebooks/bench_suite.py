@@ -0,0 +1,189 @@
+"""Benchmark suite: data load, sidebar filters and page aggregates at scale.
+
+    python bench_suite.py --rows 100000 1000000 10000000 --json baseline.json
+    python bench_suite.py --rows 100000 1000000 10000000 --compare baseline.json
+
+Each size runs on a synthetic dataset (see synthetic.py), generated once
+into --data-dir and reused; --parquet benchmarks an existing dataset
+instead. Cases:
+
+- load: reading the dashboard columns, building the store (sort, cubes,
+  indexes, heavy hitters) and registering it with DuckDB; run once;
+- filter: ``store.rows`` for every combination the sidebar offers (date
+  range x gender x hospital);
+- aggregates: each page's figures (``page_figures.view``) and the
+  aggregates, trends and patient table pages they are built from, for a
+  few representative filter states.
+
+Every call after the load runs with the store's result cache cleared, and
+reports the best of --repeat runs. With --compare, cases slower than the
+baseline by more than --tolerance are flagged and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+import charts
+import page_figures
+import synthetic
+import table
+from storage import load_parquet
+from store import DASHBOARD_COLUMNS, DataStore
+
+DEFAULT_SIZES = [100_000, 1_000_000, 10_000_000]
+DATA_DIR = 'synthetic_datasets'
+
+
+def _timed(fn, repeat, setup=None):
+    best, result = None, None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def dataset(rows, data_dir, seed=0, hospitals=synthetic.HOSPITALS):
+    path = os.path.join(data_dir, f'{rows}-{seed}-{hospitals}')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        start = time.perf_counter()
+        synthetic.write_parquet(path, rows, seed=seed, hospitals=hospitals, workers=os.cpu_count() or 1)
+        print(f"generated {rows:,} rows in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def navigation_states(store):
+    """Every filter combination of the sidebar, by name."""
+    dates = store.default_filters()
+    last = dates['end']
+    ranges = {
+        'all': dates,
+        'year': {'start': last - pd.DateOffset(years=1), 'end': last},
+        'quarter': {'start': last - pd.DateOffset(months=3), 'end': last},
+        'month': {'start': last - pd.DateOffset(months=1), 'end': last},
+    }
+    sizes = store.df['hospital'].value_counts()
+    hospitals = {'all': None, 'largest': sizes.index[0], 'median': sizes.index[len(sizes) // 2]}
+    states = {}
+    for range_name, date_range in ranges.items():
+        for gender in ['all'] + sorted(store.df['gender'].dropna().unique()):
+            for hospital_name, hospital in hospitals.items():
+                filters = dict(date_range)
+                if gender != 'all':
+                    filters['gender'] = gender
+                if hospital is not None:
+                    filters['hospital'] = hospital
+                states[f'{range_name}/{gender.lower()}/{hospital_name}'] = filters
+    return states
+
+
+def aggregate_cases(store, states):
+    """(name, function) of every page and aggregate over the representative states."""
+    def page(name, filters):
+        # In the display modes a new session starts with
+        rows = store.rows(filters)
+        scatter_mode = 'sample' if name == 'financial' and len(rows) > charts.POINT_BUDGET else 'auto'
+        return page_figures.view(store, name, filters, rows, scatter_mode)
+
+    cases = []
+    for state in ['all/all/all', 'quarter/female/all', 'year/all/largest']:
+        filters = states[state]
+        # Hospitals are only filtered on the financial page
+        shared = {k: v for k, v in filters.items() if k != 'hospital'}
+        if 'hospital' not in filters:
+            cases += [
+                (f'page:general {state}', lambda f=shared: page('general', f)),
+                (f'page:clinical {state}', lambda f=shared: page('clinical', f)),
+                (f'select {state}', lambda f=shared: store.select(f)),
+                (f'select:stay {state}', lambda f=shared: store.select(f, 'stay')),
+                (f'sql:blood_type {state}', lambda f=shared: store.sql.counts('blood_type', f)),
+                (f'table:name page 100 {state}', lambda f=shared: table.page(store, f, 'name', number=100)),
+            ]
+        cases += [
+            (f'page:financial {state}', lambda f=filters: page('financial', f)),
+            (f'breakdowns {state}', lambda f=filters: store.breakdowns(f)),
+            (f'trend:weekly {state}', lambda f=filters: store.trend(f, 'W')),
+            (f'sql:room_number {state}', lambda f=filters: store.sql.counts('room_number', f, limit=10)),
+        ]
+    return cases
+
+
+def run(path, repeat):
+    results = {}
+
+    def record(case, seconds, detail=''):
+        results[case] = seconds
+        print(f"  {case:<44}{seconds * 1e3:>12.2f}  {detail}")
+
+    seconds, df = _timed(lambda: load_parquet(path, DASHBOARD_COLUMNS), 1)
+    record('load:parquet', seconds, f'{len(df):,} rows')
+    seconds, store = _timed(lambda: DataStore(df, parquet_path=path), 1)
+    del df
+    record('load:store', seconds)
+    seconds, _ = _timed(lambda: store.sql, 1)
+    record('load:sql', seconds)
+
+    clear = store.cache.clear
+    states = navigation_states(store)
+    for name, filters in states.items():
+        seconds, rows = _timed(lambda: store.rows(filters), repeat, clear)
+        record(f'filter {name}', seconds, f'{len(rows):,} rows')
+    for name, fn in aggregate_cases(store, states):
+        seconds, _ = _timed(fn, repeat, clear)
+        record(name, seconds)
+    store.aggregator.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the cases slower than the baseline; returns how many there are."""
+    regressions = 0
+    for size, cases in results.items():
+        for case, seconds in cases.items():
+            before = baseline.get(size, {}).get(case)
+            if before and seconds > before * (1 + tolerance):
+                regressions += 1
+                print(f"REGRESSION {size:>12}  {case:<44}{before * 1e3:>10.2f} -> {seconds * 1e3:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--parquet', help='benchmark this dataset instead of synthetic ones')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--hospitals', type=int, default=synthetic.HOSPITALS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='write the results (seconds per case and size) to this file')
+    parser.add_argument('--compare', help='baseline results written by --json')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    paths = {'dataset': args.parquet} if args.parquet else {
+        str(rows): dataset(rows, args.data_dir, args.seed, args.hospitals) for rows in args.rows
+    }
+    results = {}
+    for size, path in paths.items():
+        print(f"{path}\n  {'case':<44}{'ms':>12}")
+        results[size] = run(path, args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        print(f"{regressions} regressions beyond {args.tolerance:.0%}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
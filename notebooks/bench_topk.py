@@ -0,0 +1,85 @@
+"""Exact top-K selection and streamed heavy hitters against full sorts.
+
+    python bench_topk.py --parquet healthcare_dataset_parquet --groups 40000 1000000 --rows 10000000
+
+Exact: ``top_k`` against ``sort_values().head(10)`` over per-group sums
+(the hospital billing chart), for each number of groups.
+
+Streaming: --rows resampled admissions are fed in --batch sized batches to
+a HeavyHitters summary per streamed column (room usage, billing per
+hospital). Reports the summary's update rate, its overlap with the exact
+top 10, the largest observed error and whether every true total lies
+within the reported [lower, estimate] range.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_sql import scale_dataset
+from storage import PARQUET_PATH, load_parquet
+from store import STREAM_TOP
+from topk import HeavyHitters, top_k
+
+
+def _timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def bench_exact(groups, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    sums = pd.Series(rng.lognormal(10, 2, groups), index=[f'Hospital {i}' for i in range(groups)])
+    sort_seconds, expected = _timed(lambda: sums.sort_values(ascending=False).head(10), repeat)
+    select_seconds, actual = _timed(lambda: top_k(sums, 10), repeat)
+    same = expected.index.equals(actual.index)
+    print(f"{groups:>12,}{sort_seconds * 1e3:>10.2f}{select_seconds * 1e3:>10.2f}"
+          f"{sort_seconds / select_seconds:>8.1f}x  {'ok' if same else 'DIFFERS'}")
+
+
+def bench_stream(df, batch):
+    print(f"{'column':<14}{'rows/s':>12}{'top-10 hit':>12}{'max error':>14}{'bound':>14}  within")
+    for col, weight in STREAM_TOP.items():
+        summary = HeavyHitters()
+        start = time.perf_counter()
+        for lo in range(0, len(df), batch):
+            chunk = df.iloc[lo:lo + batch]
+            summary.update(chunk[col].to_numpy(), chunk[weight].to_numpy() if weight else None)
+        seconds = time.perf_counter() - start
+        true = df.groupby(col, observed=True)[weight].sum() if weight else df[col].value_counts()
+        top = summary.top(10)
+        exact = true.loc[top.index].to_numpy()
+        # Up to floating-point summation order
+        slack = 1e-9 * np.abs(exact)
+        within = bool(((top['lower'] <= exact + slack) & (exact <= top['estimate'] + slack)).all())
+        hits = len(set(true.nlargest(10).index) & set(top.index))
+        error = float(np.abs(top['estimate'] - exact).max())
+        print(f"{col:<14}{len(df) / seconds:>12,.0f}{hits:>10}/10{error:>14,.1f}"
+              f"{summary.summary.bound:>14,.1f}  {'yes' if within else 'NO'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--groups', type=int, nargs='+', default=[40_000, 1_000_000])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--batch', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'groups':>12}{'sort ms':>10}{'top_k ms':>10}{'speedup':>9}")
+    for groups in args.groups:
+        bench_exact(groups, args.repeat)
+    print()
+    df = scale_dataset(load_parquet(args.parquet, ['hospital', 'room_number', 'billing_amount']), args.rows)
+    bench_stream(df, args.batch)
+
+
+if __name__ == '__main__':
+    main()
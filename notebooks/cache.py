@@ -0,0 +1,137 @@
+"""Memoized results keyed by the dashboard filter state.
+
+Entries are cube selections and the aggregates and figures of each page.
+They are keyed by a namespace and a canonical hash of the filters, evicted
+least-recently-used when the entry count or the memory budget is exceeded,
+and expire after a time-to-live. Entries a new batch changes (those whose
+filters overlap it, or that depend on every row) are dropped by
+``invalidate``.
+"""
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_ENTRIES = 256
+TTL_SECONDS = 15 * 60
+MAX_BYTES = 256e6
+
+
+def filter_key(filters):
+    """Hashable, order-independent key for a sidebar filter state."""
+    return tuple(sorted((k, v) for k, v in filters.items() if v is not None))
+
+
+def filter_hash(filters):
+    """Canonical hash of a filter state; equal filters give equal hashes."""
+    items = [(k, v.isoformat() if isinstance(v, pd.Timestamp) else v) for k, v in filter_key(filters)]
+    return hashlib.sha1(json.dumps(items, default=str).encode()).hexdigest()[:16]
+
+
+def sizeof(value):
+    """Approximate memory held by a cached value, in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return sum(sizeof(value[col]) for col in value.columns)
+    if isinstance(value, pd.Series):
+        if isinstance(value.dtype, pd.CategoricalDtype):
+            # Categories are shared with the dataset; only the codes are held
+            return value.cat.codes.nbytes
+        return int(value.memory_usage(deep=value.dtype == object, index=False))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, 'to_plotly_json'):
+        return sizeof(value.to_plotly_json())
+    if isinstance(value, dict):
+        return sum(sizeof(v) for v in value.values()) + sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sum(sizeof(v) for v in value) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        # Bumped by invalidate/clear, so results computed meanwhile are not stored
+        self._generation = 0
+        # key -> (value, filters, size, expires)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get_or_compute(self, namespace, filters, compute):
+        """Cached ``compute()`` for this namespace and filter state."""
+        key = (namespace, filter_hash(filters))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            generation = self._generation
+
+        # Computed outside the lock so other sessions are not held up
+        value = compute()
+        size = sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if generation == self._generation and size <= self.max_bytes:
+                self._entries[key] = (value, dict(filters), size, time.monotonic() + self.ttl)
+                self.bytes += size
+                self._evict()
+        return value
+
+    def invalidate(self, predicate):
+        """Drop entries for which ``predicate(namespace, filters)`` holds; returns how many."""
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items() if predicate(key[0], entry[1])]
+            for key in stale:
+                self._remove(key)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key)[2]
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, entry in self._entries.items() if entry[3] <= now]:
+            self._remove(key)
+            self.evictions += 1
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
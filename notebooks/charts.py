@@ -0,0 +1,117 @@
+"""Chart builders that reduce the data on the server before plotting.
+
+Plotly serializes every point it is given and the browser has to parse and
+draw all of them, so charts over raw rows are capped: a scatter above the
+point budget is replaced by a stratified sample or a binned density, whose
+payload no longer grows with the number of rows.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Most points a scatter sends to the browser; above it the mode switches
+POINT_BUDGET = 5_000
+# Smallest sample kept per colour group, so rare groups stay visible
+MIN_GROUP_POINTS = 20
+DENSITY_BINS = 100
+SCATTER_MODES = ['auto', 'raw', 'sample', 'density']
+
+
+def stratified_sample(values, budget=POINT_BUDGET, seed=0):
+    """Positions of at most ``budget`` of ``values``, allocated to groups by size.
+
+    Every group keeps at least MIN_GROUP_POINTS rows (or all of its rows).
+    The seed is fixed so reruns with the same filters draw the same points.
+    """
+    if len(values) <= budget:
+        return np.arange(len(values))
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    sizes = np.bincount(codes, minlength=len(uniques))
+    quota = np.maximum(np.floor(budget * sizes / len(values)), np.minimum(sizes, MIN_GROUP_POINTS))
+    # Rows visited in random order; each group keeps its first `quota` rows
+    order = np.random.default_rng(seed).permutation(len(values))
+    rank = pd.Series(codes[order]).groupby(codes[order]).cumcount().to_numpy()
+    return np.sort(order[rank < quota[codes[order]]])
+
+
+def density_figure(x, y, bins=DENSITY_BINS, labels=None):
+    """2D histogram binned here and sent as a heatmap of bins x bins counts."""
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    valid = ~(np.isnan(x) | np.isnan(y))
+    counts, x_edges, y_edges = np.histogram2d(x[valid], y[valid], bins=bins)
+    fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=np.where(counts.T > 0, counts.T, np.nan),
+        colorscale='Viridis',
+        colorbar=dict(title='Rows')
+    ))
+    labels = labels or {}
+    fig.update_layout(xaxis_title=labels.get('x'), yaxis_title=labels.get('y'))
+    return fig
+
+
+def scatter_figure(df, x, y, color, rows=None, mode='auto', budget=POINT_BUDGET, labels=None, **kwargs):
+    """Scatter plot whose payload is capped at ``budget`` points.
+
+    ``rows`` are the positions of the rows to plot (all rows if None); only
+    the rows that are drawn are gathered. ``auto`` draws every row up to the
+    budget and a stratified sample (by ``color``) above it; ``density`` bins
+    all rows instead. Returns the figure and a dict with the mode used, rows,
+    points drawn, serialized payload size and build time.
+    """
+    start = time.perf_counter()
+    if rows is None:
+        rows = np.arange(len(df))
+    total = len(rows)
+    if mode == 'auto':
+        mode = 'raw' if total <= budget else 'sample'
+    labels = labels or {}
+    if mode == 'density':
+        fig = density_figure(df[x].to_numpy()[rows], df[y].to_numpy()[rows],
+                             labels={'x': labels.get(x, x), 'y': labels.get(y, y)})
+        points = 0
+    else:
+        if mode == 'sample':
+            rows = rows[stratified_sample(df[color].iloc[rows], budget)]
+        data = df.iloc[rows, [df.columns.get_loc(c) for c in (x, y, color)]]
+        fig = px.scatter(data, x=x, y=y, color=color, labels=labels, **kwargs)
+        points = len(data)
+    info = {
+        'mode': mode,
+        'rows': total,
+        'points': points,
+        'payload_bytes': len(fig.to_json()),
+        'seconds': time.perf_counter() - start,
+    }
+    return fig, info
+
+
+def box_figure(stats, colors=None):
+    """Box plot drawn from precomputed ``cube.box_stats``, one box per group.
+
+    Whiskers span min to max, as Plotly draws them for ``points=False``;
+    the payload is a handful of numbers per group.
+    """
+    colors = colors or px.colors.qualitative.Plotly
+    fig = go.Figure()
+    for i, (name, row) in enumerate(stats.iterrows()):
+        fig.add_trace(go.Box(
+            name=str(name),
+            x=[name],
+            q1=[row['q1']],
+            median=[row['median']],
+            q3=[row['q3']],
+            lowerfence=[row['min']],
+            upperfence=[row['max']],
+            mean=[row['mean']],
+            marker_color=colors[i % len(colors)],
+            offsetgroup=str(name),
+            hovertext=f"{int(row['count']):,} admissions"
+        ))
+    fig.update_layout(boxmode='group')
+    return fig
@@ -0,0 +1,34 @@
+"""Helpers for data processed chunk by chunk, shared by the batch modules."""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def ordered_map(fn, tasks, workers):
+    """``map(fn, tasks)`` over ``workers`` processes, results in input order.
+
+    At most 2 * workers tasks are in flight, so ``tasks`` may be a lazy
+    iterable of chunks; with one worker everything runs in this process.
+    """
+    if workers <= 1:
+        yield from map(fn, tasks)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(fn, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def merge_moments(a, b):
+    """Merge two [count, sum, min, max, mean, M2] summaries of disjoint values.
+
+    Chan et al.'s parallel update, so chunk summaries merge exactly.
+    """
+    n = a[0] + b[0]
+    delta = b[4] - a[4]
+    mean = a[4] + delta * b[0] / n
+    m2 = a[5] + b[5] + delta ** 2 * a[0] * b[0] / n
+    return [n, a[1] + b[1], min(a[2], b[2]), max(a[3], b[3]), mean, m2]
@@ -0,0 +1,325 @@
+"""Pre-aggregated cube behind the dashboard's KPI tiles and summary charts.
+
+Admissions are grouped once by (admission month, gender, hospital, medical
+condition, insurance provider, test result, age bucket). Each cell keeps the
+row count, the age sum and count/sum/min/max/sum-of-squares of billing amount
+and length of stay, so the KPIs and bar/pie charts are roll-ups over the cells
+instead of scans over the rows. Only non-empty cells are stored.
+
+A second, finer cube keeps the length-of-stay histogram of each (month,
+gender, hospital, condition), from which the box plot quartiles are read.
+"""
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = [
+    'admission_month', 'gender', 'hospital', 'medical_condition',
+    'insurance_provider', 'test_results', 'age_bucket'
+]
+MEASURES = ['billing_amount', 'length_of_stay']
+CUBE_COLUMNS = [
+    'date_of_admission', 'gender', 'hospital', 'medical_condition',
+    'insurance_provider', 'test_results', 'age'
+] + MEASURES
+
+# Fine age buckets; both page binnings are unions of these
+AGE_EDGES = [0, 18, 30, 45, 50, 60, 70, 100]
+AGE_SCHEMES = {
+    'general': (['0-18', '19-30', '31-45', '46-60', '60+'], [0, 1, 2, 3, 3, 4, 4]),
+    'clinical': (['<30', '30-50', '50-70', '70+'], [0, 0, 1, 1, 2, 2, 3]),
+}
+
+# The stay distribution is kept as exact value counts: stays are whole days,
+# so a histogram merges by addition and yields exact quartiles
+HISTOGRAM_MEASURE = 'length_of_stay'
+HISTOGRAM_DIMENSIONS = [
+    'admission_month', 'gender', 'hospital', 'medical_condition', HISTOGRAM_MEASURE
+]
+
+# How each cell column combines when cells are merged
+MERGE_AGGS = {'count': 'sum', 'age_sum': 'sum'}
+for _m in MEASURES:
+    MERGE_AGGS.update({
+        f'{_m}_count': 'sum', f'{_m}_sum': 'sum', f'{_m}_min': 'min',
+        f'{_m}_max': 'max', f'{_m}_sumsq': 'sum'
+    })
+
+
+# Per-row columns the store materializes once (see derived_columns)
+DERIVED_COLUMNS = ['admission_month', 'age_group', 'age_category']
+
+
+def admission_month(dates):
+    return dates.dt.to_period('M').dt.to_timestamp()
+
+
+def months_of(df):
+    """Admission month of each row, from the materialized column if present."""
+    if 'admission_month' in df.columns:
+        return df['admission_month'].astype('datetime64[ns]')
+    return admission_month(df['date_of_admission'])
+
+
+def age_bucket(age):
+    """Index into AGE_EDGES buckets, -1 for missing or out-of-range ages."""
+    values = age.to_numpy(dtype='float64', na_value=np.nan)
+    bucket = np.searchsorted(AGE_EDGES, values, side='right') - 1
+    bucket[~((values >= AGE_EDGES[0]) & (values < AGE_EDGES[-1]))] = -1
+    return bucket.astype('int8')
+
+
+def build_cells(df):
+    """Aggregate raw admission rows into cube cells."""
+    work = pd.DataFrame({
+        'admission_month': months_of(df),
+        'gender': df['gender'],
+        'hospital': df['hospital'],
+        'medical_condition': df['medical_condition'],
+        'insurance_provider': df['insurance_provider'],
+        'test_results': df['test_results'],
+        'age_bucket': age_bucket(df['age']),
+        'age': df['age'],
+    })
+    named = {'count': ('age', 'size'), 'age_sum': ('age', 'sum')}
+    for m in MEASURES:
+        work[m] = df[m]
+        work[f'{m}_sq'] = df[m] ** 2
+        named.update({
+            f'{m}_count': (m, 'count'), f'{m}_sum': (m, 'sum'), f'{m}_min': (m, 'min'),
+            f'{m}_max': (m, 'max'), f'{m}_sumsq': (f'{m}_sq', 'sum')
+        })
+    cells = work.groupby(DIMENSIONS, observed=True, dropna=False, sort=False).agg(**named)
+    return cells.reset_index().sort_values('admission_month', kind='stable', ignore_index=True)
+
+
+def merge_cells(parts, dimensions=DIMENSIONS, aggs=MERGE_AGGS):
+    """Combine cell frames (e.g. built per chunk) into one month-sorted cube."""
+    cells = pd.concat(parts, ignore_index=True)
+    cells = cells.groupby(dimensions, observed=True, dropna=False, sort=False).agg(aggs)
+    return cells.reset_index().sort_values('admission_month', kind='stable', ignore_index=True)
+
+
+def build_histogram(df, measure=HISTOGRAM_MEASURE):
+    """Row counts per value of an integer-valued measure within each cell."""
+    work = pd.DataFrame({
+        'admission_month': months_of(df),
+        'gender': df['gender'],
+        'hospital': df['hospital'],
+        'medical_condition': df['medical_condition'],
+        measure: df[measure],
+    })
+    cells = work.groupby(HISTOGRAM_DIMENSIONS[:-1] + [measure], observed=True, dropna=False, sort=False).size()
+    cells = cells.rename('count').reset_index()
+    return cells.sort_values('admission_month', kind='stable', ignore_index=True)
+
+
+def rollup(cells, by):
+    """Roll cells up to the ``by`` dimensions, adding mean and std columns.
+
+    A measure's mean and std are over the rows that have it.
+    """
+    out = cells.groupby(by, observed=True, dropna=False).agg(MERGE_AGGS)
+    for m in MEASURES:
+        n = out[f'{m}_count'].where(out[f'{m}_count'] > 0)
+        out[f'{m}_mean'] = out[f'{m}_sum'] / n
+        var = (out[f'{m}_sumsq'] - out[f'{m}_sum'] ** 2 / n) / (n - 1)
+        out[f'{m}_std'] = np.sqrt(var.clip(lower=0))
+    out['age_mean'] = out['age_sum'] / out['count']
+    return out
+
+
+def totals(cells):
+    """Grand totals over all cells as a dict."""
+    count = int(cells['count'].sum())
+    result = {'count': count, 'age_sum': cells['age_sum'].sum()}
+    for m in MEASURES:
+        # Means are over the rows that have the measure
+        present = int(cells[f'{m}_count'].sum())
+        result[f'{m}_count'] = present
+        result[f'{m}_sum'] = cells[f'{m}_sum'].sum()
+        result[f'{m}_min'] = cells[f'{m}_min'].min()
+        result[f'{m}_max'] = cells[f'{m}_max'].max()
+        result[f'{m}_mean'] = result[f'{m}_sum'] / present if present else np.nan
+    result['age_mean'] = result['age_sum'] / count if count else np.nan
+    return result
+
+
+def counts(cells, by):
+    """Row counts per ``by`` value, largest first (like value_counts)."""
+    return rollup(cells, by)['count'].sort_values(ascending=False)
+
+
+def _age_scheme(buckets, scheme):
+    labels, mapping = AGE_SCHEMES[scheme]
+    codes = np.where(buckets >= 0, np.take(mapping, buckets.clip(min=0)), -1)
+    return pd.Categorical.from_codes(codes, labels, ordered=True)
+
+
+def age_groups(cells, scheme):
+    """Map each cell's age bucket onto one of the page age binnings."""
+    return pd.Series(_age_scheme(cells['age_bucket'].to_numpy(), scheme), index=cells.index, name='age_group')
+
+
+def derived_columns(df):
+    """Admission month and both page age binnings of each row, as categoricals.
+
+    Months are unordered so that batches can add new ones at the end.
+    """
+    buckets = age_bucket(df['age'])
+    return {
+        'admission_month': pd.Categorical(admission_month(df['date_of_admission'])),
+        'age_group': _age_scheme(buckets, 'general'),
+        'age_category': _age_scheme(buckets, 'clinical'),
+    }
+
+
+def age_distribution(cells, scheme):
+    """Row counts over one of the page age binnings, in label order."""
+    return cells['count'].groupby(age_groups(cells, scheme), observed=False).sum()
+
+
+def crosstab(cells, index, columns):
+    """Row counts for each pair of values, like pd.crosstab on the rows."""
+    keys = [cells[k] if isinstance(k, str) else k for k in (index, columns)]
+    return cells['count'].groupby(keys, observed=True).sum().unstack(fill_value=0)
+
+
+def _interp(values, cum, q):
+    # Plotly's linear quantile (position q * n - 0.5) on the sorted values
+    # that the histogram (values, cumulative counts) stands for
+    n = cum[-1]
+    pos = min(max(q * n - 0.5, 0), n - 1)
+    lo, hi = int(np.floor(pos)), int(np.ceil(pos))
+    at = lambda i: values[np.searchsorted(cum, i, side='right')]
+    return (pos - lo) * at(hi) + (1 - (pos - lo)) * at(lo)
+
+
+def box_stats(histogram, by='medical_condition', measure=HISTOGRAM_MEASURE):
+    """Count, min, quartiles, max and mean per ``by`` value from histogram cells."""
+    counts = histogram.groupby([by, measure], observed=True)['count'].sum()
+    rows = {}
+    for key, group in counts.groupby(level=0, observed=True):
+        values = group.index.get_level_values(1).to_numpy(dtype='float64')
+        cum = np.cumsum(group.to_numpy())
+        rows[key] = {
+            'count': int(cum[-1]),
+            'min': values[0],
+            'q1': _interp(values, cum, 0.25),
+            'median': _interp(values, cum, 0.5),
+            'q3': _interp(values, cum, 0.75),
+            'max': values[-1],
+            'mean': float(values @ group.to_numpy()) / cum[-1],
+        }
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis(by)
+
+
+class AggregateCube:
+    """Cube cells sorted by month plus the row lookup needed for partial months."""
+
+    dimensions = DIMENSIONS
+    merge_aggs = MERGE_AGGS
+
+    def __init__(self, df, cells=None):
+        self.df = df
+        months = months_of(df)
+        self._month_rows = months.groupby(months).indices
+        self._set_bounds(df['date_of_admission'].groupby(months).agg(['min', 'max']))
+        self.cells = self.build(df) if cells is None else cells
+
+    def build(self, df):
+        return build_cells(df)
+
+    def _set_bounds(self, bounds):
+        self.months = bounds.index.values
+        self._month_min = bounds['min'].values
+        self._month_max = bounds['max'].values
+
+    def append(self, df, rows):
+        """Merge newly appended ``rows`` into the cube.
+
+        ``df`` is the full frame with ``rows`` already appended at its end.
+        Only the cells of the months the batch touches are re-merged.
+        """
+        offset = len(self.df)
+        self.df = df
+        months = months_of(rows)
+        for month, positions in months.groupby(months).indices.items():
+            positions = positions + offset
+            old = self._month_rows.get(month)
+            self._month_rows[month] = positions if old is None else np.concatenate([old, positions])
+
+        bounds = pd.DataFrame({'min': self._month_min, 'max': self._month_max}, index=self.months)
+        new_bounds = rows['date_of_admission'].groupby(months).agg(['min', 'max'])
+        bounds = pd.concat([bounds, new_bounds]).groupby(level=0).agg({'min': 'min', 'max': 'max'})
+        self._set_bounds(bounds)
+
+        # Batches may extend the categories; keep cell dtypes in step with df
+        for col in self.dimensions:
+            dtype = df[col].dtype if col in df.columns else None
+            held = self.cells[col].dtype
+            if isinstance(dtype, pd.CategoricalDtype) and isinstance(held, pd.CategoricalDtype) and held != dtype:
+                self.cells[col] = self.cells[col].cat.set_categories(dtype.categories)
+
+        new_cells = self.build(rows)
+        touched = self.cells['admission_month'].isin(new_cells['admission_month'].unique())
+        merged = merge_cells([self.cells[touched], new_cells], self.dimensions, self.merge_aggs)
+        cells = pd.concat([self.cells[~touched], merged], ignore_index=True)
+        self.cells = cells.sort_values('admission_month', kind='stable', ignore_index=True)
+        return new_cells
+
+    def select(self, start=None, end=None, gender=None, hospital=None):
+        """Cells for the sidebar filter state.
+
+        Months entirely inside the date range are sliced from the cube; the
+        (at most two) months the range cuts through are re-aggregated from
+        their own rows only, so results match row-level filtering exactly.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        overlap = np.ones(len(self.months), dtype=bool)
+        full = np.ones(len(self.months), dtype=bool)
+        if start is not None:
+            overlap &= self._month_max >= start
+            full &= self._month_min >= start
+        if end is not None:
+            overlap &= self._month_min <= end
+            full &= self._month_max <= end
+
+        parts = []
+        full_months = self.months[full]
+        if len(full_months):
+            month_values = self.cells['admission_month'].values
+            lo = np.searchsorted(month_values, full_months[0], side='left')
+            hi = np.searchsorted(month_values, full_months[-1], side='right')
+            parts.append(self.cells.iloc[lo:hi])
+
+        for month in self.months[overlap & ~full]:
+            rows = self.df.iloc[self._month_rows[month]]
+            dates = rows['date_of_admission']
+            mask = np.ones(len(rows), dtype=bool)
+            if start is not None:
+                mask &= (dates >= start).to_numpy()
+            if end is not None:
+                mask &= (dates <= end).to_numpy()
+            parts.append(self.build(rows[mask]))
+
+        cells = pd.concat(parts, ignore_index=True) if parts else self.cells.iloc[:0]
+        if gender is not None:
+            cells = cells[cells['gender'] == gender]
+        if hospital is not None:
+            cells = cells[cells['hospital'] == hospital]
+        return cells
+
+
+class HistogramCube(AggregateCube):
+    """Value counts of HISTOGRAM_MEASURE per cell, selected like the cube.
+
+    Box plots are drawn from ``box_stats`` over the selected cells, so their
+    size depends on the number of conditions rather than rows.
+    """
+
+    dimensions = HISTOGRAM_DIMENSIONS
+    merge_aggs = {'count': 'sum'}
+
+    def build(self, df):
+        return build_histogram(df)
@@ -0,0 +1,274 @@
+"""Encoded feature matrices for modeling, built from the Parquet dataset.
+
+    python features.py --out healthcare_features
+    python features.py --dense --workers 4
+
+The notebook label-encodes gender, admission type and test results, and
+one-hot encodes blood type, condition, insurer and medication with
+``pd.get_dummies(drop_first=True)`` into a dense frame written as CSV
+(healthcare_dataset_encoded.csv). The same encodings are written here, in
+--out, as binary arrays that can be memory-mapped (see ``load``):
+
+- ``codes.npy``: one unsigned code per row and column of CODE_COLS
+  (LABEL_COLS, then DUMMY_COLS); the dtype's largest value for missing;
+- ``onehot_indptr.npy``, ``onehot_indices.npy``: the get_dummies columns
+  as a CSR matrix of ones or, with --dense, ``onehot.npy`` in uint8;
+- ``numeric.npy``: NUM_COLS in float64;
+- ``features.json``: column names, vocabularies, input files and timings.
+
+Vocabularies are stable: a value keeps its code from one build to the next
+and new values are appended, so the columns of earlier matrices keep their
+meaning. A new vocabulary is sorted, like LabelEncoder's classes.
+
+Each file of the dataset is encoded on its own, with its own categories,
+in --workers processes, and cached in --cache under the hash of its
+content. The matrix is assembled from the cached files by mapping their
+categories to the vocabularies: unchanged files are never encoded again,
+and an unchanged dataset is not assembled again.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from chunks import ordered_map
+from preprocessing import DUMMY_COLS, LABEL_COLS, NUM_COLS
+from storage import PARQUET_PATH
+
+FEATURES_PATH = 'healthcare_features'
+CACHE_PATH = 'feature_cache'
+FORMAT_VERSION = 1
+CODE_COLS = LABEL_COLS + DUMMY_COLS
+# Content digests of the dataset's files by path, size and modification time
+DIGESTS = 'digests.json'
+
+_BLOCK = 1 << 20
+
+
+def file_digest(path):
+    """Hash of a file's content."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _encode_file(task):
+    # Local codes and categories of one file, cached under its digest
+    path, digest, cache_dir = task
+    digest = digest or file_digest(path)
+    target = os.path.join(cache_dir, f'{digest}.npz')
+    if os.path.exists(target):
+        return digest, False
+    df = pq.read_table(path, columns=CODE_COLS + NUM_COLS).to_pandas()
+    arrays = {'numeric': df[NUM_COLS].to_numpy(dtype='float64', na_value=np.nan)}
+    for col in CODE_COLS:
+        codes, uniques = pd.factorize(df[col], sort=True)
+        # Smallest signed type holding the codes and -1 for missing values,
+        # also when every value is missing
+        arrays[f'codes_{col}'] = codes.astype(np.min_scalar_type(-(len(uniques) + 1)))
+        arrays[f'categories_{col}'] = pd.Index(uniques).astype(str).to_numpy(dtype=str)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, target)
+    return digest, True
+
+
+def extend_vocabulary(vocabulary, values):
+    """``vocabulary`` followed by the unseen ``values``, sorted."""
+    known = set(vocabulary)
+    return list(vocabulary) + sorted({v for v in values if v not in known})
+
+
+def code_dtype(vocabulary):
+    """Smallest unsigned type holding every code and the missing code."""
+    longest = max((len(values) for values in vocabulary.values()), default=0)
+    return np.dtype('uint8') if longest < 255 else np.dtype('uint16') if longest < 65535 else np.dtype('uint32')
+
+
+def onehot_columns(vocabulary):
+    """get_dummies(drop_first=True) column names and each column's offset.
+
+    A code ``c`` > 0 of ``col`` sets one-hot column ``offsets[col] + c``.
+    """
+    names, offsets = [], {}
+    for col in DUMMY_COLS:
+        offsets[col] = len(names) - 1
+        names += [f'{col}_{value}' for value in vocabulary[col][1:]]
+    return names, offsets
+
+
+def _assemble(chunks, vocabulary, out, dense):
+    # Write codes, numeric and one-hot arrays of the cached chunks into ``out``
+    dtype = code_dtype(vocabulary)
+    missing = np.iinfo(dtype).max
+    rows = sum(len(chunk['numeric']) for chunk in chunks)
+    names, offsets = onehot_columns(vocabulary)
+    codes = np.lib.format.open_memmap(os.path.join(out, 'codes.npy'), 'w+', dtype, (rows, len(CODE_COLS)))
+    numeric = np.lib.format.open_memmap(os.path.join(out, 'numeric.npy'), 'w+', 'float64', (rows, len(NUM_COLS)))
+    onehot = np.lib.format.open_memmap(os.path.join(out, 'onehot.npy'), 'w+', 'uint8', (rows, len(names))) if dense else None
+    indices, counts = [], []
+    vocab_index = {col: pd.Index(vocabulary[col]) for col in CODE_COLS}
+    dummy = np.array([offsets[col] for col in DUMMY_COLS])
+    lo = 0
+    for chunk in chunks:
+        hi = lo + len(chunk['numeric'])
+        numeric[lo:hi] = chunk['numeric']
+        for j, col in enumerate(CODE_COLS):
+            # Local code -> vocabulary code; the local -1 takes the last slot
+            lookup = np.append(vocab_index[col].get_indexer(chunk[f'categories_{col}']), missing).astype(dtype)
+            codes[lo:hi, j] = lookup[chunk[f'codes_{col}']]
+
+        block = codes[lo:hi, len(LABEL_COLS):].astype('int64')
+        hot = (block > 0) & (block != missing)
+        # Row-major order keeps each row's column indices sorted
+        columns = (block + dummy)[hot]
+        if dense:
+            onehot[lo:hi][np.nonzero(hot)[0], columns] = 1
+        else:
+            indices.append(columns.astype('int32'))
+            counts.append(hot.sum(axis=1))
+        lo = hi
+
+    for array in (codes, numeric, onehot):
+        if array is not None:
+            array.flush()
+    if not dense:
+        np.save(os.path.join(out, 'onehot_indices.npy'), np.concatenate(indices) if indices else np.zeros(0, 'int32'))
+        np.save(os.path.join(out, 'onehot_indptr.npy'),
+                np.concatenate([[0], np.cumsum(np.concatenate(counts) if counts else [])]).astype('int64'))
+    return rows, names, int(missing)
+
+
+def output_bytes(path):
+    """Bytes of the arrays and metadata of a build."""
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def build(parquet_path=PARQUET_PATH, out=FEATURES_PATH, cache_dir=CACHE_PATH, dense=False, workers=None):
+    """Encode the dataset at ``parquet_path`` into ``out``, reusing what is cached.
+
+    Returns the build's summary: rows, files, files encoded, bytes written,
+    seconds and whether the previous build was reused as is.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    os.makedirs(cache_dir, exist_ok=True)
+    files = sorted(ds.dataset(parquet_path, format='parquet', partitioning='hive').files)
+
+    # Files with the size and modification time of a hashed file are not read again
+    known = _read_json(os.path.join(cache_dir, DIGESTS), {})
+    tasks = (
+        (path, known[path][2] if known.get(path, [None])[:2] == _stat(path) else None, cache_dir)
+        for path in files
+    )
+    results = list(ordered_map(_encode_file, tasks, workers))
+    digests = [digest for digest, _ in results]
+    encoded = sum(new for _, new in results)
+    _write_json(os.path.join(cache_dir, DIGESTS),
+                {path: _stat(path) + [digest] for path, digest in zip(files, digests)})
+    # Drop cached files of removed or changed inputs
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npz') and name[:-4] not in digests:
+            os.remove(os.path.join(cache_dir, name))
+
+    layout = 'dense' if dense else 'csr'
+    key = hashlib.blake2b(json.dumps([FORMAT_VERSION, layout, digests]).encode(), digest_size=16).hexdigest()
+    meta_path = os.path.join(out, 'features.json')
+    previous = _read_json(meta_path)
+    summary = {'files': len(files), 'encoded': encoded}
+    if previous and previous['key'] == key:
+        return {**summary, 'rows': previous['rows'], 'bytes': output_bytes(out), 'reused': True,
+                'seconds': time.perf_counter() - start}
+
+    chunks = [np.load(os.path.join(cache_dir, f'{digest}.npz')) for digest in digests]
+    vocabulary = previous['vocabulary'] if previous else {}
+    vocabulary = {
+        col: extend_vocabulary(vocabulary.get(col, []),
+                               (v for chunk in chunks for v in chunk[f'categories_{col}'].tolist()))
+        for col in CODE_COLS
+    }
+    tmp = out + '.tmp'
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+    rows, names, missing = _assemble(chunks, vocabulary, tmp, dense)
+    seconds = time.perf_counter() - start
+    _write_json(os.path.join(tmp, 'features.json'), {
+        'key': key, 'format_version': FORMAT_VERSION, 'layout': layout, 'rows': rows,
+        'columns': {'codes': CODE_COLS, 'numeric': NUM_COLS, 'onehot': names},
+        'missing_code': missing, 'vocabulary': vocabulary,
+        'files': [[os.path.relpath(path, parquet_path), digest] for path, digest in zip(files, digests)],
+        'seconds': seconds,
+    })
+    if os.path.exists(out):
+        shutil.rmtree(out)
+    os.replace(tmp, out)
+    return {**summary, 'rows': rows, 'bytes': output_bytes(out), 'reused': False, 'seconds': seconds}
+
+
+def load(path=FEATURES_PATH, mmap_mode='r'):
+    """The one-hot matrix, codes, numeric columns and metadata of a build.
+
+    The one-hot matrix is a scipy CSR matrix (scipy is only needed here)
+    or, for a --dense build, a uint8 array.
+    """
+    meta = _read_json(os.path.join(path, 'features.json'))
+    if meta is None:
+        raise FileNotFoundError(f'no feature matrix in {path}; run features.py first')
+    array = lambda name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+    if meta['layout'] == 'dense':
+        onehot = array('onehot')
+    else:
+        from scipy.sparse import csr_matrix
+        indices = array('onehot_indices')
+        onehot = csr_matrix((np.ones(len(indices), dtype='uint8'), indices, array('onehot_indptr')),
+                            shape=(meta['rows'], len(meta['columns']['onehot'])))
+    return onehot, array('codes'), array('numeric'), meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--parquet', default=PARQUET_PATH)
+    parser.add_argument('--out', default=FEATURES_PATH)
+    parser.add_argument('--cache', default=CACHE_PATH, help='encoded files by content hash')
+    parser.add_argument('--dense', action='store_true', help='one-hot columns as a dense uint8 matrix')
+    parser.add_argument('--workers', type=int, help='processes encoding files (default: all cores)')
+    args = parser.parse_args()
+
+    result = build(args.parquet, args.out, args.cache, args.dense, args.workers)
+    state = 'unchanged, reused' if result['reused'] else f"{result['encoded']} of {result['files']} files encoded"
+    print(f"{result['rows']:,} rows in {args.out} ({result['bytes'] / 1e6:,.1f} MB, {state}) "
+          f"in {result['seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
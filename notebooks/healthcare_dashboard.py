@@ -1,11 +1,19 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import datetime
-import numpy as np
-from io import StringIO
+import os
+import json
+
+import charts
+import page_figures
+import profiling
+import shared
+import table
+from preprocessing import load_stats
+from storage import CSV_PATH, PARQUET_PATH, ensure_parquet, load_parquet
+from store import DASHBOARD_COLUMNS, DataStore, prepare_frame
+from streaming import RAW_PATH, stream_load
+from timeseries import FREQUENCIES
+from warmup import Warmup
 
 # Page configuration
 st.set_page_config(
@@ -15,21 +23,59 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Reruns kept for the profiling panel's downloads
+TRACE_HISTORY = 50
+
+# Seconds the home page waits for its quick figures before showing placeholders
+SUMMARY_WAIT = 2
+
 # Load data
-@st.cache_data
-def load_data():
-    # Read the CSV content from the provided string
-    data = pd.read_csv('healthcare_dataset_preprocessed.csv')
-    
-    # Convert date columns
-    date_cols = ['date_of_admission', 'discharge_date']
-    for col in date_cols:
-        if col in data.columns:
-            data[col] = pd.to_datetime(data[col], errors='coerce')
-    
-    return data
+def load_store():
+    # Convert the preprocessed CSV to Parquet once, then keep the dashboard
+    # columns in a store shared by all sessions; new batches are merged in
+    if not os.path.exists(PARQUET_PATH) and not os.path.exists(CSV_PATH) and os.path.exists(RAW_PATH):
+        # Only a raw extract is available: stream it with bounded memory and
+        # keep the cleaned rows as Parquet for the next start
+        result = stream_load(RAW_PATH, DASHBOARD_COLUMNS, parquet_path=PARQUET_PATH)
+        return DataStore(result.df, stats=result.stats, parquet_path=PARQUET_PATH, cells=result.cells)
+    # Server processes on this host attach to one published copy of the rows
+    path = ensure_parquet()
+    df, parts = shared.load(path, DASHBOARD_COLUMNS, prepare_frame)
+    return DataStore(df, stats=load_stats(), parquet_path=path, parts=parts)
+
+def merge_batches(store):
+    # Merge batches dropped into incoming/ and those other server processes
+    # merged; processes started later attach the merged rows
+    if store.ingest_pending():
+        df, parts = store.snapshot()
+        shared.republish(df, parts, store.parquet_path, DASHBOARD_COLUMNS, prepare_frame)
+
+def load_summary():
+    # Home page figures from three columns, ready well before the full store
+    return page_figures.home(load_parquet(PARQUET_PATH, ['date_of_admission', 'hospital', 'medical_condition']))
+
+# Loading and pre-aggregation start in the background with the first run
+# of the server process and are shared by all sessions
+@st.cache_resource
+def get_warmup():
+    warmup = Warmup(
+        load_store,
+        summary=load_summary if os.path.exists(PARQUET_PATH) else None,
+        pages={page: lambda store, page=page: page_figures.default_view(store, page)
+               for page in ['general', 'clinical', 'financial']}
+    )
+    warmup.serve_health()
+    return warmup.start()
 
-df = load_data()
+def load_data():
+    warmup = get_warmup()
+    with profiling.span('load_data') as record:
+        if not warmup.loaded:
+            with st.spinner("Loading data..."):
+                warmup.store()
+        store = warmup.store()
+        record['rows'] = len(store.df)
+    return store
 
 # Custom CSS for better styling
 st.markdown("""
@@ -97,11 +143,25 @@ def create_navigation():
         label_visibility="collapsed"
     )
     
+    warmup_status()
+    
+    # The home page is drawn from partial results while the data loads
+    if pages[selected_page] == "home":
+        if get_warmup().loaded:
+            merge_batches(load_data())
+        return "home", None, {}
+    
+    # Merge any newly arrived admission batches
+    store = load_data()
+    merge_batches(store)
+    df = store.df
+    
     # Add filters to sidebar for relevant pages
     st.sidebar.markdown("---")
     
     if pages[selected_page] in ["general", "clinical", "financial"]:
         st.sidebar.markdown("### 🎯 Filters")
+        filters = {}
         
         # Date range filter
         min_date = df['date_of_admission'].min()
@@ -116,17 +176,14 @@ def create_navigation():
         
         if len(date_range) == 2:
             start_date, end_date = date_range
-            filtered_df = df[(df['date_of_admission'] >= pd.Timestamp(start_date)) & 
-                            (df['date_of_admission'] <= pd.Timestamp(end_date))]
-        else:
-            filtered_df = df.copy()
+            filters['start'], filters['end'] = pd.Timestamp(start_date), pd.Timestamp(end_date)
         
         # Gender filter
         genders = ["All"] + list(df['gender'].unique())
         selected_gender = st.sidebar.selectbox("Gender", genders)
         
         if selected_gender != "All":
-            filtered_df = filtered_df[filtered_df['gender'] == selected_gender]
+            filters['gender'] = selected_gender
         
         # Hospital filter for financial page
         if pages[selected_page] == "financial":
@@ -134,11 +191,18 @@ def create_navigation():
             selected_hospital = st.sidebar.selectbox("Hospital", hospitals)
             
             if selected_hospital != "All":
-                filtered_df = filtered_df[filtered_df['hospital'] == selected_hospital]
+                filters['hospital'] = selected_hospital
         
-        return pages[selected_page], filtered_df
-    
-    return pages[selected_page], df
+    # Positions of the matching rows; the held frame is never copied
+    return pages[selected_page], store.rows(filters), filters
+
+def warmup_status():
+    warmup = get_warmup()
+    if warmup.ready:
+        return
+    status = warmup.status()
+    running = [name for name, stage in status['stages'].items() if stage['state'] != 'done']
+    st.sidebar.progress(status['progress'], text=f"Warming up: {', '.join(running)}")
 
 # Page 1: Home / Overview
 def home_page():
@@ -157,41 +221,12 @@ def home_page():
         </div>
         """, unsafe_allow_html=True)
     
-    # Key metrics in cards
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown(f"""
-        <div class="metric-card">
-        <h3>👥 Total Patients</h3>
-        <h2>{len(df):,}</h2>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div class="metric-card">
-        <h3>🏥 Hospitals</h3>
-        <h2>{df['hospital'].nunique()}</h2>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        date_range = f"{df['date_of_admission'].min().year} - {df['date_of_admission'].max().year}"
-        st.markdown(f"""
-        <div class="metric-card">
-        <h3>📅 Period</h3>
-        <h2>{date_range}</h2>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown(f"""
-        <div class="metric-card">
-        <h3>🩺 Conditions</h3>
-        <h2>{df['medical_condition'].nunique()}</h2>
-        </div>
-        """, unsafe_allow_html=True)
+    # Key metrics in cards, from partial results while the data loads
+    warmup = get_warmup()
+    if warmup.loaded:
+        metric_cards(warmup)
+    else:
+        st.fragment(run_every=1)(metric_cards)(warmup)
     
     # Navigation section
     st.markdown("---")
@@ -225,107 +260,189 @@ def home_page():
             st.rerun()
         st.markdown("**Cost Analysis**")
         st.markdown("Billing, hospital performance")
-
-# Page 2: General Analysis
-def general_analysis_page(filtered_df):
-    st.markdown('<h1 class="main-header">📊 General Analysis</h1>', unsafe_allow_html=True)
-    st.markdown('<h2 class="sub-header">Patient Demographics & Overview</h2>', unsafe_allow_html=True)
     
-    # KPI Row
-    st.markdown('<h3 class="section-title">📈 Key Performance Indicators</h3>', unsafe_allow_html=True)
+    # Data quality of all admissions, from the store's running profile
+    if warmup.loaded:
+        quality_panel(warmup.store())
+
+def quality_panel(store):
+    st.markdown("---")
+    st.markdown('<h2 class="section-title">🧪 Data Quality</h2>', unsafe_allow_html=True)
+    with profiling.span('quality_panel'):
+        rules, columns, totals = store.quality_report()
+    show_metrics({
+        "Validation Score": f"{totals['validation_score']:.3f}",
+        "Rows Checked": f"{totals['rows']:,}",
+        "Missing Values": f"{totals['missing']:,}",
+        "Imputed in Batches": f"{totals['imputed']:,}",
+    })
+    st.dataframe(
+        rules, hide_index=True, use_container_width=True,
+        column_config={
+            'rule': "Rule",
+            'rows_checked': st.column_config.NumberColumn("Rows Checked", format="%d"),
+            'violations': st.column_config.NumberColumn("Violations", format="%d"),
+            'share': st.column_config.NumberColumn("Share", format="percent"),
+        }
+    )
+    with st.expander("Column profiles"):
+        st.dataframe(
+            columns, hide_index=True, use_container_width=True,
+            column_config={
+                'missing_share': st.column_config.NumberColumn("missing share", format="percent"),
+                **{col: st.column_config.NumberColumn(format="%.2f") for col in ['mean', 'std', 'min', 'max']},
+            }
+        )
+    if totals['batches']:
+        st.caption(f"Includes {totals['batches']} merged batch(es); discharge dates are only checked on batches.")
+
+def metric_cards(warmup):
+    if warmup.loaded:
+        if not st.session_state.get('home_loaded', True):
+            # The load finished while partial cards were shown
+            st.session_state.home_loaded = True
+            st.rerun()
+        store = warmup.store()
+        metrics = store.cached(('page', 'home'), {}, lambda: page_figures.home(store.df))
+    else:
+        st.session_state.home_loaded = False
+        metrics = warmup.partial(timeout=SUMMARY_WAIT) or {}
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        avg_age = filtered_df['age'].mean()
-        st.metric("Average Age", f"{avg_age:.1f} years")
+        st.markdown(f"""
+        <div class="metric-card">
+        <h3>👥 Total Patients</h3>
+        <h2>{f"{metrics['patients']:,}" if metrics else "…"}</h2>
+        </div>
+        """, unsafe_allow_html=True)
     
     with col2:
-        avg_stay = filtered_df['length_of_stay'].mean()
-        st.metric("Avg Length of Stay", f"{avg_stay:.1f} days")
+        st.markdown(f"""
+        <div class="metric-card">
+        <h3>🏥 Hospitals</h3>
+        <h2>{metrics.get('hospitals', '…')}</h2>
+        </div>
+        """, unsafe_allow_html=True)
     
     with col3:
-        total_billing = filtered_df['billing_amount'].sum()
-        st.metric("Total Billing", f"${total_billing:,.0f}")
+        st.markdown(f"""
+        <div class="metric-card">
+        <h3>📅 Period</h3>
+        <h2>{metrics.get('period', '…')}</h2>
+        </div>
+        """, unsafe_allow_html=True)
     
     with col4:
-        patients_per_hospital = len(filtered_df) / filtered_df['hospital'].nunique()
-        st.metric("Patients per Hospital", f"{patients_per_hospital:.0f}")
+        st.markdown(f"""
+        <div class="metric-card">
+        <h3>🩺 Conditions</h3>
+        <h2>{metrics.get('conditions', '…')}</h2>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    if not warmup.loaded:
+        st.caption("Loading the full dataset; figures are from a quick scan and update when it completes.")
+
+def plot_chart(figures, name):
+    # Traced with the size of the figure sent to the browser; a selection
+    # without admissions has no figures
+    if name not in figures:
+        st.info("No admissions match the selected filters")
+        return
+    with profiling.span(f'chart:{name}') as record:
+        st.plotly_chart(figures[name], use_container_width=True)
+    if profiling.active():
+        record['figure_bytes'] = profiling.figure_bytes(figures[name])
+
+def trend_granularity():
+    # Trends are rolled up from daily counts; the choice is shared by the pages
+    st.radio("Granularity", list(FREQUENCIES), index=list(FREQUENCIES).index('Monthly'),
+             horizontal=True, key="trend_freq", label_visibility="collapsed")
+
+def show_metrics(metrics):
+    for col, (label, value) in zip(st.columns(len(metrics)), metrics.items()):
+        with col:
+            st.metric(label, value)
+
+# Page 2: General Analysis
+def general_analysis_page(rows, filters):
+    st.markdown('<h1 class="main-header">📊 General Analysis</h1>', unsafe_allow_html=True)
+    st.markdown('<h2 class="sub-header">Patient Demographics & Overview</h2>', unsafe_allow_html=True)
+    
+    # Aggregates and figures are computed once per filter state and granularity
+    granularity = st.session_state.get('trend_freq', 'Monthly')
+    view = page_figures.view(load_data(), 'general', filters, rows, freq=FREQUENCIES[granularity])
+    figures = view['figures']
+    
+    # KPI Row
+    st.markdown('<h3 class="section-title">📈 Key Performance Indicators</h3>', unsafe_allow_html=True)
+    show_metrics(view['metrics'])
     
     # Charts Row 1
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("##### 👥 Age Distribution")
-        # Create age groups
-        bins = [0, 18, 30, 45, 60, 100]
-        labels = ['0-18', '19-30', '31-45', '46-60', '60+']
-        filtered_df['age_group'] = pd.cut(filtered_df['age'], bins=bins, labels=labels, right=False)
-        
-        age_dist = filtered_df['age_group'].value_counts().sort_index()
-        fig1 = px.bar(
-            x=age_dist.index, 
-            y=age_dist.values,
-            labels={'x': 'Age Group', 'y': 'Number of Patients'},
-            color=age_dist.values,
-            color_continuous_scale='Blues'
-        )
-        fig1.update_layout(showlegend=False)
-        st.plotly_chart(fig1, use_container_width=True)
+        plot_chart(figures, 'age')
     
     with col2:
         st.markdown("##### ♀️♂️ Gender Distribution")
-        gender_dist = filtered_df['gender'].value_counts()
-        fig2 = px.pie(
-            values=gender_dist.values, 
-            names=gender_dist.index,
-            hole=0.4,
-            color_discrete_sequence=px.colors.qualitative.Set2
-        )
-        fig2.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig2, use_container_width=True)
+        plot_chart(figures, 'gender')
     
     # Charts Row 2
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("##### 🩸 Blood Type Distribution")
-        blood_dist = filtered_df['blood_type'].value_counts()
-        fig3 = px.bar(
-            x=blood_dist.index, 
-            y=blood_dist.values,
-            labels={'x': 'Blood Type', 'y': 'Number of Patients'},
-            color=blood_dist.values,
-            color_continuous_scale='Reds'
-        )
-        fig3.update_layout(showlegend=False)
-        st.plotly_chart(fig3, use_container_width=True)
+        plot_chart(figures, 'blood')
     
     with col2:
-        st.markdown("##### 📅 Monthly Admissions Trend")
-        # Resample by month
-        monthly_data = filtered_df.set_index('date_of_admission').resample('M').size()
-        fig4 = px.line(
-            x=monthly_data.index, 
-            y=monthly_data.values,
-            labels={'x': 'Date', 'y': 'Number of Admissions'},
-            line_shape='spline'
-        )
-        fig4.update_traces(line=dict(width=3, color='#1f77b4'))
-        st.plotly_chart(fig4, use_container_width=True)
+        st.markdown(f"##### 📅 {granularity} Admissions Trend")
+        trend_granularity()
+        plot_chart(figures, 'trend')
     
-    # Data table
-    st.markdown('<h3 class="section-title">📋 Sample Data</h3>', unsafe_allow_html=True)
-    st.dataframe(
-        filtered_df[['name', 'age', 'gender', 'medical_condition', 'hospital', 'date_of_admission']].head(10),
-        use_container_width=True
-    )
+    # Patient records, one page at a time
+    st.markdown('<h3 class="section-title">📋 Patient Records</h3>', unsafe_allow_html=True)
+    patient_table(filters)
+
+# Paging, sorting and searching rerun only the table, and only the shown
+# page of rows is sent to the browser
+@st.fragment
+def patient_table(filters):
+    store = load_data()
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        search = st.text_input("Search by name", key="table_search").strip()
+    with col2:
+        sort = st.selectbox("Sort by", table.SORT_COLUMNS, key="table_sort",
+                            format_func=lambda col: col.replace('_', ' ').title())
+    with col3:
+        descending = st.radio("Order", ["Asc", "Desc"], horizontal=True, key="table_order") == "Desc"
+    with col4:
+        size = st.selectbox("Rows", table.PAGE_SIZES, index=1, key="table_size")
+    columns = st.multiselect("Columns", table.TABLE_COLUMNS, default=table.DEFAULT_COLUMNS, key="table_columns",
+                             format_func=lambda col: col.replace('_', ' ').title()) or table.DEFAULT_COLUMNS
+    
+    total = len(store.table_rows(filters, sort, search))
+    pages = max(1, -(-total // size))
+    number = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, step=1)
+    with profiling.span('table:patients') as record:
+        rows, total = table.page(store, filters, sort, descending, search, columns, number, size)
+        record['rows'] = len(rows)
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    first = (number - 1) * size + 1 if total else 0
+    st.caption(f"Rows {first:,}-{first + len(rows) - 1 if total else 0:,} of {total:,} matching admissions")
 
 # Page 3: Clinical Analysis
-def clinical_analysis_page(filtered_df):
+def clinical_analysis_page(rows, filters):
     st.markdown('<h1 class="main-header">🏥 Clinical Analysis</h1>', unsafe_allow_html=True)
     st.markdown('<h2 class="sub-header">Medical Conditions & Patient Care Metrics</h2>', unsafe_allow_html=True)
     
+    store = load_data()
+    figures = page_figures.view(store, 'clinical', filters, rows)['figures']
+    
     # Medical Conditions Analysis
     st.markdown('<h3 class="section-title">🩺 Medical Conditions Overview</h3>', unsafe_allow_html=True)
     
@@ -333,27 +450,11 @@ def clinical_analysis_page(filtered_df):
     
     with col1:
         st.markdown("##### 📊 Patients per Medical Condition")
-        condition_dist = filtered_df['medical_condition'].value_counts()
-        fig1 = px.bar(
-            y=condition_dist.index, 
-            x=condition_dist.values,
-            orientation='h',
-            labels={'x': 'Number of Patients', 'y': 'Medical Condition'},
-            color=condition_dist.values,
-            color_continuous_scale='Viridis'
-        )
-        fig1.update_layout(showlegend=False, height=400)
-        st.plotly_chart(fig1, use_container_width=True)
+        plot_chart(figures, 'conditions')
     
     with col2:
         st.markdown("##### 🎯 Conditions Share (Treemap)")
-        fig2 = px.treemap(
-            filtered_df, 
-            path=['medical_condition'],
-            color_discrete_sequence=px.colors.qualitative.Pastel
-        )
-        fig2.update_layout(height=400)
-        st.plotly_chart(fig2, use_container_width=True)
+        plot_chart(figures, 'treemap')
     
     # Length of Stay Analysis
     st.markdown('<h3 class="section-title">⏱️ Length of Stay Analysis</h3>', unsafe_allow_html=True)
@@ -362,140 +463,67 @@ def clinical_analysis_page(filtered_df):
     
     with col1:
         st.markdown("##### 📈 Average Stay by Condition")
-        avg_stay_by_condition = filtered_df.groupby('medical_condition')['length_of_stay'].mean().sort_values()
-        fig3 = px.bar(
-            y=avg_stay_by_condition.index, 
-            x=avg_stay_by_condition.values,
-            orientation='h',
-            labels={'x': 'Average Length of Stay (days)', 'y': 'Medical Condition'},
-            color=avg_stay_by_condition.values,
-            color_continuous_scale='Blues'
-        )
-        fig3.update_layout(showlegend=False, height=400)
-        st.plotly_chart(fig3, use_container_width=True)
+        plot_chart(figures, 'avg_stay')
     
     with col2:
         st.markdown("##### 📊 Stay Distribution")
-        # Create box plot for stay distribution
-        fig4 = px.box(
-            filtered_df, 
-            x='medical_condition', 
-            y='length_of_stay',
-            points=False,
-            color='medical_condition',
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
-        fig4.update_layout(
-            height=400,
-            xaxis_title="Medical Condition",
-            yaxis_title="Length of Stay (days)",
-            showlegend=False
-        )
-        st.plotly_chart(fig4, use_container_width=True)
+        plot_chart(figures, 'stay_box')
     
     # Age vs Condition Analysis
     st.markdown('<h3 class="section-title">👵 Age Groups & Medical Conditions</h3>', unsafe_allow_html=True)
-    
-    # Create age groups
-    bins = [0, 30, 50, 70, 100]
-    labels = ['<30', '30-50', '50-70', '70+']
-    filtered_df['age_category'] = pd.cut(filtered_df['age'], bins=bins, labels=labels, right=False)
-    
-    condition_by_age = pd.crosstab(filtered_df['age_category'], filtered_df['medical_condition'])
-    
-    fig5 = px.bar(
-        condition_by_age,
-        barmode='stack',
-        color_discrete_sequence=px.colors.qualitative.Set3,
-        labels={'value': 'Number of Patients', 'age_category': 'Age Group'}
-    )
-    fig5.update_layout(height=500)
-    st.plotly_chart(fig5, use_container_width=True)
+    plot_chart(figures, 'age_conditions')
     
     # Test Results Analysis
-    if 'test_results' in filtered_df.columns:
+    if 'test_results' in store.df.columns:
         st.markdown('<h3 class="section-title">🧪 Test Results Analysis</h3>', unsafe_allow_html=True)
         
         col1, col2 = st.columns(2)
         
         with col1:
-            test_results = filtered_df['test_results'].value_counts()
-            fig6 = px.pie(
-                values=test_results.values,
-                names=test_results.index,
-                hole=0.3,
-                color_discrete_sequence=px.colors.qualitative.Pastel
-            )
-            fig6.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig6, use_container_width=True)
+            plot_chart(figures, 'tests')
         
         with col2:
-            test_by_condition = pd.crosstab(filtered_df['medical_condition'], filtered_df['test_results'])
-            fig7 = px.imshow(
-                test_by_condition,
-                labels=dict(x="Test Result", y="Medical Condition", color="Count"),
-                color_continuous_scale='YlOrRd'
-            )
-            st.plotly_chart(fig7, use_container_width=True)
+            plot_chart(figures, 'tests_by_condition')
 
 # Page 4: Financial Analysis
-def financial_analysis_page(filtered_df):
+def financial_analysis_page(rows, filters):
     st.markdown('<h1 class="main-header">💰 Financial & Operational Analysis</h1>', unsafe_allow_html=True)
     st.markdown('<h2 class="sub-header">Healthcare Costs & Hospital Performance</h2>', unsafe_allow_html=True)
     
+    # The scatter display and top-10 modes are part of the cached state
+    scatter_mode = 'auto'
+    if len(rows) > charts.POINT_BUDGET:
+        scatter_mode = st.session_state.get('room_scatter_mode', 'Sample').lower()
+    top_mode = st.session_state.get('top_mode', 'Exact').lower()
+    granularity = st.session_state.get('trend_freq', 'Monthly')
+    store = load_data()
+    view = page_figures.view(store, 'financial', filters, rows, scatter_mode, top_mode, FREQUENCIES[granularity])
+    figures = view['figures']
+    
     # Financial KPIs
     st.markdown('<h3 class="section-title">💵 Financial Key Performance Indicators</h3>', unsafe_allow_html=True)
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        total_billing = filtered_df['billing_amount'].sum()
-        st.metric("Total Billing Amount", f"${total_billing:,.0f}")
-    
-    with col2:
-        avg_billing = filtered_df['billing_amount'].mean()
-        st.metric("Average per Patient", f"${avg_billing:,.0f}")
-    
-    with col3:
-        billing_per_day = total_billing / filtered_df['length_of_stay'].sum() if filtered_df['length_of_stay'].sum() > 0 else 0
-        st.metric("Billing per Patient-Day", f"${billing_per_day:,.0f}")
-    
-    with col4:
-        patients_per_condition = len(filtered_df) / filtered_df['medical_condition'].nunique()
-        st.metric("Patients per Condition", f"{patients_per_condition:.0f}")
+    show_metrics(view['metrics'])
     
     # Hospital Performance
     st.markdown('<h3 class="section-title">🏥 Hospital Performance Comparison</h3>', unsafe_allow_html=True)
+    st.radio("Top 10", ["Exact", "Streaming"], horizontal=True, key="top_mode",
+             help="Streaming ranks all admissions received so far, ignoring the filters, "
+                  "from fixed-size heavy-hitter summaries")
+    top = view['top']
+    if top:
+        st.caption(f"Streaming top 10 over {top['admissions']:,} admissions "
+                   f"({top['capacity']:,} counters): billing within ${top['hospital_error']:,.0f}, "
+                   f"room counts within {top['room_error']:,.0f} of the true totals")
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("##### 💰 Which hospitals generate the highest costs?")
-        billing_by_hospital = filtered_df.groupby('hospital')['billing_amount'].sum().sort_values(ascending=False).head(10)
-        fig1 = px.bar(
-            x=billing_by_hospital.values,
-            y=billing_by_hospital.index,
-            orientation='h',
-            labels={'x': 'Total Billing Amount ($)', 'y': 'Hospital'},
-            color=billing_by_hospital.values,
-            color_continuous_scale='Reds'
-        )
-        fig1.update_layout(showlegend=False, height=400)
-        st.plotly_chart(fig1, use_container_width=True)
+        plot_chart(figures, 'hospital_billing')
     
     with col2:
         st.markdown("##### ⏱️ Average Length of Stay by Hospital")
-        stay_by_hospital = filtered_df.groupby('hospital')['length_of_stay'].mean().sort_values(ascending=False).head(10)
-        fig2 = px.bar(
-            x=stay_by_hospital.values,
-            y=stay_by_hospital.index,
-            orientation='h',
-            labels={'x': 'Average Length of Stay (days)', 'y': 'Hospital'},
-            color=stay_by_hospital.values,
-            color_continuous_scale='Blues'
-        )
-        fig2.update_layout(showlegend=False, height=400)
-        st.plotly_chart(fig2, use_container_width=True)
+        plot_chart(figures, 'hospital_stay')
     
     # Insurance Analysis
     st.markdown('<h3 class="section-title">🛡️ Insurance Provider Analysis</h3>', unsafe_allow_html=True)
@@ -504,92 +532,39 @@ def financial_analysis_page(filtered_df):
     
     with col1:
         st.markdown("##### 📊 Billing Distribution by Insurance")
-        billing_by_insurance = filtered_df.groupby('insurance_provider')['billing_amount'].sum()
-        fig3 = px.pie(
-            values=billing_by_insurance.values,
-            names=billing_by_insurance.index,
-            hole=0.3,
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
-        fig3.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig3, use_container_width=True)
+        plot_chart(figures, 'insurance_billing')
     
     with col2:
         st.markdown("##### 👥 Patients per Insurance Provider")
-        patients_by_insurance = filtered_df['insurance_provider'].value_counts()
-        fig4 = px.bar(
-            x=patients_by_insurance.index,
-            y=patients_by_insurance.values,
-            labels={'x': 'Insurance Provider', 'y': 'Number of Patients'},
-            color=patients_by_insurance.values,
-            color_continuous_scale='Greens'
-        )
-        fig4.update_layout(showlegend=False, height=400)
-        st.plotly_chart(fig4, use_container_width=True)
+        plot_chart(figures, 'insurance_patients')
     
     # Time Trend Analysis
-    st.markdown('<h3 class="section-title">📈 Monthly Billing Trend</h3>', unsafe_allow_html=True)
-    
-    # Create monthly billing trend
-    filtered_df['admission_month'] = filtered_df['date_of_admission'].dt.to_period('M')
-    monthly_billing = filtered_df.groupby('admission_month')['billing_amount'].sum()
-    monthly_billing.index = monthly_billing.index.astype(str)
-    
-    fig5 = px.line(
-        x=monthly_billing.index,
-        y=monthly_billing.values,
-        labels={'x': 'Month', 'y': 'Total Billing Amount ($)'},
-        line_shape='spline',
-        markers=True
-    )
-    fig5.update_traces(line=dict(width=3, color='#2ca02c'))
-    fig5.update_layout(height=400)
-    st.plotly_chart(fig5, use_container_width=True)
+    st.markdown(f'<h3 class="section-title">📈 {granularity} Billing Trend</h3>', unsafe_allow_html=True)
+    trend_granularity()
+    plot_chart(figures, 'trend')
     
     # Cost per Condition
     st.markdown('<h3 class="section-title">🏷️ Average Cost per Medical Condition</h3>', unsafe_allow_html=True)
-    
-    cost_by_condition = filtered_df.groupby('medical_condition')['billing_amount'].mean().sort_values(ascending=False)
-    
-    fig6 = px.bar(
-        x=cost_by_condition.index,
-        y=cost_by_condition.values,
-        labels={'x': 'Medical Condition', 'y': 'Average Billing Amount ($)'},
-        color=cost_by_condition.values,
-        color_continuous_scale='Viridis'
-    )
-    fig6.update_layout(showlegend=False, height=400)
-    st.plotly_chart(fig6, use_container_width=True)
+    plot_chart(figures, 'condition_cost')
     
     # Room Number Analysis (if exists)
-    if 'room_number' in filtered_df.columns:
+    if 'room_number' in store.df.columns:
         st.markdown('<h3 class="section-title">🚪 Room Utilization Analysis</h3>', unsafe_allow_html=True)
         
         col1, col2 = st.columns(2)
         
         with col1:
-            # Most used rooms
-            room_usage = filtered_df['room_number'].value_counts().head(10)
-            fig7 = px.bar(
-                x=room_usage.index.astype(str),
-                y=room_usage.values,
-                labels={'x': 'Room Number', 'y': 'Number of Admissions'},
-                color=room_usage.values,
-                color_continuous_scale='Purples'
-            )
-            st.plotly_chart(fig7, use_container_width=True)
+            plot_chart(figures, 'rooms')
         
         with col2:
-            # Room vs Billing
-            fig8 = px.scatter(
-                filtered_df,
-                x='room_number',
-                y='billing_amount',
-                color='medical_condition',
-                labels={'room_number': 'Room Number', 'billing_amount': 'Billing Amount ($)'},
-                opacity=0.7
-            )
-            st.plotly_chart(fig8, use_container_width=True)
+            if len(rows) > charts.POINT_BUDGET:
+                st.radio("Display", ["Sample", "Density"], horizontal=True, key="room_scatter_mode")
+            plot_chart(figures, 'room_billing')
+            info = view['scatter']
+            if info and info['mode'] != 'raw':
+                shown = f"{info['points']:,} sampled" if info['mode'] == 'sample' else "binned"
+                st.caption(f"{info['rows']:,} admissions, {shown} "
+                           f"({info['payload_bytes'] / 1e3:,.0f} KB, {info['seconds'] * 1e3:,.0f} ms)")
 
 # Main app logic
 def main():
@@ -597,18 +572,24 @@ def main():
     if 'page' not in st.session_state:
         st.session_state.page = 'home'
     
-    # Get navigation selection
-    page, filtered_df = create_navigation()
-    
-    # Render the selected page
-    if page == 'home':
-        home_page()
-    elif page == 'general':
-        general_analysis_page(filtered_df)
-    elif page == 'clinical':
-        clinical_analysis_page(filtered_df)
-    elif page == 'financial':
-        financial_analysis_page(filtered_df)
+    trace = new_trace()
+    with profiling.tracing(trace):
+        # Get navigation selection
+        with profiling.span('create_navigation') as record:
+            page, rows, filters = create_navigation()
+            record['rows'] = None if rows is None else len(rows)
+        
+        # Render the selected page
+        with profiling.span(f'page:{page}', rows=record['rows']):
+            if page == 'home':
+                home_page()
+            else:
+                if page == 'general':
+                    general_analysis_page(rows, filters)
+                elif page == 'clinical':
+                    clinical_analysis_page(rows, filters)
+                elif page == 'financial':
+                    financial_analysis_page(rows, filters)
     
     # Footer
     st.markdown("---")
@@ -621,6 +602,43 @@ def main():
         """,
         unsafe_allow_html=True
     )
+    
+    if trace is not None:
+        trace.meta.update(page=page, filters=filters)
+        if os.environ.get(profiling.TRACE_ENV):
+            profiling.write_jsonl(os.environ[profiling.TRACE_ENV], trace.record())
+    profiling_panel(trace)
+
+def new_trace():
+    # Reruns are traced while the profiling panel is on or DASHBOARD_TRACE names a file
+    if not (st.session_state.get('profiling') or os.environ.get(profiling.TRACE_ENV)):
+        return None
+    st.session_state.reruns = st.session_state.get('reruns', 0) + 1
+    return profiling.Trace(rerun=st.session_state.reruns)
+
+def profiling_panel(trace):
+    st.sidebar.markdown("---")
+    if not st.sidebar.toggle("⏱️ Profiling", key="profiling",
+                             help="Time, rows, memory and figure size of each step of a rerun"):
+        return
+    # The session's last reruns, for download
+    traces = st.session_state.setdefault('traces', [])
+    traces.append(trace.record())
+    del traces[:-TRACE_HISTORY]
+    
+    st.sidebar.caption(f"Rerun {trace.meta['rerun']} of this session: {trace.seconds * 1e3:,.0f} ms")
+    st.sidebar.dataframe(
+        trace.table(), hide_index=True, use_container_width=True,
+        column_config={
+            'ms': st.column_config.NumberColumn(format="%.1f"),
+            'self_ms': st.column_config.NumberColumn(format="%.1f"),
+            'rss_delta_mb': st.column_config.NumberColumn("Δ MB", format="%.1f"),
+        }
+    )
+    st.sidebar.download_button("Download trace (JSON lines)", profiling.dumps_jsonl(traces),
+                               file_name="dashboard_trace.jsonl", mime="application/jsonl")
+    st.sidebar.download_button("Download Chrome trace", json.dumps(profiling.chrome_trace(traces)),
+                               file_name="dashboard_trace.json", mime="application/json")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,394 @@
+"""Aggregates and figures of the dashboard's analysis pages.
+
+Each function computes everything a page shows for one filter state and
+returns it as a dict of formatted metrics and Plotly figures, without any
+Streamlit calls, so the result can be cached per filter state and rendered
+as often as needed. The aggregates behind the figures come from the
+store's engine (``page_inputs``). A selection without admissions has no
+figures, and EMPTY_METRIC stands for the metrics it has no value for.
+"""
+import pandas as pd
+import plotly.express as px
+
+import charts
+import cube
+import timeseries
+import topk
+
+# Shown for a metric of an empty selection
+EMPTY_METRIC = '–'
+
+
+def _metric(value, template):
+    # A formatted mean, or EMPTY_METRIC when no row has the measure
+    return EMPTY_METRIC if pd.isna(value) else template.format(value)
+
+
+def _per(count, groups):
+    # Patients per group, EMPTY_METRIC when no group is selected
+    return f"{count / groups:.0f}" if groups else EMPTY_METRIC
+
+
+def home(df):
+    """Figures of the home page's metric cards."""
+    dates = df['date_of_admission']
+    return {
+        'patients': len(df),
+        'hospitals': df['hospital'].nunique(),
+        'period': f"{dates.min().year} - {dates.max().year}",
+        'conditions': df['medical_condition'].nunique(),
+    }
+
+
+def general_inputs(store, filters, freq='M'):
+    """Aggregates of the general page from the cube, SQL and the daily series."""
+    cells = store.select(filters)
+    return {
+        'kpis': cube.totals(cells),
+        'hospitals': cells['hospital'].nunique(),
+        # Age groups 0-18, 19-30, 31-45, 46-60, 60+
+        'age': cube.age_distribution(cells, 'general'),
+        'gender': cube.counts(cells, 'gender'),
+        'blood': store.counts('blood_type', filters),
+        'trend': store.trend(filters, freq),
+    }
+
+
+def clinical_inputs(store, filters, freq='M'):
+    """Aggregates of the clinical page from the cube and the stay histograms."""
+    cells = store.select(filters)
+    return {
+        'conditions': cube.counts(cells, 'medical_condition'),
+        'stay_by_condition': cube.rollup(cells, 'medical_condition')['length_of_stay_mean'],
+        # Box plot from quartiles of the precomputed stay histograms
+        'stay_box': cube.box_stats(store.select(filters, 'stay')),
+        # Age groups <30, 30-50, 50-70, 70+
+        'condition_by_age': cube.crosstab(cells, cube.age_groups(cells, 'clinical').rename('age_category'),
+                                          'medical_condition'),
+        'tests': cube.counts(cells, 'test_results'),
+        'tests_by_condition': cube.crosstab(cells, 'medical_condition', 'test_results'),
+    }
+
+
+def financial_inputs(store, filters, freq='M', streaming=False):
+    """Aggregates of the financial page from the sharded breakdowns, the daily
+    series and SQL (room usage, unless read from the heavy hitters)."""
+    # Sums and counts per hospital, insurer and condition, sharded
+    # across worker processes
+    kpis, breakdowns = store.breakdowns(filters)
+    return {
+        'kpis': kpis,
+        'breakdowns': breakdowns,
+        'trend': store.trend(filters, freq),
+        'rooms': None if streaming else store.counts('room_number', filters, limit=10),
+    }
+
+
+INPUTS = {'general': general_inputs, 'clinical': clinical_inputs, 'financial': financial_inputs}
+
+
+def page_inputs(store, page, filters, freq='M', streaming=False):
+    """A page's aggregates from the store's engine: the pandas structures
+    above or one lazy Polars plan per page (``polars_engine.py``)."""
+    options = {'streaming': streaming} if page == 'financial' else {}
+    if store.engine == 'polars':
+        return store.lazy.page(page, filters, freq, **options)
+    return INPUTS[page](store, filters, freq, **options)
+
+
+def general(store, filters, freq='M'):
+    data = page_inputs(store, 'general', filters, freq)
+    kpis = data['kpis']
+    metrics = {
+        "Average Age": _metric(kpis['age_mean'], "{:.1f} years"),
+        "Avg Length of Stay": _metric(kpis['length_of_stay_mean'], "{:.1f} days"),
+        "Total Billing": f"${kpis['billing_amount_sum']:,.0f}",
+        "Patients per Hospital": _per(kpis['count'], data['hospitals']),
+    }
+    # Plotly cannot draw the empty series of an empty selection
+    if not kpis['count']:
+        return {'metrics': metrics, 'figures': {}}
+
+    age_dist = data['age']
+    age = px.bar(
+        x=age_dist.index,
+        y=age_dist.values,
+        labels={'x': 'Age Group', 'y': 'Number of Patients'},
+        color=age_dist.values,
+        color_continuous_scale='Blues'
+    )
+    age.update_layout(showlegend=False)
+
+    gender_dist = data['gender']
+    gender = px.pie(
+        values=gender_dist.values,
+        names=gender_dist.index,
+        hole=0.4,
+        color_discrete_sequence=px.colors.qualitative.Set2
+    )
+    gender.update_traces(textposition='inside', textinfo='percent+label')
+
+    blood_dist = data['blood']
+    blood = px.bar(
+        x=blood_dist.index,
+        y=blood_dist.values,
+        labels={'x': 'Blood Type', 'y': 'Number of Patients'},
+        color=blood_dist.values,
+        color_continuous_scale='Reds'
+    )
+    blood.update_layout(showlegend=False)
+
+    # Admissions per period of the selected granularity, including empty
+    # periods, at each period's last day
+    admissions = data['trend']['count']
+    trend = px.line(
+        x=admissions.index.end_time.normalize(),
+        y=admissions.values,
+        labels={'x': 'Date', 'y': 'Number of Admissions'},
+        line_shape='spline'
+    )
+    trend.update_traces(line=dict(width=3, color='#1f77b4'))
+
+    return {
+        'metrics': metrics,
+        'figures': {'age': age, 'gender': gender, 'blood': blood, 'trend': trend},
+    }
+
+
+def clinical(store, filters):
+    data = page_inputs(store, 'clinical', filters)
+    if not data['conditions'].sum():
+        return {'figures': {}}
+
+    condition_dist = data['conditions']
+    conditions = px.bar(
+        y=condition_dist.index,
+        x=condition_dist.values,
+        orientation='h',
+        labels={'x': 'Number of Patients', 'y': 'Medical Condition'},
+        color=condition_dist.values,
+        color_continuous_scale='Viridis'
+    )
+    conditions.update_layout(showlegend=False, height=400)
+
+    treemap = px.treemap(
+        condition_dist.reset_index(),
+        path=['medical_condition'],
+        values='count',
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    treemap.update_layout(height=400)
+
+    avg_stay_by_condition = data['stay_by_condition'].sort_values()
+    avg_stay = px.bar(
+        y=avg_stay_by_condition.index,
+        x=avg_stay_by_condition.values,
+        orientation='h',
+        labels={'x': 'Average Length of Stay (days)', 'y': 'Medical Condition'},
+        color=avg_stay_by_condition.values,
+        color_continuous_scale='Blues'
+    )
+    avg_stay.update_layout(showlegend=False, height=400)
+
+    stay_stats = data['stay_box']
+    stay_box = charts.box_figure(stay_stats, colors=px.colors.qualitative.Set3)
+    stay_box.update_layout(
+        height=400,
+        xaxis_title="Medical Condition",
+        yaxis_title="Length of Stay (days)",
+        showlegend=False
+    )
+
+    condition_by_age = data['condition_by_age']
+    age_conditions = px.bar(
+        condition_by_age,
+        barmode='stack',
+        color_discrete_sequence=px.colors.qualitative.Set3,
+        labels={'value': 'Number of Patients', 'age_category': 'Age Group'}
+    )
+    age_conditions.update_layout(height=500)
+
+    test_results = data['tests']
+    tests = px.pie(
+        values=test_results.values,
+        names=test_results.index,
+        hole=0.3,
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    tests.update_traces(textposition='inside', textinfo='percent+label')
+
+    test_by_condition = data['tests_by_condition']
+    tests_by_condition = px.imshow(
+        test_by_condition,
+        labels=dict(x="Test Result", y="Medical Condition", color="Count"),
+        color_continuous_scale='YlOrRd'
+    )
+
+    return {
+        'figures': {
+            'conditions': conditions, 'treemap': treemap, 'avg_stay': avg_stay,
+            'stay_box': stay_box, 'age_conditions': age_conditions,
+            'tests': tests, 'tests_by_condition': tests_by_condition,
+        },
+    }
+
+
+def financial(store, filters, rows, scatter_mode='auto', top_mode='exact', freq='M'):
+    # 'streaming' reads hospital billing and room usage from the live
+    # heavy-hitter summaries over all admissions instead of the filtered rows
+    streaming = top_mode == 'streaming'
+    data = page_inputs(store, 'financial', filters, freq, streaming)
+    kpis, breakdowns = data['kpis'], data['breakdowns']
+    total_billing = kpis['billing_amount_sum']
+    total_stay = kpis['length_of_stay_sum']
+    billing_per_day = total_billing / total_stay if total_stay > 0 else 0
+    metrics = {
+        "Total Billing Amount": f"${total_billing:,.0f}",
+        "Average per Patient": _metric(kpis['billing_amount_mean'], "${:,.0f}"),
+        "Billing per Patient-Day": f"${billing_per_day:,.0f}",
+        "Patients per Condition": _per(kpis['count'], breakdowns['medical_condition'].index.nunique()),
+    }
+    if not kpis['count']:
+        return {'metrics': metrics, 'figures': {}, 'scatter': None, 'top': None}
+
+    by_hospital = breakdowns['hospital']
+    if streaming:
+        top_hospitals = store.heavy_hitters['hospital'].top(10)
+        billing_by_hospital = top_hospitals['estimate']
+    else:
+        billing_by_hospital = topk.top_k(by_hospital['billing_amount_sum'], 10)
+    hospital_billing = px.bar(
+        x=billing_by_hospital.values,
+        y=billing_by_hospital.index,
+        orientation='h',
+        labels={'x': 'Total Billing Amount ($)', 'y': 'Hospital'},
+        color=billing_by_hospital.values,
+        color_continuous_scale='Reds'
+    )
+    hospital_billing.update_layout(showlegend=False, height=400)
+
+    stay_by_hospital = topk.top_k(by_hospital['length_of_stay_mean'], 10)
+    hospital_stay = px.bar(
+        x=stay_by_hospital.values,
+        y=stay_by_hospital.index,
+        orientation='h',
+        labels={'x': 'Average Length of Stay (days)', 'y': 'Hospital'},
+        color=stay_by_hospital.values,
+        color_continuous_scale='Blues'
+    )
+    hospital_stay.update_layout(showlegend=False, height=400)
+
+    by_insurance = breakdowns['insurance_provider']
+    billing_by_insurance = by_insurance['billing_amount_sum']
+    insurance_billing = px.pie(
+        values=billing_by_insurance.values,
+        names=billing_by_insurance.index,
+        hole=0.3,
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    insurance_billing.update_traces(textposition='inside', textinfo='percent+label')
+
+    patients_by_insurance = by_insurance['count'].sort_values(ascending=False)
+    insurance_patients = px.bar(
+        x=patients_by_insurance.index,
+        y=patients_by_insurance.values,
+        labels={'x': 'Insurance Provider', 'y': 'Number of Patients'},
+        color=patients_by_insurance.values,
+        color_continuous_scale='Greens'
+    )
+    insurance_patients.update_layout(showlegend=False, height=400)
+
+    # Relabelled with set_axis: the series is shared through the cache
+    billing_trend = data['trend']['billing_amount_sum']
+    billing_trend = billing_trend.set_axis(timeseries.period_labels(billing_trend.index))
+    trend = px.line(
+        x=billing_trend.index,
+        y=billing_trend.values,
+        labels={'x': timeseries.PERIOD_NAMES[freq], 'y': 'Total Billing Amount ($)'},
+        line_shape='spline',
+        markers=True
+    )
+    trend.update_traces(line=dict(width=3, color='#2ca02c'))
+    trend.update_layout(height=400)
+
+    cost_by_condition = breakdowns['medical_condition']['billing_amount_mean'].sort_values(ascending=False)
+    condition_cost = px.bar(
+        x=cost_by_condition.index,
+        y=cost_by_condition.values,
+        labels={'x': 'Medical Condition', 'y': 'Average Billing Amount ($)'},
+        color=cost_by_condition.values,
+        color_continuous_scale='Viridis'
+    )
+    condition_cost.update_layout(showlegend=False, height=400)
+
+    # Most used rooms
+    if streaming:
+        top_rooms = store.heavy_hitters['room_number'].top(10)
+        room_usage = top_rooms['estimate']
+    else:
+        room_usage = data['rooms']
+    rooms = px.bar(
+        x=room_usage.index.astype(str),
+        y=room_usage.values,
+        labels={'x': 'Room Number', 'y': 'Number of Admissions'},
+        color=room_usage.values,
+        color_continuous_scale='Purples'
+    )
+
+    # Room vs Billing, capped at POINT_BUDGET points
+    room_billing, scatter = charts.scatter_figure(
+        store.df,
+        x='room_number',
+        y='billing_amount',
+        color='medical_condition',
+        rows=rows,
+        mode=scatter_mode,
+        labels={'room_number': 'Room Number', 'billing_amount': 'Billing Amount ($)'},
+        opacity=0.7
+    )
+
+    return {
+        'metrics': metrics,
+        'figures': {
+            'hospital_billing': hospital_billing, 'hospital_stay': hospital_stay,
+            'insurance_billing': insurance_billing, 'insurance_patients': insurance_patients,
+            'trend': trend, 'condition_cost': condition_cost,
+            'rooms': rooms, 'room_billing': room_billing,
+        },
+        'scatter': scatter,
+        'top': _stream_bounds(store, top_hospitals, top_rooms) if streaming else None,
+    }
+
+
+def view(store, page, filters, rows=None, scatter_mode='auto', top_mode='exact', freq='M'):
+    """A page's results for a filter state, computed once and then cached.
+
+    The display modes and the trend granularity are part of the cache key.
+    """
+    if rows is None:
+        rows = store.rows(filters)
+    if page == 'general':
+        return store.cached(('page', 'general', freq), filters, lambda: general(store, filters, freq))
+    if page == 'clinical':
+        return store.cached(('page', 'clinical'), filters, lambda: clinical(store, filters))
+    return store.cached(('page', 'financial', scatter_mode, top_mode, freq), filters,
+                        lambda: financial(store, filters, rows, scatter_mode, top_mode, freq))
+
+
+def default_view(store, page, filters=None):
+    """The view a new session opens ``page`` with (default display modes), for
+    ``filters`` or the sidebar's initial filter state."""
+    filters = filters or store.default_filters()
+    rows = store.rows(filters)
+    scatter_mode = 'sample' if page == 'financial' and len(rows) > charts.POINT_BUDGET else 'auto'
+    return view(store, page, filters, rows, scatter_mode)
+
+
+def _stream_bounds(store, hospitals, rooms):
+    # Widest range between the lower bound and the estimate among the shown keys
+    return {
+        'admissions': int(store.heavy_hitters['room_number'].total),
+        'hospital_error': float((hospitals['estimate'] - hospitals['lower']).max()),
+        'room_error': float((rooms['estimate'] - rooms['lower']).max()),
+        'capacity': store.heavy_hitters['hospital'].summary.capacity,
+    }
@@ -0,0 +1,67 @@
+"""Small timing and memory helpers shared by the dashboard benchmarks."""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+def rss_mb():
+    """Current resident set size of this process in MB."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except ImportError:
+        # Linux fallback when psutil is not installed
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KB on Linux
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+@contextmanager
+def measure():
+    """Record wall time and RSS growth of the enclosed block into a dict."""
+    stats = {}
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    yield stats
+    stats['seconds'] = time.perf_counter() - start
+    stats['rss_delta_mb'] = rss_mb() - rss_before
+    stats['peak_rss_mb'] = peak_rss_mb()
+
+
+@contextmanager
+def track_peak(interval=0.005):
+    """Sample RSS in a background thread; records the block's peak into a dict.
+
+    ``ru_maxrss`` only ever grows, so the peak of a block that runs after
+    a larger one (e.g. loading the data) has to be sampled.
+    """
+    stats = {'rss_before_mb': rss_mb()}
+    peak = [stats['rss_before_mb']]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], rss_mb())
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        done.set()
+        thread.join()
+        stats['seconds'] = time.perf_counter() - start
+        stats['rss_after_mb'] = rss_mb()
+        stats['peak_rss_mb'] = max(peak[0], stats['rss_after_mb'])
+        stats['peak_delta_mb'] = stats['peak_rss_mb'] - stats['rss_before_mb']
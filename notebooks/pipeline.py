@@ -0,0 +1,295 @@
+"""Chunked, command-line version of the Healthcare_Analysis.ipynb preprocessing.
+
+    python pipeline.py healthcare_dataset.csv \
+        --output healthcare_dataset_preprocessed.csv \
+        --encoded healthcare_dataset_encoded.csv
+
+The raw CSV is parsed and cleaned once, chunk by chunk, and the cleaned chunks
+are staged as Parquet files in a temporary directory, so memory is bounded by
+the chunk size rather than the input size. Imputation and scaler statistics
+are exact over the whole input: medians and quantiles are selected from values
+spilled to disk, means and variances are merged per chunk. The outputs are
+then rendered chunk by chunk in worker processes and appended in order, with
+the same columns and formatting as the notebook.
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from chunks import merge_moments, ordered_map
+from preprocessing import (
+    DATE_COLS, DUMMY_COLS, LABEL_COLS, NUM_COLS, STATS_PATH, TEXT_COLS,
+    add_label_encodings, add_scaled, add_validation, clean, dummies, impute,
+    save_stats, scaler_params
+)
+
+DEFAULT_CHUNKSIZE = 250_000
+QUANTILES = [0.25, 0.5, 0.75]
+
+_BLOCK = 1 << 20
+_SIGN = np.uint64(1 << 63)
+
+
+def _sort_keys(values):
+    # Map float64/int64 values to uint64 keys with the same ordering
+    bits = values.view(np.uint64)
+    if values.dtype.kind == 'f':
+        return np.where(bits & _SIGN, ~bits, bits | _SIGN)
+    return bits ^ _SIGN
+
+
+def _from_keys(keys, dtype):
+    keys = np.asarray(keys, dtype=np.uint64)
+    if np.dtype(dtype).kind == 'f':
+        bits = np.where(keys & _SIGN, keys ^ _SIGN, ~keys)
+    else:
+        bits = keys ^ _SIGN
+    return bits.view(dtype)
+
+
+class Spill:
+    """Values of one column appended to a file for exact order statistics."""
+
+    def __init__(self, directory, name, dtype):
+        self.path = os.path.join(directory, f'{name}.spill')
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self._file = open(self.path, 'wb')
+
+    def append(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        values.tofile(self._file)
+        self.count += len(values)
+
+    def order_statistics(self, ranks):
+        """Values at the given 0-based ranks of the sorted column.
+
+        Radix selection on 16-bit digits of the sort keys: four sequential
+        reads of the spill file, with one 64K-bin histogram per rank.
+        """
+        self._file.close()
+        data = np.memmap(self.path, dtype=self.dtype, mode='r', shape=(self.count,))
+        remaining = [int(r) for r in ranks]
+        prefixes = [0] * len(ranks)
+        for level, shift in enumerate((48, 32, 16, 0)):
+            hists = np.zeros((len(ranks), 1 << 16), dtype=np.int64)
+            for lo in range(0, self.count, _BLOCK):
+                keys = _sort_keys(np.array(data[lo:lo + _BLOCK]))
+                digits = ((keys >> np.uint64(shift)) & np.uint64(0xFFFF)).astype(np.intp)
+                if level == 0:
+                    hists += np.bincount(digits, minlength=1 << 16)
+                    continue
+                high = keys >> np.uint64(shift + 16)
+                for i, prefix in enumerate(prefixes):
+                    hists[i] += np.bincount(digits[high == np.uint64(prefix)], minlength=1 << 16)
+            for i in range(len(ranks)):
+                cum = np.cumsum(hists[i])
+                digit = int(np.searchsorted(cum, remaining[i], side='right'))
+                remaining[i] -= int(cum[digit - 1]) if digit else 0
+                prefixes[i] = (prefixes[i] << 16) | digit
+        del data
+        os.remove(self.path)
+        return _from_keys(prefixes, self.dtype)
+
+
+def _median(spill, kind):
+    # pandas' median of the two middle values equals the full-column median
+    n = spill.count
+    middle = spill.order_statistics([(n - 1) // 2, n // 2])
+    if kind == 'M':
+        return pd.Series(middle.astype('datetime64[ns]')).median()
+    return pd.Series(middle).median()
+
+
+def _quantiles(spill):
+    # numpy's 'linear' percentile method, as used by RobustScaler
+    n = spill.count
+    q = np.asarray(QUANTILES)
+    virtual = n * q + (1 + q * (1 - 1 - 1)) - 1
+    previous = np.floor(virtual)
+    below = np.clip(previous, 0, n - 1).astype(np.int64)
+    above = np.clip(previous + 1, 0, n - 1).astype(np.int64)
+    values = spill.order_statistics(list(below) + list(above))
+    a, b = values[:len(q)], values[len(q):]
+    gamma = virtual - previous
+    diff = b - a
+    result = a + diff * gamma
+    return np.where(gamma >= 0.5, b - diff * (1 - gamma), result)
+
+
+def _stage_files(workdir):
+    return sorted(glob.glob(os.path.join(workdir, 'stage-*.parquet')))
+
+
+def _read_stage(path, columns=None):
+    return pq.read_table(path, columns=columns).to_pandas()
+
+
+def stage(input_path, workdir, chunksize=DEFAULT_CHUNKSIZE):
+    """Pass 1: parse and clean the raw CSV, staging cleaned chunks as Parquet."""
+    profile = {'rows': 0, 'nulls': None, 'dtypes': {}, 'values': {}, 'has_time': {}}
+    for i, chunk in enumerate(pd.read_csv(input_path, chunksize=chunksize)):
+        df = clean(chunk)
+        nulls = df.isnull().sum()
+        profile['nulls'] = nulls if profile['nulls'] is None else profile['nulls'].add(nulls, fill_value=0)
+        profile['rows'] += len(df)
+        for col in df.columns:
+            profile['dtypes'].setdefault(col, set()).add(df[col].dtype)
+        for col in LABEL_COLS + DUMMY_COLS:
+            profile['values'].setdefault(col, set()).update(df[col].dropna().unique())
+        for col in DATE_COLS:
+            dates = df[col].dropna()
+            has_time = bool((dates != dates.dt.normalize()).any())
+            profile['has_time'][col] = profile['has_time'].get(col, False) or has_time
+        df.to_parquet(os.path.join(workdir, f'stage-{i:06d}.parquet'), index=False)
+
+    # Whole-file dtypes, e.g. age becomes float64 if any chunk had a missing age
+    dtypes = {}
+    for col, seen in profile['dtypes'].items():
+        dtypes[col] = np.dtype(object) if any(d == object for d in seen) else np.result_type(*seen)
+    profile['dtypes'] = dtypes
+    return profile
+
+
+def fit_imputation(profile, workdir):
+    """Exact mode/median fill values over all staged chunks.
+
+    Fill values are fitted for every column that has missing values and for
+    the numeric and date columns, so the saved statistics can also clean
+    later batches. Text columns never contain missing values after cleaning.
+    """
+    nulls = profile['nulls']
+    columns = [
+        col for col, dtype in profile['dtypes'].items()
+        if nulls[col] > 0 or (col not in TEXT_COLS and col != 'name' and dtype != object)
+    ]
+    stats = {}
+    for col in columns:
+        dtype = profile['dtypes'][col]
+        if dtype == object:
+            counts = None
+            for path in _stage_files(workdir):
+                vc = _read_stage(path, [col])[col].value_counts()
+                counts = vc if counts is None else counts.add(vc, fill_value=0)
+            if counts is not None and len(counts):
+                stats[col] = sorted(counts[counts == counts.max()].index)[0]
+            continue
+        kind = dtype.kind
+        spill = Spill(workdir, col, 'int64' if kind == 'M' else 'float64')
+        for path in _stage_files(workdir):
+            values = _read_stage(path, [col])[col].dropna()
+            spill.append(values.to_numpy().view('int64') if kind == 'M' else values.to_numpy(dtype='float64'))
+        if spill.count:
+            stats[col] = _median(spill, kind)
+    return stats
+
+
+def _prepare(df, profile, stats):
+    df = impute(df, stats)
+    for col, dtype in profile['dtypes'].items():
+        if dtype != object and df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    return add_validation(df)
+
+
+def fit_scaling(profile, stats, workdir):
+    """Pass 2: exact minmax/zscore/robust statistics over the imputed data."""
+    spills = {col: Spill(workdir, f'scale-{col}', 'float64') for col in NUM_COLS}
+    moments = {col: None for col in NUM_COLS}
+    for path in _stage_files(workdir):
+        df = _prepare(_read_stage(path), profile, stats)
+        for col in NUM_COLS:
+            x = df[col].to_numpy(dtype='float64')
+            spills[col].append(x)
+            mean = x.mean()
+            chunk = [len(x), x.sum(), x.min(), x.max(), mean, ((x - mean) ** 2).sum()]
+            moments[col] = chunk if moments[col] is None else merge_moments(moments[col], chunk)
+
+    scaling = {}
+    for col in NUM_COLS:
+        n, total, minimum, maximum, _, m2 = moments[col]
+        q25, median, q75 = _quantiles(spills[col])
+        scaling[col] = scaler_params(n, minimum, maximum, total / n, m2 / n, q25, median, q75)
+    return scaling
+
+
+def _format_dates(df, profile):
+    # Date-only columns are written as YYYY-MM-DD, as pandas does for a full column
+    for col in DATE_COLS:
+        if not profile['has_time'].get(col):
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+    return df
+
+
+def _render_chunk(task):
+    path, header, profile, stats, scaling, classes, categories, encode = task
+    df = add_label_encodings(_prepare(_read_stage(path), profile, stats), classes)
+    encoded = None
+    if encode:
+        encoded = _format_dates(dummies(df, categories), profile).to_csv(header=header, index=False)
+    df = _format_dates(add_scaled(df, scaling), profile)
+    return df.to_csv(header=header, index=False), encoded
+
+
+def write_outputs(profile, stats, scaling, workdir, output_path, encoded_path=None, workers=1):
+    """Pass 3: impute, validate, encode and scale each chunk and append it to the outputs."""
+    classes = {col: np.array(sorted(profile['values'][col]), dtype=object) for col in LABEL_COLS}
+    categories = {col: sorted(profile['values'][col]) for col in DUMMY_COLS}
+    tasks = (
+        (path, i == 0, profile, stats, scaling, classes, categories, bool(encoded_path))
+        for i, path in enumerate(_stage_files(workdir))
+    )
+    out = open(output_path, 'w', newline='')
+    enc = open(encoded_path, 'w', newline='') if encoded_path else None
+    try:
+        for rendered, encoded in ordered_map(_render_chunk, tasks, workers):
+            out.write(rendered)
+            if enc:
+                enc.write(encoded)
+    finally:
+        out.close()
+        if enc:
+            enc.close()
+
+
+def run_pipeline(input_path, output_path, encoded_path=None, stats_path=STATS_PATH,
+                 chunksize=DEFAULT_CHUNKSIZE, tmpdir=None, workers=None):
+    """Run the full preprocessing and return row count and throughput."""
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=tmpdir) as workdir:
+        profile = stage(input_path, workdir, chunksize)
+        stats = fit_imputation(profile, workdir)
+        scaling = fit_scaling(profile, stats, workdir)
+        write_outputs(profile, stats, scaling, workdir, output_path, encoded_path, workers)
+    if stats_path:
+        save_stats(stats, stats_path)
+    seconds = time.perf_counter() - start
+    return {'rows': profile['rows'], 'seconds': seconds, 'rows_per_sec': profile['rows'] / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Preprocess the raw healthcare dataset.')
+    parser.add_argument('input', nargs='?', default='healthcare_dataset.csv')
+    parser.add_argument('--output', default='healthcare_dataset_preprocessed.csv')
+    parser.add_argument('--encoded', default='healthcare_dataset_encoded.csv',
+                        help="one-hot encoded output; pass '' to skip")
+    parser.add_argument('--stats', default=STATS_PATH, help='where to save the imputation statistics')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--tmpdir', help='directory for staged chunks and spill files')
+    parser.add_argument('--workers', type=int, help='processes rendering output chunks (default: all cores)')
+    args = parser.parse_args()
+
+    result = run_pipeline(args.input, args.output, args.encoded or None, args.stats,
+                          args.chunksize, args.tmpdir, args.workers)
+    print(f"{result['rows']:,} rows in {result['seconds']:.1f}s ({result['rows_per_sec']:,.0f} rows/sec)")
+
+
+if __name__ == '__main__':
+    main()
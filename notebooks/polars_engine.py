@@ -0,0 +1,234 @@
+"""Lazy Polars engine computing each analysis page's aggregates in one plan.
+
+The pandas path reads a page's aggregates from several structures (the
+cube, DuckDB counts, the daily series, the sharded breakdowns), each
+resolving the filter state on its own. Here a page is one lazy query: the
+sidebar predicates are applied to the held columns and every KPI and
+groupby of the page is planned over the filtered rows. ``collect_all``
+runs the page's queries together; common subplan elimination filters the
+rows once for all of them, and Polars executes the plan on its thread pool.
+
+The results have the shapes and index types of the pandas path, so the
+page code draws from either engine (see ``page_figures.page_inputs``).
+The store uses this engine when DASHBOARD_ENGINE is ``polars``; Polars is
+only imported then.
+"""
+import numpy as np
+import pandas as pd
+import polars as pl
+
+import cube
+import profiling
+from aggregation import KEYS
+
+COLUMNS = [
+    'age', 'gender', 'blood_type', 'medical_condition', 'date_of_admission',
+    'hospital', 'insurance_provider', 'billing_amount', 'room_number',
+    'test_results', 'length_of_stay'
+]
+# Truncation of admission dates to the start of each trend period
+PERIOD_STARTS = {'D': '1d', 'W': '1w', 'M': '1mo', 'Q': '1q'}
+ROOM_LIMIT = 10
+
+
+def predicate(filters):
+    """Polars expression of a dashboard filter state (cf. ``sql_engine.where_clause``)."""
+    conditions = [pl.lit(True)]
+    if filters.get('start') is not None:
+        conditions.append(pl.col('date_of_admission') >= pd.Timestamp(filters['start']))
+    if filters.get('end') is not None:
+        conditions.append(pl.col('date_of_admission') <= pd.Timestamp(filters['end']))
+    for col in ('gender', 'hospital'):
+        if filters.get(col) is not None:
+            conditions.append(pl.col(col) == filters[col])
+    return pl.all_horizontal(conditions)
+
+
+def age_bucket():
+    """``cube.age_bucket`` as an expression: index into AGE_EDGES, -1 outside."""
+    age = pl.col('age')
+    inside = (age >= cube.AGE_EDGES[0]) & (age < cube.AGE_EDGES[-1])
+    bucket = pl.sum_horizontal([age >= edge for edge in cube.AGE_EDGES[1:-1]])
+    return pl.when(inside).then(bucket).otherwise(-1).cast(pl.Int8).alias('age_bucket')
+
+
+def to_polars(column):
+    """A held column as a Polars Series, sharing its buffer where it can.
+
+    Numbers (NaN as null) and dates without NaT are views of the pandas
+    column; categoricals are re-encoded, as Polars keeps its own categories.
+    """
+    dtype = column.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iuf':
+        return pl.Series(column.name, column.to_numpy(), nan_to_null=True)
+    if isinstance(dtype, np.dtype) and dtype.kind == 'M' and not column.isna().any():
+        unit = np.datetime_data(dtype)[0]
+        return pl.Series(column.name, column.to_numpy().view('int64')).cast(pl.Datetime(unit))
+    return pl.from_pandas(column)
+
+
+def _sums(*columns):
+    # Counts and measure sums; missing measures add nothing, as in the cube
+    return [pl.len().alias('count')] + [pl.col(c).cast(pl.Float64).sum().alias(f'{c}_sum') for c in columns]
+
+
+def _present(*columns):
+    # Rows with each measure, the divisors of the breakdowns' means
+    return [pl.col(c).count().alias(f'{c}_count') for c in columns]
+
+
+def _extremes(*columns):
+    return [getattr(pl.col(c), agg)().alias(f'{c}_{agg}') for c in columns for agg in ('min', 'max')]
+
+
+class PolarsEngine:
+    def __init__(self, df=None):
+        if df is not None:
+            self.register(df)
+
+    def register(self, df):
+        """Hold the page columns of a DataFrame (e.g. after a batch was merged)."""
+        self.dtypes = {col: df[col].dtype for col in COLUMNS}
+        self.frame = pl.DataFrame([to_polars(df[col]) for col in COLUMNS])
+        # Rows in admission order (until a batch with earlier dates arrives)
+        # are sliced to a date range instead of filtered
+        dates = df['date_of_admission']
+        self.dates = dates.to_numpy() if dates.is_monotonic_increasing else None
+
+    def rows(self, filters):
+        """The held rows matching a filter state, as a LazyFrame."""
+        if self.dates is None:
+            return self.frame.lazy().filter(predicate(filters))
+        bounds = [filters.get('start'), filters.get('end')]
+        lo, hi = [
+            (0 if side == 'left' else len(self.dates)) if bound is None
+            else np.searchsorted(self.dates, pd.Timestamp(bound).to_datetime64(), side)
+            for bound, side in zip(bounds, ['left', 'right'])
+        ]
+        rest = {key: value for key, value in filters.items() if key not in ('start', 'end')}
+        return self.frame.slice(lo, max(hi - lo, 0)).lazy().filter(predicate(rest))
+
+    def page(self, page, filters, freq='M', streaming=False):
+        """The aggregates ``page_figures`` draws ``page`` from, for a filter state."""
+        rows = self.rows(filters)
+        with profiling.span(f'polars/{page}'):
+            if page == 'general':
+                return self.general(rows, freq)
+            if page == 'clinical':
+                return self.clinical(rows)
+            return self.financial(rows, freq, streaming)
+
+    def general(self, rows, freq):
+        totals, ages, genders, blood, trend = self._collect(
+            rows.select(_sums('age', *cube.MEASURES) + _present(*cube.MEASURES) + _extremes(*cube.MEASURES)
+                        + [pl.col('hospital').drop_nulls().n_unique().alias('hospitals')]),
+            rows.group_by(age_bucket()).agg(pl.len().alias('count')),
+            rows.group_by('gender').agg(pl.len().alias('count')),
+            rows.group_by('blood_type').agg(pl.len().alias('count')),
+            self._trend(rows, freq),
+        )
+        return {
+            'kpis': self._totals(totals),
+            'hospitals': int(totals['hospitals'].iloc[0]),
+            'age': cube.age_distribution(ages, 'general'),
+            'gender': self._series(genders, 'gender').sort_values(ascending=False),
+            'blood': self._ranked(blood, 'blood_type'),
+            'trend': self._periods(trend, freq),
+        }
+
+    def clinical(self, rows):
+        conditions, ages, tests, histogram = self._collect(
+            rows.group_by('medical_condition').agg(_sums('length_of_stay') + _present('length_of_stay')),
+            rows.group_by('medical_condition', age_bucket()).agg(pl.len().alias('count')),
+            rows.group_by('medical_condition', 'test_results').agg(pl.len().alias('count')),
+            rows.group_by('medical_condition', 'length_of_stay').agg(pl.len().alias('count')),
+        )
+        stay = self._series(conditions, 'medical_condition', 'length_of_stay_sum')
+        present = self._series(conditions, 'medical_condition', 'length_of_stay_count')
+        counts = self._series(conditions, 'medical_condition')
+        test_counts = tests.groupby('test_results', observed=True, dropna=False)['count'].sum()
+        return {
+            'conditions': counts.sort_values(ascending=False),
+            'stay_by_condition': (stay / present.where(present > 0)).rename('length_of_stay_mean'),
+            'stay_box': cube.box_stats(histogram),
+            'condition_by_age': cube.crosstab(ages, cube.age_groups(ages, 'clinical').rename('age_category'),
+                                              'medical_condition'),
+            'tests': test_counts.rename('count').sort_values(ascending=False),
+            'tests_by_condition': cube.crosstab(tests, 'medical_condition', 'test_results'),
+        }
+
+    def financial(self, rows, freq, streaming=False):
+        measures = _sums(*cube.MEASURES) + _present(*cube.MEASURES)
+        queries = [rows.select(measures)]
+        queries += [rows.group_by(key).agg(measures) for key in KEYS]
+        queries.append(self._trend(rows, freq))
+        if not streaming:
+            rooms = rows.group_by('room_number').agg(pl.len().alias('count'))
+            queries.append(rooms.sort(['count', 'room_number'], descending=[True, False]).head(ROOM_LIMIT))
+        results = self._collect(*queries)
+        totals, trend = results[0], results[len(KEYS) + 1]
+        rooms = None
+        if not streaming:
+            top = results[-1]
+            rooms = pd.Series(top['count'].to_numpy(dtype='int64'),
+                              index=pd.Index(top['room_number'], name='room_number'), name='count')
+        return {
+            'kpis': self._totals(totals),
+            'breakdowns': {key: self._breakdown(frame, key) for key, frame in zip(KEYS, results[1:])},
+            'trend': self._periods(trend, freq),
+            'rooms': rooms,
+        }
+
+    def _collect(self, *queries):
+        # One execution of all of a page's queries, as pandas frames whose
+        # key columns have the held frame's categories
+        frames = [frame.to_pandas() for frame in pl.collect_all(queries)]
+        for frame in frames:
+            for col in frame.columns:
+                dtype = self.dtypes.get(col)
+                if isinstance(dtype, pd.CategoricalDtype):
+                    frame[col] = pd.Categorical(frame[col], dtype=dtype)
+            for col in frame.columns:
+                if col == 'count' or col.endswith('_count'):
+                    frame[col] = frame[col].astype('int64')
+        return frames
+
+    def _series(self, frame, key, value='count'):
+        # Values per key in category order, missing key last, as pandas groupbys give them
+        return frame.set_index(key)[value].sort_index(na_position='last')
+
+    def _ranked(self, frame, key):
+        # Largest first, ties in key order (``SQLEngine.counts``)
+        return self._series(frame, key).sort_values(ascending=False, kind='stable')
+
+    def _totals(self, frame):
+        # The keys of ``cube.totals`` and ``ShardedAggregator.aggregate``'s totals
+        row = frame.iloc[0]
+        count = int(row['count'])
+        totals = {'count': count}
+        for col in [c for c in ['age'] + cube.MEASURES if f'{c}_sum' in frame.columns]:
+            # Means of the measures are over the rows that have them
+            n = int(row[f'{col}_count']) if f'{col}_count' in frame.columns else count
+            totals[f'{col}_sum'] = row[f'{col}_sum']
+            totals[f'{col}_mean'] = row[f'{col}_sum'] / n if n else np.nan
+            if f'{col}_count' in frame.columns:
+                totals[f'{col}_count'] = n
+        totals.update({key: row[key] for key in frame.columns if key.endswith(('_min', '_max'))})
+        return totals
+
+    def _breakdown(self, frame, key):
+        # ``ShardedAggregator.aggregate``'s frame: plain index, sorted by value
+        out = frame.drop(columns=key).set_axis(pd.Index(frame[key].astype(object), name=key))
+        for m in cube.MEASURES:
+            out[f'{m}_mean'] = out[f'{m}_sum'] / out[f'{m}_count'].where(out[f'{m}_count'] > 0)
+        return out.sort_index()
+
+    def _trend(self, rows, freq):
+        period = pl.col('date_of_admission').dt.truncate(PERIOD_STARTS[freq]).alias('period')
+        return rows.group_by(period).agg(_sums('billing_amount'))
+
+    def _periods(self, frame, freq):
+        # ``DailySeries.series``: every period from the first to the last with admissions
+        frame = frame.set_index(pd.DatetimeIndex(frame['period']).to_period(freq)).sort_index()
+        periods = pd.period_range(frame.index.min(), frame.index.max(), freq=freq) if len(frame) else frame.index
+        return frame[['count', 'billing_amount_sum']].reindex(periods, fill_value=0)
@@ -0,0 +1,227 @@
+"""Cleaning steps from Healthcare_Analysis.ipynb as reusable functions.
+
+Imputation statistics (mode for text columns, median for the rest) can be
+fitted once and frozen, so new batches are cleaned exactly like the rows that
+are already in the dataset. Encoding and scaling take their fitted state as
+arguments, so they can be applied chunk by chunk (see pipeline.py).
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+STATS_PATH = 'imputation_stats.json'
+
+# Arrow's ASCII string kernels agree with Python's str methods except on
+# non-ASCII text and \x1c-\x1f, which str.split()/strip() treat as whitespace
+_PYTHON_ONLY = r"[^\x00-\x1b\x20-\x7f]"
+_WHITESPACE = r"[ \t\n\r\x0b\x0c]+"
+
+TITLES = ["mr", "mrs", "ms", "dr", "phd", "md"]
+GENDER_MAP = {
+    "Male": "Male", "M": "Male",
+    "Female": "Female", "F": "Female"
+}
+TEXT_COLS = [
+    "blood_type", "medical_condition", "doctor",
+    "hospital", "insurance_provider", "admission_type",
+    "medication", "test_results"
+]
+DATE_COLS = ["date_of_admission", "discharge_date"]
+VALIDATION_COLS = ["age_valid", "stay_valid", "billing_valid"]
+LABEL_COLS = ["gender", "admission_type", "test_results"]
+DUMMY_COLS = ["blood_type", "medical_condition", "insurance_provider", "medication"]
+NUM_COLS = ["age", "billing_amount", "room_number", "length_of_stay"]
+SCALERS = ["minmax", "zscore", "robust"]
+
+
+def normalize_columns(df):
+    df.columns = (
+        df.columns.str.strip()
+        .str.lower()
+        .str.replace(" ", "_")
+    )
+    return df
+
+
+def clean_name(name):
+    if pd.isna(name):
+        return name
+    name = str(name).lower()
+    for t in TITLES:
+        name = name.replace(t + ".", "").replace(t, "")
+    return " ".join(name.split()).title()
+
+
+def _string_kernel(values, arrow_fn, python_fn):
+    """Apply a string transform with Arrow kernels.
+
+    Rows where Arrow and Python semantics could differ go through
+    ``python_fn`` instead; missing values are passed through unchanged.
+    """
+    values = values.astype(object).where(values.isna(), values.astype(str))
+    arr = pa.array(values, type=pa.string(), from_pandas=True)
+    result = arrow_fn(arr).to_numpy(zero_copy_only=False)
+    slow = pc.fill_null(pc.match_substring_regex(arr, _PYTHON_ONLY), False).to_numpy(zero_copy_only=False)
+    if slow.any():
+        result[slow] = [python_fn(v) for v in values[slow]]
+    return pd.Series(result, index=values.index).where(values.notna(), values)
+
+
+def _clean_names_arrow(arr):
+    arr = pc.ascii_lower(arr)
+    # Titles are removed in the notebook's order; a single regex pass would
+    # treat overlapping titles differently (e.g. "mdr" -> "r" instead of "m")
+    for t in TITLES:
+        arr = pc.replace_substring(pc.replace_substring(arr, t + ".", ""), t, "")
+    arr = pc.utf8_trim(pc.replace_substring_regex(arr, _WHITESPACE, " "), " ")
+    return pc.ascii_title(arr)
+
+
+def clean_names(names):
+    """Vectorized ``clean_name`` over a Series."""
+    return _string_kernel(names, _clean_names_arrow, clean_name)
+
+
+def strip_title(values):
+    """Vectorized ``str.strip().title()`` over a Series."""
+    return _string_kernel(
+        values,
+        lambda arr: pc.ascii_title(pc.ascii_trim_whitespace(arr)),
+        lambda v: v.strip().title()
+    )
+
+
+def clean(raw):
+    """Column normalisation, name/gender/text standardisation and date parsing."""
+    df = normalize_columns(raw.copy())
+
+    df["name"] = clean_names(df["name"])
+    df["gender"] = strip_title(df["gender"]).map(GENDER_MAP)
+
+    for col in TEXT_COLS:
+        df[col] = strip_title(df[col].astype(str))
+
+    for col in DATE_COLS:
+        df[col] = pd.to_datetime(df[col])
+
+    df["billing_amount"] = df["billing_amount"].abs()
+    return df
+
+
+def fit_imputation(df):
+    """Fill values per column: mode for text columns, median for the rest."""
+    stats = {}
+    for col in df.columns:
+        values = df[col].dropna()
+        if values.empty:
+            continue
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+            stats[col] = values.median()
+        else:
+            stats[col] = values.mode()[0]
+    return stats
+
+
+def impute(df, stats):
+    """Fill missing values with frozen statistics from ``fit_imputation``."""
+    fills = {}
+    for col in df.columns:
+        if col in stats and df[col].isnull().any():
+            value = stats[col]
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                value = pd.Timestamp(value)
+            fills[col] = value
+    return df.fillna(fills) if fills else df
+
+
+def add_validation(df):
+    """Derive length_of_stay and the business validation flags."""
+    df["length_of_stay"] = (
+        df["discharge_date"] - df["date_of_admission"]
+    ).dt.days
+
+    df["age_valid"] = df["age"].between(0, 120)
+    df["stay_valid"] = df["length_of_stay"] >= 0
+    df["billing_valid"] = df["billing_amount"] > 0
+
+    df["validation_score"] = df[VALIDATION_COLS].mean(axis=1)
+    return df
+
+
+def add_label_encodings(df, classes):
+    """LabelEncoder codes for LABEL_COLS given the sorted classes of each column."""
+    for col in LABEL_COLS:
+        df[col + "_enc"] = np.searchsorted(classes[col], df[col].to_numpy(dtype=object))
+    return df
+
+
+def dummies(df, categories):
+    """pd.get_dummies(drop_first=True) with fixed categories per column."""
+    encoded = df.drop(columns=DUMMY_COLS)
+    for col in DUMMY_COLS:
+        for value in categories[col][1:]:
+            encoded[f"{col}_{value}"] = (df[col] == value).to_numpy()
+    return encoded
+
+
+def add_scaled(df, scaling):
+    """Add the minmax/zscore/robust columns using fitted scaler statistics.
+
+    ``scaling`` maps each column in NUM_COLS to the values of
+    ``scaler_params`` and applies them with sklearn's arithmetic.
+    """
+    for kind in SCALERS:
+        for col in NUM_COLS:
+            params = scaling[col]
+            x = df[col].to_numpy(dtype="float64")
+            if kind == "minmax":
+                values = x * params["minmax_scale"] + params["minmax_min"]
+            elif kind == "zscore":
+                values = (x - params["mean"]) / params["std"]
+            else:
+                values = (x - params["median"]) / params["iqr"]
+            df[f"{col}_{kind}"] = values
+    return df
+
+
+def scaler_params(count, minimum, maximum, mean, var, q25, median, q75):
+    """MinMaxScaler, StandardScaler and RobustScaler parameters for one column."""
+    eps = np.finfo(np.float64).eps
+    data_range = maximum - minimum
+    scale = 1.0 / (data_range if data_range >= 10 * eps else 1.0)
+    # StandardScaler treats near-constant columns as having unit scale
+    constant = var <= count * eps * var + (count * mean * eps) ** 2
+    iqr = q75 - q25
+    return {
+        "minmax_scale": scale,
+        "minmax_min": 0 - minimum * scale,
+        "mean": mean,
+        "std": 1.0 if constant else float(np.sqrt(var)),
+        "median": median,
+        "iqr": iqr if iqr >= 10 * eps else 1.0,
+    }
+
+
+def clean_batch(raw, stats):
+    """Apply the notebook cleaning to a batch of raw rows using frozen stats."""
+    return add_validation(impute(clean(raw), stats))
+
+
+def save_stats(stats, path=STATS_PATH):
+    encoded = {
+        col: value.isoformat() if isinstance(value, pd.Timestamp) else value
+        for col, value in stats.items()
+    }
+    with open(path, 'w') as f:
+        json.dump(encoded, f, indent=2, default=float)
+
+
+def load_stats(path=STATS_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
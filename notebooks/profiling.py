@@ -0,0 +1,186 @@
+"""Per-rerun traces of the dashboard's hot paths.
+
+A ``Trace`` holds the spans recorded while one script run is traced:
+the data load, navigation and filtering, the store's cached aggregates,
+each page and each chart or table it draws. Every span keeps its wall
+time, the time not spent in nested spans, the rows it processed, the
+change in resident memory and, for charts, the size of the serialized
+figure. Outside ``tracing`` the module-level ``span`` does nothing, so the
+same code runs untraced in the warm-up threads.
+
+Traces are written as JSON lines, one rerun per line, and convert to the
+Chrome trace format (chrome://tracing, Perfetto):
+
+    python profiling.py trace.jsonl --chrome trace.json
+
+Two traces, e.g. of two versions, are compared by median span time:
+
+    python profiling.py before.jsonl after.jsonl
+"""
+import argparse
+import json
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import pandas as pd
+
+from perf import rss_mb
+
+# File that every traced rerun is appended to
+TRACE_ENV = 'DASHBOARD_TRACE'
+
+_current = threading.local()
+# Serialized size of figures already measured, by id; cached figures are redrawn on every rerun
+_figure_bytes = {}
+
+SPAN_COLUMNS = ['name', 'ms', 'self_ms', 'rows', 'rss_delta_mb', 'figure_bytes', 'cached']
+
+
+class Trace:
+    def __init__(self, **meta):
+        self.meta = meta
+        self.spans = []
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._stack = []
+
+    @contextmanager
+    def span(self, name, **fields):
+        record = {'name': name, 'depth': len(self._stack), **fields}
+        self.spans.append(record)
+        self._stack.append(0.0)
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += seconds
+            record['start_ms'] = (start - self._start) * 1e3
+            record['ms'] = seconds * 1e3
+            record['self_ms'] = (seconds - children) * 1e3
+            record['rss_delta_mb'] = rss_mb() - rss_before
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self._start
+
+    def record(self):
+        """The rerun as one JSON-serializable dict."""
+        return {'started': self.started, 'ms': self.seconds * 1e3, **self.meta, 'spans': self.spans}
+
+    def table(self):
+        """The spans as a frame, names indented by nesting depth."""
+        table = pd.DataFrame(self.spans, columns=SPAN_COLUMNS + ['depth'])
+        table['name'] = table['depth'].map(lambda depth: '· ' * depth) + table['name']
+        return table[SPAN_COLUMNS]
+
+
+@contextmanager
+def tracing(trace):
+    """Record ``span`` calls of this thread into ``trace`` (None: not traced)."""
+    previous = getattr(_current, 'trace', None)
+    _current.trace = trace
+    try:
+        yield trace
+    finally:
+        _current.trace = previous
+
+
+@contextmanager
+def span(name, **fields):
+    """A span of the current trace; yields the span's record (a throwaway dict if untraced)."""
+    trace = getattr(_current, 'trace', None)
+    if trace is None:
+        yield {}
+        return
+    with trace.span(name, **fields) as record:
+        yield record
+
+
+def active():
+    return getattr(_current, 'trace', None) is not None
+
+
+def figure_bytes(fig):
+    """Size of a Plotly figure's JSON, as sent to the browser."""
+    size = _figure_bytes.get(id(fig))
+    if size is None:
+        size = _figure_bytes[id(fig)] = len(fig.to_json())
+        # Figures are unhashable; forget the size when the figure is dropped
+        weakref.finalize(fig, _figure_bytes.pop, id(fig), None)
+    return size
+
+
+def dumps_jsonl(records):
+    return ''.join(json.dumps(record, default=str) + '\n' for record in records)
+
+
+def write_jsonl(path, record):
+    with open(path, 'a') as f:
+        f.write(dumps_jsonl([record]))
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def chrome_trace(records):
+    """Reruns as Chrome trace events: one complete event per span, one thread per rerun."""
+    events = []
+    origin = min((r['started'] for r in records), default=0)
+    for tid, rerun in enumerate(records):
+        base = (rerun['started'] - origin) * 1e6
+        label = ' '.join(str(rerun[k]) for k in ('page', 'rerun') if k in rerun)
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': label}})
+        for s in rerun['spans']:
+            args = {k: v for k, v in s.items() if k not in ('name', 'depth', 'start_ms', 'ms')}
+            events.append({'name': s['name'], 'ph': 'X', 'pid': 1, 'tid': tid,
+                           'ts': base + s['start_ms'] * 1e3, 'dur': s['ms'] * 1e3, 'args': args})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def summarize(records):
+    """Median time and rows per page and span name."""
+    spans = pd.DataFrame(
+        [{'page': r.get('page'), **s} for r in records for s in r['spans']],
+        columns=['page', 'name', 'ms', 'self_ms', 'rows']
+    )
+    grouped = spans.groupby(['page', 'name'], dropna=False, sort=False)
+    return grouped[['ms', 'self_ms', 'rows']].median().assign(count=grouped.size())
+
+
+def compare(before, after):
+    """Median span times of two traces side by side, slowest changes first."""
+    a, b = summarize(before), summarize(after)
+    diff = a[['ms']].join(b[['ms']], how='outer', lsuffix='_before', rsuffix='_after')
+    diff['change'] = diff['ms_after'] / diff['ms_before'] - 1
+    return diff.sort_values('change', ascending=False, key=lambda c: c.abs(), na_position='first')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace')
+    parser.add_argument('other', nargs='?', help='second trace to compare against the first')
+    parser.add_argument('--chrome', help='write the first trace in Chrome trace format')
+    args = parser.parse_args()
+
+    records = read_jsonl(args.trace)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        if args.chrome:
+            with open(args.chrome, 'w') as f:
+                json.dump(chrome_trace(records), f)
+            print(f"{len(records)} reruns written to {args.chrome}")
+        elif args.other:
+            print(compare(records, read_jsonl(args.other)).to_string(float_format='{:.2f}'.format))
+        else:
+            print(summarize(records).to_string(float_format='{:.2f}'.format))
+
+
+if __name__ == '__main__':
+    main()
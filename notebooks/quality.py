@@ -0,0 +1,179 @@
+"""Data-quality rules and column profiles of the admissions.
+
+The notebook's validation flags (``age_valid``, ``stay_valid``,
+``billing_valid`` and their mean, ``validation_score``) and its
+``isnull().sum()`` audit are computed here in one vectorized pass per chunk,
+together with further rules, into a profile that holds only counts and
+moments. Profiles merge exactly: counts add up and moments combine with
+the parallel form of Welford's update, so the store keeps one profile up
+to date as batches arrive and the dashboard's quality panel reads it
+without touching the rows.
+
+Billing outliers are scored against the running mean and standard
+deviation of all amounts seen up to and including the row's chunk; rows
+profiled earlier are not scored again.
+"""
+import numpy as np
+import pandas as pd
+
+from chunks import merge_moments
+
+CHUNK_ROWS = 1 << 20
+# Billing amounts further than this many standard deviations from the mean
+OUTLIER_Z = 3.0
+NUMERIC_COLS = ['age', 'billing_amount', 'room_number', 'length_of_stay']
+
+RULES = {
+    'age_out_of_range': 'Age missing or outside 0-120',
+    'negative_stay': 'Length of stay missing or negative',
+    'billing_not_positive': 'Billing amount missing or not positive',
+    'discharge_before_admission': 'Discharge date before admission date',
+    'billing_outlier': f'Billing amount more than {OUTLIER_Z:g} SD from the mean',
+}
+# Rules whose flags the notebook averages into validation_score
+VALIDATION_RULES = ['age_out_of_range', 'negative_stay', 'billing_not_positive']
+
+
+def _moments(x):
+    # [count, sum, min, max, mean, M2] of the non-missing values, as pipeline.py merges them
+    x = x[~np.isnan(x)]
+    if not len(x):
+        return None
+    mean = x.mean()
+    return [len(x), x.sum(), x.min(), x.max(), mean, ((x - mean) ** 2).sum()]
+
+
+def _merge(a, b):
+    if a is None or b is None:
+        return a or b
+    return merge_moments(a, b)
+
+
+def _numbers(values):
+    return values.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def check(chunk, billing_moments=None):
+    """Violation flags (mask per rule) of the rules ``chunk`` has the columns for.
+
+    The notebook's flags treat missing values as invalid; the discharge
+    and outlier rules only check rows with the values they compare.
+    """
+    flags = {}
+    if 'age' in chunk.columns:
+        flags['age_out_of_range'] = ~chunk['age'].between(0, 120).to_numpy(dtype=bool)
+    if 'length_of_stay' in chunk.columns:
+        flags['negative_stay'] = ~(_numbers(chunk['length_of_stay']) >= 0)
+    if 'billing_amount' in chunk.columns:
+        billing = _numbers(chunk['billing_amount'])
+        flags['billing_not_positive'] = ~(billing > 0)
+        if billing_moments is not None:
+            n, _, _, _, mean, m2 = billing_moments
+            std = np.sqrt(m2 / n)
+            # NaN comparisons are False: missing amounts are not outliers
+            flags['billing_outlier'] = np.abs(billing - mean) > OUTLIER_Z * std if std > 0 else np.zeros(len(chunk), bool)
+    if 'date_of_admission' in chunk.columns and 'discharge_date' in chunk.columns:
+        admitted, discharged = chunk['date_of_admission'], chunk['discharge_date']
+        flags['discharge_before_admission'] = (discharged < admitted).to_numpy(dtype=bool)
+    return flags
+
+
+class QualityProfile:
+    """Rule violations, missing values and moments of the rows profiled so far."""
+
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.score_sum = 0.0
+        self.violations = dict.fromkeys(RULES, 0)
+        self.checked = dict.fromkeys(RULES, 0)
+        self.nulls = {}
+        self.imputed = {}
+        self.moments = {}
+
+    def update(self, df, columns=None, imputed=None):
+        """Profile a batch of rows; returns its violation count per rule.
+
+        ``columns`` limits the missing-value audit and the moments (all
+        columns by default); ``imputed`` counts missing values per column
+        that were filled before the rows arrived.
+        """
+        columns = list(df.columns) if columns is None else [c for c in columns if c in df.columns]
+        found = dict.fromkeys(RULES, 0)
+        for lo in range(0, len(df), CHUNK_ROWS):
+            for rule, count in self._profile(df.iloc[lo:lo + CHUNK_ROWS], columns).items():
+                found[rule] += count
+        for col, count in (imputed if imputed is not None else {}).items():
+            if count and col in columns:
+                self.imputed[col] = self.imputed.get(col, 0) + int(count)
+        self.batches += 1
+        return found
+
+    def _profile(self, chunk, columns):
+        self.rows += len(chunk)
+        for col in columns:
+            self.nulls[col] = self.nulls.get(col, 0) + int(chunk[col].isna().sum())
+            if col in NUMERIC_COLS:
+                self.moments[col] = _merge(self.moments.get(col), _moments(_numbers(chunk[col])))
+
+        flags = check(chunk, self.moments.get('billing_amount'))
+        found = {}
+        for rule, mask in flags.items():
+            if rule == 'discharge_before_admission':
+                checked = int((chunk['date_of_admission'].notna() & chunk['discharge_date'].notna()).sum())
+            elif rule == 'billing_outlier':
+                checked = int(chunk['billing_amount'].notna().sum())
+            else:
+                checked = len(chunk)
+            found[rule] = int(mask.sum())
+            self.violations[rule] += found[rule]
+            self.checked[rule] += checked
+        if all(rule in flags for rule in VALIDATION_RULES):
+            # validation_score of a row is the share of its flags that hold
+            invalid = sum(flags[rule].astype('int8') for rule in VALIDATION_RULES)
+            self.score_sum += len(chunk) - invalid.sum() / len(VALIDATION_RULES)
+        return found
+
+    def merge(self, other):
+        """Add the rows profiled by ``other``."""
+        self.rows += other.rows
+        self.batches += other.batches
+        self.score_sum += other.score_sum
+        for mine, theirs in ((self.violations, other.violations), (self.checked, other.checked),
+                             (self.nulls, other.nulls), (self.imputed, other.imputed)):
+            for key, value in theirs.items():
+                mine[key] = mine.get(key, 0) + value
+        for col, moments in other.moments.items():
+            self.moments[col] = _merge(self.moments.get(col), moments)
+        return self
+
+    @property
+    def validation_score(self):
+        """Mean of the notebook's validation_score over the profiled rows."""
+        return self.score_sum / self.rows if self.rows else float('nan')
+
+    def rules_table(self):
+        return pd.DataFrame({
+            'rule': list(RULES.values()),
+            'rows_checked': [self.checked[rule] for rule in RULES],
+            'violations': [self.violations[rule] for rule in RULES],
+            'share': [self.violations[rule] / self.checked[rule] if self.checked[rule] else np.nan
+                      for rule in RULES],
+        })
+
+    def columns_table(self):
+        records = []
+        for col, nulls in self.nulls.items():
+            moments = self.moments.get(col)
+            n, _, lo, hi, mean, m2 = moments if moments else (0, 0, np.nan, np.nan, np.nan, np.nan)
+            records.append({
+                'column': col,
+                'missing': nulls,
+                'missing_share': nulls / self.rows if self.rows else np.nan,
+                'imputed': self.imputed.get(col, 0),
+                'mean': mean,
+                'std': np.sqrt(m2 / n) if n else np.nan,
+                'min': lo,
+                'max': hi,
+            })
+        return pd.DataFrame(records)
@@ -0,0 +1,235 @@
+"""Static reports of the analysis pages for many filter states, in one batch.
+
+    python reports.py --by hospital --top 100 --out batch_reports
+    python reports.py --by gender --start 2023-01-01 --end 2023-12-31 --workers 4
+
+One report is written per value of --by: every gender, the --top hospitals
+by admissions in the date range, or a single report ('all'). Hospital
+reports hold the financial page, the only page filtered by hospital; the
+others hold all three pages.
+
+The dataset is loaded once, attached to the published shared copy (see
+shared.py), and every report is computed from the one store with
+``page_figures.view``, the code the dashboard pages run. The store's
+aggregates are shared between reports. The SQL counts a page needs (blood
+types, room usage) are computed for all reports in one grouped scan up
+front, instead of one scan per report. Figures are serialized to HTML and
+JSON in --workers processes.
+
+Output, in --out:
+
+- ``<report>.html``: KPIs and interactive figures, static and offline
+  (Plotly's JavaScript is written once, as plotly.min.js);
+- ``<report>.json``: filters, KPIs, figures (Plotly JSON) and timings;
+- ``index.html`` and ``index.json``: every report with its timings.
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from collections import Counter
+
+import pandas as pd
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+import page_figures
+import shared
+from cache import ResultCache
+from chunks import ordered_map
+from preprocessing import load_stats
+from storage import ensure_parquet
+from store import DASHBOARD_COLUMNS, DataStore, prepare_frame
+
+PAGES = {'general': 'General Analysis', 'clinical': 'Clinical Analysis', 'financial': 'Financial Analysis'}
+REPORT_PAGES = {'all': list(PAGES), 'gender': list(PAGES), 'hospital': ['financial']}
+# SQL counts of each page, as (column, limit): computed for all reports at once
+SHARED_COUNTS = {'general': [('blood_type', None)], 'financial': [('room_number', 10)]}
+# Page results of every report are kept until it is written
+CACHE_ENTRIES = 4096
+
+TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="plotly.min.js"></script>
+<style>
+body {{ font-family: sans-serif; margin: 2rem; color: #1f2937; }}
+h1 {{ color: #1f77b4; }}
+table {{ border-collapse: collapse; margin: 1rem 0; }}
+td, th {{ border: 1px solid #d1d5db; padding: 0.4rem 0.8rem; text-align: left; }}
+.figure {{ width: 100%; max-width: 1100px; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p>{subtitle}</p>
+{body}
+</body>
+</html>
+"""
+
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-') or 'report'
+
+
+def report_names(by, values):
+    """{report name: value}; values whose slugs collide (e.g. names differing
+    only in punctuation) get a short hash of the value appended."""
+    slugs = [slug(value) for value in values]
+    counts = Counter(slugs)
+    return {
+        f'{by}-{s}' + (f'-{hashlib.sha1(str(value).encode()).hexdigest()[:8]}' if counts[s] > 1 else ''): value
+        for s, value in zip(slugs, values)
+    }
+
+
+def report_states(store, by, top, base):
+    """{report name: filters} for every report of the batch."""
+    if by == 'all':
+        return {'all': dict(base)}
+    if by == 'gender':
+        values = sorted(store.df['gender'].dropna().unique())
+    else:
+        admissions = store.breakdowns(base)[1]['hospital']['count']
+        values = admissions.nlargest(top).index
+    return {name: {**base, by: value} for name, value in report_names(by, values).items()}
+
+
+def shared_scans(store, by, pages, base):
+    """SQL counts of every page for all values of ``by``, one scan each."""
+    if by == 'all':
+        return {}
+    return {
+        (column, limit): store.sql.counts_by(column, by, base, limit)
+        for page in pages for column, limit in SHARED_COUNTS.get(page, [])
+    }
+
+
+def compute_report(store, by, pages, filters, scans):
+    """KPIs and figures (as Plotly JSON dicts) of a report's pages."""
+    for (column, limit), counts in scans.items():
+        if filters[by] in counts:
+            store.prime_counts(column, filters, counts[filters[by]], limit)
+    result = {}
+    for page in pages:
+        view = page_figures.default_view(store, page, filters)
+        result[page] = {
+            'metrics': view.get('metrics', {}),
+            'figures': {name: fig.to_plotly_json() for name, fig in view['figures'].items()},
+        }
+    return result
+
+
+def _describe(filters):
+    parts = [f"{filters['start']:%Y-%m-%d} to {filters['end']:%Y-%m-%d}"]
+    parts += [f'{key}: {filters[key]}' for key in ('gender', 'hospital') if filters.get(key) is not None]
+    return ', '.join(parts)
+
+
+def write_report(task):
+    """Serialize one report to HTML and JSON (runs in a worker process)."""
+    out, name, filters, pages, timing = task
+    start = time.perf_counter()
+    sections, pages_json = [], []
+    for page, content in pages.items():
+        figures = {key: pio.json.to_json_plotly(fig) for key, fig in content['figures'].items()}
+        # Inline scripts must not contain "</"
+        scripts = {key: fig.replace('</', '<\\/') for key, fig in figures.items()}
+        rows = ''.join(f'<tr><th>{html.escape(k)}</th><td>{html.escape(v)}</td></tr>'
+                       for k, v in content['metrics'].items())
+        plots = ''.join(
+            f'<h3>{html.escape(key.replace("_", " ").title())}</h3><div class="figure" id="{page}-{key}"></div>'
+            f'<script>Plotly.newPlot("{page}-{key}", {script});</script>'
+            for key, script in scripts.items()
+        )
+        sections.append(f'<h2>{PAGES[page]}</h2>' + (f'<table>{rows}</table>' if rows else '') + plots)
+        figures_json = ', '.join(f'{json.dumps(key)}: {fig}' for key, fig in figures.items())
+        pages_json.append(f'{json.dumps(page)}: {{"metrics": {json.dumps(content["metrics"])}, '
+                          f'"figures": {{{figures_json}}}}}')
+
+    title = f'Healthcare report: {name}'
+    page_html = TEMPLATE.format(title=html.escape(title), subtitle=html.escape(_describe(filters)),
+                                body='\n'.join(sections))
+    with open(os.path.join(out, f'{name}.html'), 'w') as f:
+        f.write(page_html)
+    timing = {**timing, 'write_seconds': time.perf_counter() - start}
+    meta = json.dumps({'name': name, 'filters': filters, 'timing': timing}, default=str)
+    with open(os.path.join(out, f'{name}.json'), 'w') as f:
+        f.write(meta[:-1] + ', "pages": {' + ', '.join(pages_json) + '}}')
+    return {'name': name, 'filters': _describe(filters), **timing,
+            'html_bytes': len(page_html.encode())}
+
+
+def write_index(out, entries, summary):
+    with open(os.path.join(out, 'index.json'), 'w') as f:
+        json.dump({**summary, 'reports': entries}, f, indent=2, default=str)
+    rows = ''.join(
+        f'<tr><td><a href="{e["name"]}.html">{html.escape(e["name"])}</a></td><td>{html.escape(e["filters"])}</td>'
+        f'<td>{e["compute_seconds"] * 1e3:.0f}</td><td>{e["write_seconds"] * 1e3:.0f}</td></tr>'
+        for e in entries
+    )
+    body = ('<table><tr><th>Report</th><th>Filters</th><th>Compute ms</th><th>Write ms</th></tr>'
+            f'{rows}</table>')
+    with open(os.path.join(out, 'index.html'), 'w') as f:
+        f.write(TEMPLATE.format(title='Healthcare reports', body=body, subtitle=html.escape(
+            f"{len(entries)} reports, load {summary['load_seconds']:.1f}s, "
+            f"shared scans {summary['scan_seconds']:.1f}s, total {summary['total_seconds']:.1f}s")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--by', choices=list(REPORT_PAGES), default='hospital')
+    parser.add_argument('--top', type=int, default=20, help='hospitals with the most admissions (--by hospital)')
+    parser.add_argument('--start', type=pd.Timestamp, help='first admission date (default: all)')
+    parser.add_argument('--end', type=pd.Timestamp, help='last admission date (default: all)')
+    parser.add_argument('--out', default='batch_reports')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    path = ensure_parquet()
+    df, parts = shared.load(path, DASHBOARD_COLUMNS, prepare_frame)
+    store = DataStore(df, stats=load_stats(), parquet_path=path, parts=parts,
+                      cache=ResultCache(max_entries=CACHE_ENTRIES))
+    load_seconds = time.perf_counter() - started
+
+    base = store.default_filters()
+    base.update({key: getattr(args, key) for key in ('start', 'end') if getattr(args, key) is not None})
+    pages = REPORT_PAGES[args.by]
+    states = report_states(store, args.by, args.top, base)
+    start = time.perf_counter()
+    scans = shared_scans(store, args.by, pages, base)
+    scan_seconds = time.perf_counter() - start
+
+    os.makedirs(args.out, exist_ok=True)
+    with open(os.path.join(args.out, 'plotly.min.js'), 'w') as f:
+        f.write(get_plotlyjs())
+
+    def tasks():
+        for name, filters in states.items():
+            start = time.perf_counter()
+            result = compute_report(store, args.by, pages, filters, scans)
+            yield args.out, name, filters, result, {'compute_seconds': time.perf_counter() - start}
+
+    print(f"{'report':<48}{'compute ms':>12}{'write ms':>10}{'HTML KB':>10}")
+    entries = []
+    for entry in ordered_map(write_report, tasks(), args.workers):
+        entries.append(entry)
+        print(f"{entry['name'][:47]:<48}{entry['compute_seconds'] * 1e3:>12.0f}"
+              f"{entry['write_seconds'] * 1e3:>10.0f}{entry['html_bytes'] / 1e3:>10.0f}")
+    store.aggregator.close()
+    summary = {'by': args.by, 'load_seconds': load_seconds, 'scan_seconds': scan_seconds,
+               'total_seconds': time.perf_counter() - started}
+    write_index(args.out, entries, summary)
+    print(f"{len(entries)} reports in {args.out}: load {load_seconds:.1f}s, "
+          f"shared scans {scan_seconds:.2f}s, total {summary['total_seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
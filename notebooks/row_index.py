@@ -0,0 +1,147 @@
+"""Row indexes that resolve a dashboard filter state without scanning rows.
+
+The time index keeps the row positions in admission-date order, so a date
+range is a binary search giving a contiguous slice of that order. As long
+as the frame itself is sorted by date (the store sorts it at load) the
+order is the identity and the slice is a plain row range. Low-cardinality
+columns (gender) get one bitmap per value, the others (hospital) an
+inverted index of row positions per value. Combining filters intersects
+the smallest candidate set with the rest instead of scanning every row.
+"""
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = 'date_of_admission'
+INDEXED_COLUMNS = ['gender', 'hospital']
+# Columns with at most this many values get bitmaps, the others postings
+BITMAP_MAX_VALUES = 16
+
+
+def position_dtype(n):
+    return np.int32 if n < 2 ** 31 else np.int64
+
+
+def _postings(values, offset=0):
+    # value -> ascending row positions (shifted by offset)
+    codes, uniques = pd.factorize(values)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    dtype = position_dtype(offset + len(values))
+    return {
+        value: (order[bounds[i]:bounds[i + 1]] + offset).astype(dtype)
+        for i, value in enumerate(uniques)
+    }
+
+
+def _bitmaps(values):
+    codes, uniques = pd.factorize(values)
+    return {value: codes == i for i, value in enumerate(uniques)}
+
+
+class RowIndex:
+    def __init__(self, df, columns=INDEXED_COLUMNS):
+        self.dates = df[DATE_COLUMN].to_numpy()
+        self.n = len(df)
+        self.order = np.argsort(self.dates, kind='stable').astype(position_dtype(self.n))
+        # True while the frame is in date order, i.e. order is the identity
+        self.monotonic = bool(df[DATE_COLUMN].is_monotonic_increasing)
+        self._set_sorted()
+        self.bitmaps = {}
+        self.postings = {}
+        for col in columns:
+            if df[col].nunique() <= BITMAP_MAX_VALUES:
+                self.bitmaps[col] = _bitmaps(df[col])
+            else:
+                self.postings[col] = _postings(df[col])
+
+    def _set_sorted(self):
+        self.sorted_dates = self.dates if self.monotonic else self.dates[self.order]
+        # NaT sorts last; a date bound never matches those rows
+        self.dated = self.n - int(np.isnat(self.sorted_dates).sum())
+
+    def append(self, df, rows):
+        """Index ``rows``, already appended at the end of ``df``."""
+        offset = self.n
+        dates = rows[DATE_COLUMN].to_numpy()
+        self.dates = df[DATE_COLUMN].to_numpy()
+        self.n = len(df)
+        sorted_before = self.sorted_dates[:self.dated]
+        in_order = rows[DATE_COLUMN].is_monotonic_increasing and (
+            not len(sorted_before) or not len(dates) or dates[0] >= sorted_before[-1])
+        if self.monotonic and in_order:
+            self.order = np.arange(self.n, dtype=position_dtype(self.n))
+        else:
+            # Merge the batch into the date order; rows themselves never move
+            batch_order = np.argsort(dates, kind='stable')
+            at = np.searchsorted(self.sorted_dates, dates[batch_order], side='right')
+            self.order = np.insert(self.order.astype(position_dtype(self.n)), at, batch_order + offset)
+            self.monotonic = False
+        self._set_sorted()
+
+        for col, bitmaps in self.bitmaps.items():
+            values = np.asarray(rows[col], dtype=object)
+            for value in set(bitmaps) | set(pd.unique(rows[col].dropna())):
+                old = bitmaps.get(value, np.zeros(offset, dtype=bool))
+                bitmaps[value] = np.concatenate([old, values == value])
+        for col, postings in self.postings.items():
+            for value, positions in _postings(rows[col], offset).items():
+                old = postings.get(value)
+                postings[value] = positions if old is None else np.concatenate([old, positions])
+
+    def date_slice(self, start=None, end=None):
+        """Bounds (lo, hi) of a date range within ``order``, by binary search."""
+        lo, hi = 0, self.n
+        if start is not None:
+            lo = np.searchsorted(self.sorted_dates[:self.dated], self._as_date(start), side='left')
+            hi = self.dated
+        if end is not None:
+            hi = np.searchsorted(self.sorted_dates[:self.dated], self._as_date(end), side='right')
+        return int(lo), int(max(hi, lo))
+
+    def _as_date(self, value):
+        return pd.Timestamp(value).to_datetime64().astype(self.sorted_dates.dtype)
+
+    def select(self, start=None, end=None, gender=None, hospital=None):
+        """Ascending positions of the rows matching a filter state."""
+        filters = {col: value for col, value in (('gender', gender), ('hospital', hospital)) if value is not None}
+        lo, hi = self.date_slice(start, end)
+        dtype = self.order.dtype
+        # Start from the smallest candidate set: a posting list or the date slice
+        posted = [col for col in filters if col in self.postings]
+        if posted:
+            col = min(posted, key=lambda c: len(self.postings[c].get(filters[c], ())))
+            positions = self.postings[col].get(filters.pop(col), np.empty(0, dtype=dtype))
+            if self.monotonic:
+                # Positions are in date order too: the range is a slice
+                bounds = np.searchsorted(positions, np.array([lo, hi], dtype=positions.dtype))
+                positions = positions[bounds[0]:bounds[1]]
+            elif start is not None or end is not None:
+                dates = self.dates[positions]
+                keep = ~np.isnat(dates)
+                if start is not None:
+                    keep &= dates >= self._as_date(start)
+                if end is not None:
+                    keep &= dates <= self._as_date(end)
+                positions = positions[keep]
+        elif self.monotonic:
+            # A row range: bitmaps are sliced rather than gathered
+            positions = None
+        else:
+            positions = np.sort(self.order[lo:hi])
+
+        for col, value in filters.items():
+            if col in self.bitmaps:
+                bitmap = self.bitmaps[col].get(value)
+                if bitmap is None:
+                    positions = np.empty(0, dtype=dtype)
+                elif positions is None:
+                    positions = (np.flatnonzero(bitmap[lo:hi]) + lo).astype(dtype)
+                else:
+                    positions = positions[bitmap[positions]]
+            else:
+                if positions is None:
+                    positions = np.arange(lo, hi, dtype=dtype)
+                positions = np.intersect1d(positions, self.postings[col].get(value, positions[:0]), assume_unique=True)
+        if positions is None:
+            positions = np.arange(lo, hi, dtype=dtype)
+        return positions
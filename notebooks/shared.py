@@ -0,0 +1,144 @@
+"""The dashboard's dataset published once per host as a memory-mapped Arrow file.
+
+The first server process to load a version of the Parquet dataset writes
+the store's frame (compact dtypes, admission order, derived columns) to an
+uncompressed Arrow IPC file under SHARED_DIR, /dev/shm by default. Every
+process then memory-maps that file: the column buffers are pages of the OS
+page cache shared by all of them rather than a private copy each, and
+within a process all sessions use the one store (``st.cache_resource``),
+holding only their filter state and cached row positions.
+
+The file name carries the dataset version (file names, sizes and
+modification times), so a changed dataset is published anew and older
+versions of it are removed. The file also records the Parquet files its
+rows come from: a process merges the files other processes append later
+(``DataStore.refresh``) and holds those rows privately, since merging
+copies the frame. It then republishes its frame as the new version, which
+processes started afterwards attach instead of loading the Parquet data.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import pyarrow as pa
+
+from storage import load_parquet, parquet_parts
+
+SHARED_DIR_ENV = 'DASHBOARD_SHARED_DIR'
+# Bumped whenever the published frame's layout changes
+FORMAT_VERSION = 2
+# Schema metadata key of the Parquet files a published frame holds
+PARTS_KEY = b'parquet_parts'
+
+
+def shared_dir():
+    path = os.environ.get(SHARED_DIR_ENV)
+    if path:
+        return path
+    return '/dev/shm' if os.access('/dev/shm', os.W_OK) else tempfile.gettempdir()
+
+
+def _digest(*parts):
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()[:16]
+
+
+def dataset_version(path):
+    """Names, sizes and modification times of a dataset's files."""
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return [(os.path.basename(path), stat.st_size, stat.st_mtime_ns)]
+    files = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            stat = os.stat(os.path.join(root, name))
+            files.append((os.path.relpath(os.path.join(root, name), path), stat.st_size, stat.st_mtime_ns))
+    return sorted(files)
+
+
+def published_path(parquet_path, columns):
+    dataset = _digest(os.path.abspath(parquet_path), columns)
+    version = _digest(FORMAT_VERSION, dataset_version(parquet_path))
+    return os.path.join(shared_dir(), f'healthcare-{dataset}-{version}.arrow')
+
+
+def publish(df, path, parts):
+    """Write ``df``, holding the Parquet files ``parts``, to ``path`` as an Arrow IPC file, atomically."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, PARTS_KEY: json.dumps(parts).encode()})
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def attach(path):
+    """The published frame, backed by the memory-mapped file, and the Parquet files it holds.
+
+    Numeric and date columns are read-only views of the mapping; categorical
+    codes are small copies and strings stay Arrow arrays over the mapping.
+    """
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    parts = json.loads(table.schema.metadata[PARTS_KEY])
+    return table.to_pandas(split_blocks=True, types_mapper={pa.string(): pd.ArrowDtype(pa.string())}.get), parts
+
+
+def _remove_stale(path):
+    # Other versions of the same dataset; processes still mapping one keep
+    # their pages until they exit
+    prefix = os.path.basename(path).rsplit('-', 1)[0] + '-'
+    directory = os.path.dirname(path)
+    for entry in os.scandir(directory):
+        if entry.name.startswith(prefix) and entry.name.endswith('.arrow') and entry.path != path:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def _publish_dataset(parquet_path, columns, prepare, path):
+    # The files are listed once, so the frame holds exactly the recorded ones
+    # even if a batch is appended meanwhile
+    parts = parquet_parts(parquet_path)
+    publish(prepare(load_parquet(parquet_path, columns, parts=parts)), path, parts)
+    _remove_stale(path)
+
+
+def load(parquet_path, columns, prepare):
+    """Attach the published frame of the dataset's current version.
+
+    The first caller loads ``columns`` from Parquet, turns them into the
+    frame to share with ``prepare`` (a module-level function) and publishes
+    it. That runs in a short-lived process: the memory of the private copy
+    would otherwise stay with the server process after it is freed. Returns
+    the frame and the Parquet files it holds.
+    """
+    path = published_path(parquet_path, columns)
+    if not os.path.exists(path):
+        try:
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                pool.submit(_publish_dataset, parquet_path, columns, prepare, path).result()
+        except BrokenProcessPool:
+            # E.g. a script without a __main__ guard cannot spawn processes
+            _publish_dataset(parquet_path, columns, prepare, path)
+    return attach(path)
+
+
+def republish(df, parts, parquet_path, columns, prepare):
+    """Publish a process's frame, holding the Parquet files ``parts``, as the dataset's current version.
+
+    The frame is passed through ``prepare`` first, as in ``load``. Skipped
+    (returning None) when that version is already published, or when the
+    dataset has files the frame does not hold: another process appended a
+    batch that a later merge will pick up.
+    """
+    path = published_path(parquet_path, columns)
+    if os.path.exists(path) or parquet_parts(parquet_path) != sorted(parts):
+        return None
+    publish(prepare(df), path, sorted(parts))
+    _remove_stale(path)
+    return path
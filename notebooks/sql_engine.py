@@ -0,0 +1,143 @@
+"""Embedded DuckDB engine over the healthcare dataset.
+
+The data is exposed as the view ``healthcare_dataset``, the table name used
+by health.sql, so the analyses there run unchanged:
+
+    python sql_engine.py 1 5 14
+    python sql_engine.py --parquet healthcare_dataset_parquet
+
+The view is either a scan of the Parquet dataset or of an in-memory
+DataFrame (the dashboard's store). Both are read in place by DuckDB's
+columnar engine; only the columns and rows a query needs are scanned.
+"""
+import argparse
+import os
+import re
+import threading
+
+import duckdb
+import pandas as pd
+
+import profiling
+
+TABLE = 'healthcare_dataset'
+SQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'health.sql')
+
+_HEADER = re.compile(r'^--\s*(\d+)\.\s*(.*)$', re.MULTILINE)
+
+
+def load_queries(path=SQL_PATH):
+    """The numbered queries of health.sql as {number: (title, sql)}."""
+    with open(path) as f:
+        text = f.read()
+    headers = list(_HEADER.finditer(text))
+    queries = {}
+    for header, following in zip(headers, headers[1:] + [None]):
+        body = text[header.end():following.start() if following else len(text)]
+        queries[int(header.group(1))] = (header.group(2).strip(), body.strip().rstrip(';'))
+    return queries
+
+
+def where_clause(filters):
+    """SQL condition and parameters for a dashboard filter state."""
+    conditions, params = [], []
+    if filters.get('start') is not None:
+        conditions.append('date_of_admission >= ?')
+        params.append(filters['start'])
+    if filters.get('end') is not None:
+        conditions.append('date_of_admission <= ?')
+        params.append(filters['end'])
+    for col in ('gender', 'hospital'):
+        if filters.get(col) is not None:
+            conditions.append(f'{col} = ?')
+            params.append(filters[col])
+    return (' AND '.join(conditions) or 'TRUE'), params
+
+
+class SQLEngine:
+    def __init__(self, df=None, parquet_path=None):
+        self.con = duckdb.connect()
+        # One connection is shared by the dashboard sessions
+        self._lock = threading.Lock()
+        if df is not None:
+            self.register(df)
+        elif parquet_path is not None:
+            pattern = os.path.join(parquet_path, '**', '*.parquet').replace("'", "''")
+            self.con.execute(
+                f"CREATE OR REPLACE VIEW {TABLE} AS "
+                f"SELECT * FROM read_parquet('{pattern}', hive_partitioning = true)"
+            )
+
+    def register(self, df, exclude=()):
+        """Point the view at a DataFrame (e.g. after a batch was merged).
+
+        Columns in ``exclude`` are hidden from the view, so per-row columns
+        the store derives do not shadow the aliases health.sql groups by.
+        """
+        exclude = [col for col in exclude if col in df.columns]
+        with self._lock:
+            if not exclude:
+                self.con.register(TABLE, df)
+                return
+            self.con.register(f'{TABLE}_frame', df)
+            columns = ', '.join(f'"{col}"' for col in exclude)
+            self.con.execute(f'CREATE OR REPLACE VIEW {TABLE} AS SELECT * EXCLUDE ({columns}) FROM {TABLE}_frame')
+
+    def query(self, sql, params=None):
+        with profiling.span('sql'), self._lock:
+            return self.con.execute(sql, params or []).df()
+
+    def analysis(self, number, queries=None):
+        """Run one of the numbered health.sql queries."""
+        queries = queries or load_queries()
+        return self.query(queries[number][1])
+
+    def counts(self, column, filters=None, limit=None):
+        """``value_counts`` of a column over the filtered rows, computed in SQL."""
+        where, params = where_clause(filters or {})
+        sql = (
+            f'SELECT "{column}", COUNT(*) AS n FROM {TABLE} WHERE {where} '
+            f'GROUP BY "{column}" ORDER BY n DESC, "{column}"'
+        )
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        result = self.query(sql, params)
+        return _counts(result, column)
+
+    def counts_by(self, column, by, filters=None, limit=None):
+        """``counts`` of a column for every value of ``by``, in one scan.
+
+        Returns {value of by: counts}, each equal to ``counts`` with the
+        filter ``by = value`` added; values without rows are left out.
+        """
+        where, params = where_clause(filters or {})
+        sql = f'SELECT "{by}", "{column}", COUNT(*) AS n FROM {TABLE} WHERE {where} GROUP BY "{by}", "{column}"'
+        if limit is not None:
+            sql = (f'SELECT * FROM ({sql}) '
+                   f'QUALIFY ROW_NUMBER() OVER (PARTITION BY "{by}" ORDER BY n DESC, "{column}") <= {int(limit)}')
+        result = self.query(f'{sql} ORDER BY "{by}", n DESC, "{column}"', params)
+        return {key: _counts(group, column) for key, group in result.groupby(by, sort=False, observed=True)}
+
+
+def _counts(result, column):
+    return pd.Series(result['n'].to_numpy(), index=pd.Index(result[column], name=column), name='count')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the health.sql analyses.')
+    parser.add_argument('numbers', nargs='*', type=int, help='queries to run (default: all)')
+    parser.add_argument('--parquet', default='healthcare_dataset_parquet')
+    parser.add_argument('--sql', default=SQL_PATH)
+    args = parser.parse_args()
+
+    queries = load_queries(args.sql)
+    engine = SQLEngine(parquet_path=args.parquet)
+    for number in args.numbers or sorted(queries):
+        title, sql = queries[number]
+        print(f'-- {number}. {title}')
+        print(engine.query(sql).to_string(index=False))
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Columnar Parquet storage for the preprocessed healthcare dataset.
+
+The preprocessed CSV is converted once into a Parquet dataset partitioned by
+admission year. Low-cardinality text columns are stored dictionary-encoded
+and dates as native timestamps, so loading only needs to read the columns a
+page actually uses.
+"""
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CSV_PATH = 'healthcare_dataset_preprocessed.csv'
+PARQUET_PATH = 'healthcare_dataset_parquet'
+
+CATEGORICAL_COLS = [
+    'gender', 'hospital', 'medical_condition', 'insurance_provider',
+    'blood_type', 'test_results', 'admission_type'
+]
+DATE_COLS = ['date_of_admission', 'discharge_date']
+PARTITION_COL = 'admission_year'
+
+# In-memory dtypes of the dashboard's other columns: 'int' is the narrowest
+# integer type holding the column's values; free text is held as Arrow strings
+COMPACT_DTYPES = {
+    'name': pd.ArrowDtype(pa.string()),
+    'age': 'int',
+    'room_number': 'int',
+    'length_of_stay': 'int',
+}
+
+# Columns used by the sidebar filters on every analysis page
+FILTER_COLUMNS = ['date_of_admission', 'gender', 'hospital']
+
+# Columns each dashboard page reads (filters included)
+PAGE_COLUMNS = {
+    'home': ['date_of_admission', 'hospital', 'medical_condition'],
+    'general': FILTER_COLUMNS + [
+        'name', 'age', 'blood_type', 'medical_condition',
+        'length_of_stay', 'billing_amount'
+    ],
+    'clinical': FILTER_COLUMNS + [
+        'age', 'medical_condition', 'length_of_stay', 'test_results'
+    ],
+    'financial': FILTER_COLUMNS + [
+        'medical_condition', 'insurance_provider', 'billing_amount',
+        'length_of_stay', 'room_number'
+    ],
+}
+
+
+def load_csv(path=CSV_PATH, columns=None):
+    """Load the preprocessed CSV the way the dashboard originally did."""
+    data = pd.read_csv(path, usecols=columns)
+    for col in DATE_COLS:
+        if col in data.columns:
+            data[col] = pd.to_datetime(data[col], errors='coerce')
+    return data
+
+
+def _prepare_chunk(chunk):
+    for col in DATE_COLS:
+        if col in chunk.columns:
+            chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+    for col in CATEGORICAL_COLS:
+        if col in chunk.columns:
+            chunk[col] = chunk[col].astype('category')
+    chunk[PARTITION_COL] = chunk['date_of_admission'].dt.year.fillna(0).astype('int16')
+    return chunk
+
+
+def _target_schema(table):
+    # Fix dictionary index widths so every chunk shares one dataset schema
+    fields = []
+    for field in table.schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        elif pa.types.is_timestamp(field.type):
+            field = field.with_type(pa.timestamp('ns'))
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def convert_csv_to_parquet(csv_path=CSV_PATH, out_path=PARQUET_PATH, chunksize=500_000):
+    """Convert the preprocessed CSV into a year-partitioned Parquet dataset.
+
+    The CSV is streamed in chunks, so the conversion never holds the whole
+    file in memory. Returns the number of rows written.
+    """
+    return write_parquet_chunks(pd.read_csv(csv_path, chunksize=chunksize), out_path)
+
+
+def write_parquet_chunks(chunks, out_path=PARQUET_PATH):
+    """Write an iterable of DataFrames as one year-partitioned Parquet dataset.
+
+    The dataset is written next to ``out_path`` and moved in place once
+    complete. Returns the number of rows written.
+    """
+    tmp_path = out_path + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+
+    schema = None
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        table = pa.Table.from_pandas(_prepare_chunk(chunk.copy(deep=False)), preserve_index=False)
+        if schema is None:
+            schema = _target_schema(table)
+        table = table.cast(schema)
+        pq.write_to_dataset(
+            table,
+            tmp_path,
+            partition_cols=[PARTITION_COL],
+            basename_template=f'part-{i}-{{i}}.parquet'
+        )
+        rows += table.num_rows
+
+    if os.path.exists(out_path):
+        shutil.rmtree(out_path)
+    os.replace(tmp_path, out_path)
+    return rows
+
+
+def narrowest_int(values):
+    """Smallest integer dtype holding ``values``; None if they are not all whole numbers."""
+    data = np.asarray(values)
+    if data.dtype.kind == 'f' and (np.isnan(data).any() or (data != np.round(data)).any()):
+        return None
+    if data.dtype.kind not in 'iuf':
+        return None
+    if not len(data):
+        return np.dtype('int8')
+    lo, hi = data.min(), data.max()
+    for dtype in map(np.dtype, ['int8', 'int16', 'int32', 'int64']):
+        if np.iinfo(dtype).min <= lo and hi <= np.iinfo(dtype).max:
+            return dtype
+    return None
+
+
+def compact(df):
+    """Narrow a frame's dtypes in place, per COMPACT_DTYPES and CATEGORICAL_COLS.
+
+    Billing stays float64: the cube and groupbys sum in the column's dtype,
+    and float32 totals of millions of amounts are off by whole dollars.
+    """
+    for col in df.columns:
+        kind = COMPACT_DTYPES.get(col)
+        if col in CATEGORICAL_COLS and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+        elif kind == 'int':
+            dtype = narrowest_int(df[col])
+            if dtype is not None and dtype != df[col].dtype:
+                df[col] = df[col].astype(dtype)
+        elif kind is not None and df[col].dtype != kind:
+            df[col] = df[col].astype(kind)
+    return df
+
+
+def bytes_per_row(df):
+    """Memory held by a frame, in bytes per row and per column."""
+    usage = df.memory_usage(deep=True, index=False)
+    return usage / max(len(df), 1)
+
+
+def parquet_parts(path=PARQUET_PATH):
+    """The dataset's Parquet files, as sorted paths relative to ``path``."""
+    parts = []
+    for root, _, names in os.walk(path):
+        parts += [os.path.relpath(os.path.join(root, name), path) for name in names if name.endswith('.parquet')]
+    return sorted(parts)
+
+
+def load_parquet(path=PARQUET_PATH, columns=None, start=None, end=None, parts=None):
+    """Load selected columns from the Parquet dataset.
+
+    ``start``/``end`` restrict admissions to a date range; year partitions
+    outside the range are skipped without being read. ``parts`` restricts
+    the load to these files (as listed by ``parquet_parts``).
+    """
+    source = path if parts is None else [os.path.join(path, part) for part in parts]
+    dataset = ds.dataset(source, format='parquet', partitioning='hive', partition_base_dir=path)
+    if columns is None:
+        columns = [c for c in dataset.schema.names if c != PARTITION_COL]
+
+    expr = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        expr = (ds.field(PARTITION_COL) >= start.year) & \
+            (ds.field('date_of_admission') >= pa.scalar(start, pa.timestamp('ns')))
+    if end is not None:
+        end = pd.Timestamp(end)
+        end_expr = (ds.field(PARTITION_COL) <= end.year) & \
+            (ds.field('date_of_admission') <= pa.scalar(end, pa.timestamp('ns')))
+        expr = end_expr if expr is None else expr & end_expr
+
+    table = dataset.to_table(columns=list(columns), filter=expr)
+    return table.to_pandas()
+
+
+def append_parquet(df, path=PARQUET_PATH):
+    """Append rows to an existing Parquet dataset as new files.
+
+    Columns the batch does not carry are written as nulls so that every file
+    keeps the dataset schema. Returns the written files, as paths relative
+    to ``path``.
+    """
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    schema = dataset.schema
+    df = _prepare_chunk(df.copy())
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    arrays = [
+        table[field.name].cast(field.type) if field.name in table.column_names
+        else pa.nulls(table.num_rows, field.type)
+        for field in schema
+    ]
+    table = pa.Table.from_arrays(arrays, schema=schema)
+    written = []
+    pq.write_to_dataset(
+        table,
+        path,
+        partition_cols=[PARTITION_COL],
+        basename_template=f'batch-{uuid.uuid4().hex}-{{i}}.parquet',
+        file_visitor=lambda file: written.append(os.path.relpath(file.path, path))
+    )
+    return sorted(written)
+
+
+def ensure_parquet(csv_path=CSV_PATH, out_path=PARQUET_PATH):
+    """Build the Parquet dataset if it is missing or older than the CSV."""
+    if os.path.exists(out_path):
+        if not os.path.exists(csv_path) or os.path.getmtime(out_path) >= os.path.getmtime(csv_path):
+            return out_path
+    convert_csv_to_parquet(csv_path, out_path)
+    return out_path
@@ -0,0 +1,367 @@
+"""In-memory dataset shared by the dashboard sessions.
+
+Holds the dashboard columns, the aggregate cube and the per-filter cached
+selections and page results. New admission batches are cleaned with frozen
+imputation statistics and merged in place, so the data never has to be
+reloaded; only cached results whose filters overlap a batch, and those drawn
+from the heavy hitters over every admission, are dropped.
+Batches other server processes append to the Parquet dataset are merged
+the same way (``refresh``).
+"""
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import preprocessing
+import profiling
+from quality import QualityProfile
+from aggregation import ShardedAggregator
+from cache import ResultCache
+from cube import DERIVED_COLUMNS, AggregateCube, HistogramCube, derived_columns
+from row_index import RowIndex
+from sql_engine import SQLEngine
+from table import SortOrders, name_matches
+from timeseries import DailySeries
+from storage import append_parquet, compact, parquet_parts
+from topk import HeavyHitters
+
+INCOMING_DIR = 'incoming'
+
+# Union of the columns the dashboard pages use
+DASHBOARD_COLUMNS = [
+    'name', 'age', 'gender', 'blood_type', 'medical_condition',
+    'date_of_admission', 'hospital', 'insurance_provider',
+    'billing_amount', 'room_number', 'test_results', 'length_of_stay'
+]
+
+# Streamed top-K: key column -> weight column (None counts admissions)
+STREAM_TOP = {'room_number': None, 'hospital': 'billing_amount'}
+
+# Engine computing the pages' aggregates: 'pandas' (cube, SQL, daily series)
+# or 'polars' (one lazy plan per page, see polars_engine.py)
+ENGINE_ENV = 'DASHBOARD_ENGINE'
+ENGINES = ['pandas', 'polars']
+
+
+def _overlaps(filters, batch):
+    start, end = filters.get('start'), filters.get('end')
+    if start is not None and batch['max_date'] < start:
+        return False
+    if end is not None and batch['min_date'] > end:
+        return False
+    if filters.get('gender') is not None and filters['gender'] not in batch['genders']:
+        return False
+    if filters.get('hospital') is not None and filters['hospital'] not in batch['hospitals']:
+        return False
+    return True
+
+
+def _stale(namespace, filters, batch):
+    # Views drawn from the heavy hitters (the financial page's 'streaming'
+    # top-K mode) cover every admission, whatever their filters
+    return 'streaming' in namespace or _overlaps(filters, batch)
+
+
+def _append_rows(df, rows):
+    # Extend categories first so concat keeps the categorical dtypes, and
+    # widen integer columns only when the batch does not fit them
+    df = df.copy(deep=False)
+    rows = compact(rows[df.columns].copy())
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            new = pd.Index(rows[col].dropna().unique()).difference(df[col].cat.categories)
+            if len(new):
+                df[col] = df[col].cat.add_categories(new)
+            rows[col] = pd.Categorical(rows[col], categories=df[col].cat.categories)
+        elif df[col].dtype.kind == 'i' and rows[col].dtype.kind == 'i':
+            dtype = np.promote_types(df[col].dtype, rows[col].dtype)
+            if dtype != df[col].dtype:
+                df[col] = df[col].astype(dtype)
+            rows[col] = rows[col].astype(dtype)
+    return pd.concat([df, rows], ignore_index=True)
+
+
+def add_derived_columns(df):
+    """Materialize month and age-group columns in place (no copy of df)."""
+    if all(col in df.columns for col in DERIVED_COLUMNS):
+        return df
+    for col, values in derived_columns(df).items():
+        df[col] = values
+    return df
+
+
+def prepare_frame(df):
+    """The frame the store holds: compact dtypes, admission order, derived columns.
+
+    A no-op on a frame already prepared (e.g. attached from ``shared.py``).
+    """
+    # Kept in admission order so that date ranges are row ranges
+    if not df['date_of_admission'].is_monotonic_increasing:
+        df = df.sort_values('date_of_admission', kind='stable', ignore_index=True)
+    return add_derived_columns(compact(df))
+
+
+class DataStore:
+    def __init__(self, df, stats=None, parquet_path=None, cells=None, cache=None, engine=None, parts=None):
+        # Frozen imputation statistics; columns the store does not hold are
+        # fitted from the first batch that carries them and then kept
+        self.stats = stats or preprocessing.fit_imputation(df.drop(columns=DERIVED_COLUMNS, errors='ignore'))
+        self.df = df = prepare_frame(df)
+        self.index = RowIndex(df)
+        self.aggregator = ShardedAggregator(df)
+        # Live top-K summaries over every admission seen, in fixed memory
+        self.heavy_hitters = {col: HeavyHitters() for col in STREAM_TOP}
+        self._feed_heavy_hitters(df)
+        self.cube = AggregateCube(df, cells)
+        self.stay_cube = HistogramCube(df)
+        self.timeseries = DailySeries(df)
+        # Rule violations, missing values and moments, updated with each batch
+        self.quality = QualityProfile()
+        self.quality.update(df, columns=self.data_columns)
+        # Orders of the patient table's sortable columns, built on first use
+        self.sort_orders = SortOrders(df)
+        self.parquet_path = parquet_path
+        # Files of the Parquet dataset whose rows are held (all of them unless
+        # the caller knows which ones df was loaded from)
+        if parquet_path is not None and parts is None:
+            parts = parquet_parts(parquet_path)
+        self.parts = set(parts or [])
+        self.version = 0
+        # Cube selections and page results per filter state
+        self.cache = cache or ResultCache()
+        self._sql = None
+        self.engine = engine or os.environ.get(ENGINE_ENV) or 'pandas'
+        if self.engine not in ENGINES:
+            raise ValueError(f'unknown engine {self.engine!r}, expected one of {ENGINES}')
+        self._lazy = None
+        self._lock = threading.RLock()
+
+    @property
+    def sql(self):
+        """DuckDB engine over the held rows, for groupbys the cube cannot answer."""
+        with self._lock:
+            if self._sql is None:
+                self._sql = SQLEngine()
+                self._sql.register(self.df, exclude=DERIVED_COLUMNS)
+            return self._sql
+
+    @property
+    def lazy(self):
+        """Polars engine over the held rows, for the pages' lazy plans."""
+        with self._lock:
+            if self._lazy is None:
+                from polars_engine import PolarsEngine
+                self._lazy = PolarsEngine(self.df)
+            return self._lazy
+
+    @property
+    def data_columns(self):
+        """The held columns other than the derived ones."""
+        return [col for col in self.df.columns if col not in DERIVED_COLUMNS]
+
+    def quality_report(self):
+        """Rule and column tables of the quality profile, and its totals."""
+        with self._lock:
+            quality = self.quality
+            return quality.rules_table(), quality.columns_table(), {
+                'rows': quality.rows, 'batches': quality.batches - 1,
+                'validation_score': quality.validation_score,
+                'missing': sum(quality.nulls.values()), 'imputed': sum(quality.imputed.values()),
+            }
+
+    def default_filters(self):
+        """The sidebar's initial filter state: the full admission date range."""
+        dates = self.df['date_of_admission']
+        return {'start': dates.min().normalize(), 'end': dates.max().normalize()}
+
+    def select(self, filters, cube='cells'):
+        """Cube cells for a filter state, cached until a batch touches it.
+
+        ``cube='stay'`` selects length-of-stay histogram cells instead.
+        """
+        def compute():
+            with self._lock:
+                source = self.stay_cube if cube == 'stay' else self.cube
+                return source.select(**filters)
+        return self._cached(('select', cube), filters, compute, len)
+
+    def rows(self, filters):
+        """Positions of the rows matching a filter state.
+
+        Pages gather just the rows and columns they draw from these instead
+        of slicing a filtered copy of the whole frame. They are resolved by
+        the row index, without a scan. Batches only append rows, so cached
+        positions stay valid until their filters are hit.
+        """
+        def compute():
+            with self._lock:
+                return self.index.select(**filters)
+        return self._cached(('rows',), filters, compute, len)
+
+    def breakdowns(self, filters):
+        """Totals and billing/stay breakdowns by hospital, insurer, month and
+        condition over the filtered rows, aggregated in worker processes."""
+        def compute():
+            rows = self.rows(filters)
+            with self._lock:
+                return self.aggregator.aggregate(rows)
+        return self._cached(('breakdowns',), filters, compute, lambda result: result[0]['count'])
+
+    def trend(self, filters, freq='M'):
+        """Admissions and billing per day, week, month or quarter (``freq``)
+        for a filter state, rolled up from the daily series."""
+        def compute():
+            with self._lock:
+                return self.timeseries.series(freq=freq, **filters)
+        return self._cached(('trend', freq), filters, compute, len)
+
+    def counts(self, column, filters, limit=None):
+        """Row counts per value of a column the cube does not hold (from SQL)."""
+        def compute():
+            return self.sql.counts(column, filters, limit)
+        return self._cached(('counts', column, limit), filters, compute, len)
+
+    def prime_counts(self, column, filters, counts, limit=None):
+        """Cache ``counts`` computed elsewhere (e.g. ``sql.counts_by`` for many
+        filter states in one scan) as the result of ``counts``."""
+        return self._cached(('counts', column, limit), filters, lambda: counts, len)
+
+    def table_rows(self, filters, sort='date_of_admission', search=''):
+        """Positions of the filtered rows whose name contains ``search``,
+        in ascending order of ``sort``, for the paginated patient table."""
+        def compute():
+            rows = self.rows(filters)
+            if search:
+                matches = self._cached(('search', search), {}, lambda: name_matches(self.df, search))
+                rows = rows[matches[rows]]
+            with self._lock:
+                return self.sort_orders.sort(rows, sort)
+        return self._cached(('table', sort, search), filters, compute, len)
+
+    def _feed_heavy_hitters(self, rows):
+        for col, weight in STREAM_TOP.items():
+            if col in rows.columns:
+                self.heavy_hitters[col].update(rows[col].to_numpy(), rows[weight].to_numpy() if weight else None)
+
+    def cached(self, namespace, filters, compute):
+        """Memoize a derived result (e.g. a page's figures) for a filter state."""
+        return self._cached(namespace, filters, compute)
+
+    def _cached(self, namespace, filters, compute, size=None):
+        # One traced span per lookup; 'cached' is False when it was computed
+        misses = self.cache.misses
+        with profiling.span('/'.join(map(str, namespace))) as record:
+            result = self.cache.get_or_compute(namespace, filters, compute)
+            record['cached'] = self.cache.misses == misses
+            if size is not None:
+                record['rows'] = size(result)
+        return result
+
+    def ingest(self, raw):
+        """Clean a batch of raw rows and merge it into the dataset and cube."""
+        with self._lock:
+            missing = [c for c in preprocessing.normalize_columns(raw.copy()).columns if c not in self.stats]
+            if missing:
+                self.stats.update(preprocessing.fit_imputation(preprocessing.clean(raw)[missing]))
+            cleaned = preprocessing.clean(raw)
+            # Missing values are counted for the quality profile before they are filled
+            imputed = cleaned.isnull().sum()
+            cleaned = preprocessing.add_validation(preprocessing.impute(cleaned, self.stats))
+            if self.parquet_path is not None:
+                self.parts.update(append_parquet(cleaned, self.parquet_path))
+            return self._merge(cleaned, imputed)
+
+    def refresh(self):
+        """Merge the files other processes appended to the Parquet dataset.
+
+        The new files are merged as one batch; returns its summary as
+        ``ingest`` does, in a list (empty without new files). A file that
+        cannot be read yet (still being written) is left for a later call.
+        """
+        if self.parquet_path is None:
+            return []
+        with self._lock:
+            new, tables = [], []
+            for part in parquet_parts(self.parquet_path):
+                if part in self.parts:
+                    continue
+                try:
+                    tables.append(pq.read_table(os.path.join(self.parquet_path, part)))
+                except (OSError, pa.ArrowInvalid):
+                    continue
+                new.append(part)
+            if not tables:
+                return []
+            self.parts.update(new)
+            # The rows were cleaned by the process that wrote them, which
+            # also counted the values it imputed
+            return [self._merge(pa.concat_tables(tables).to_pandas())]
+
+    def snapshot(self):
+        """The held frame and the Parquet files its rows come from, consistently."""
+        with self._lock:
+            return self.df, sorted(self.parts)
+
+    def _merge(self, cleaned, imputed=None):
+        # Merge cleaned rows into the frame and every structure built on it
+        with self._lock:
+            add_derived_columns(cleaned)
+
+            self.df = _append_rows(self.df, cleaned)
+            rows = self.df.iloc[len(self.df) - len(cleaned):]
+            self.cube.append(self.df, rows)
+            self.stay_cube.append(self.df, rows)
+            self.timeseries.append(rows)
+            self.sort_orders.reset(self.df)
+            self.index.append(self.df, rows)
+            self.aggregator.update(self.df)
+            self._feed_heavy_hitters(rows)
+            # The cleaned batch still has the columns the store does not hold (e.g. discharge dates)
+            quality = self.quality.update(cleaned, columns=self.data_columns, imputed=imputed)
+            if self._sql is not None:
+                self._sql.register(self.df, exclude=DERIVED_COLUMNS)
+            if self._lazy is not None:
+                self._lazy.register(self.df)
+
+            batch = {
+                'rows': len(rows),
+                'min_date': rows['date_of_admission'].min(),
+                'max_date': rows['date_of_admission'].max(),
+                'genders': set(rows['gender'].dropna()),
+                'hospitals': set(rows['hospital'].dropna()),
+                'quality': quality,
+            }
+            batch['invalidated'] = self.cache.invalidate(lambda namespace, filters: _stale(namespace, filters, batch))
+            self.version += 1
+            return batch
+
+    def ingest_pending(self, directory=INCOMING_DIR):
+        """Ingest raw CSV batches dropped into ``directory``.
+
+        Every session polls the directory, so each file is first claimed by
+        renaming it into ``directory/claimed``: only the caller whose rename
+        succeeds ingests it. Processed files are moved to ``directory/processed``.
+        Batches other processes merged are picked up first (``refresh``).
+        """
+        results = self.refresh()
+        if not os.path.isdir(directory):
+            return results
+        names = sorted(e.name for e in os.scandir(directory) if e.is_file() and e.name.endswith('.csv'))
+        claimed, done = os.path.join(directory, 'claimed'), os.path.join(directory, 'processed')
+        for name in names:
+            os.makedirs(claimed, exist_ok=True)
+            path = os.path.join(claimed, name)
+            try:
+                os.rename(os.path.join(directory, name), path)
+            except FileNotFoundError:
+                # Claimed by another session
+                continue
+            results.append(self.ingest(pd.read_csv(path)))
+            os.makedirs(done, exist_ok=True)
+            shutil.move(path, os.path.join(done, name))
+        return results
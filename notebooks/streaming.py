@@ -0,0 +1,195 @@
+"""Bounded-memory loading of raw healthcare extracts for the dashboard.
+
+    python streaming.py healthcare_dataset.csv --memory-limit 1024
+
+The raw CSV is read in fixed-size chunks. Each chunk is cleaned with frozen
+imputation statistics, folded into the aggregate cube and reduced to the
+typed dashboard columns (text as category codes against one dictionary per
+column), then dropped. Only those columns and the cube cells are kept, so a
+run needs memory for them plus one chunk in flight. The chunk size is
+derived from the memory limit unless given; a run whose retained data would
+exceed the limit stops with MemoryLimitExceeded instead of swapping the host.
+"""
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_COLUMNS, build_cells, merge_cells
+from perf import rss_mb
+from preprocessing import clean, clean_batch, fit_imputation, load_stats
+from storage import CATEGORICAL_COLS, write_parquet_chunks
+from store import DASHBOARD_COLUMNS
+
+RAW_PATH = 'healthcare_dataset.csv'
+DEFAULT_MEMORY_LIMIT_MB = 2048
+
+# Share of the limit reserved for the chunk being cleaned
+CHUNK_SHARE = 0.25
+# Peak size of a chunk while it is cleaned, relative to its raw frame
+CHUNK_OVERHEAD = 4
+SAMPLE_ROWS = 10_000
+MIN_CHUNKSIZE = 10_000
+MAX_CHUNKSIZE = 1_000_000
+# Per-chunk cube cells are merged once this many are pending
+MAX_PENDING_CELLS = 500_000
+
+StreamResult = namedtuple('StreamResult', ['df', 'cells', 'stats', 'report'])
+
+
+class MemoryLimitExceeded(MemoryError):
+    pass
+
+
+class _Categories:
+    """Category dictionary for one column, grown as chunks arrive."""
+
+    def __init__(self):
+        self.categories = pd.Index([], dtype=object)
+
+    def encode(self, values):
+        codes, uniques = pd.factorize(values)
+        positions = self.categories.get_indexer(uniques)
+        new = positions < 0
+        if new.any():
+            positions[new] = np.arange(len(self.categories), len(self.categories) + new.sum())
+            self.categories = self.categories.append(pd.Index(uniques[new], dtype=object))
+        return np.where(codes < 0, -1, positions[codes]).astype('int32')
+
+    def categorical(self, codes):
+        return pd.Categorical.from_codes(codes, categories=self.categories)
+
+
+def chunksize_for(path, memory_limit_mb):
+    """Rows per chunk so that one chunk in flight fits its share of the limit."""
+    sample = pd.read_csv(path, nrows=SAMPLE_ROWS)
+    if sample.empty:
+        return MIN_CHUNKSIZE
+    row_bytes = sample.memory_usage(deep=True).sum() / len(sample)
+    rows = int(memory_limit_mb * 1e6 * CHUNK_SHARE / (row_bytes * CHUNK_OVERHEAD))
+    return min(max(rows, MIN_CHUNKSIZE), MAX_CHUNKSIZE)
+
+
+def _nbytes(values):
+    if values.dtype == object:
+        return int(pd.Series(values).memory_usage(deep=True, index=False))
+    return values.nbytes
+
+
+def _align(cells, encoders):
+    # Chunk cells carry the categories known when they were built; categories
+    # are only ever appended, so widening keeps every value
+    for col, encoder in encoders.items():
+        if col in cells.columns:
+            cells[col] = cells[col].cat.set_categories(encoder.categories)
+    return cells
+
+
+def stream_load(path=RAW_PATH, columns=DASHBOARD_COLUMNS, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                chunksize=None, stats=None, parquet_path=None):
+    """Stream a raw extract into typed dashboard columns and cube cells.
+
+    ``stats`` are the frozen imputation statistics; they default to the saved
+    ones and, failing that, are fitted on the first chunk. With
+    ``parquet_path`` the cleaned chunks are also written as the Parquet
+    dataset, so later starts can load it instead of the raw file.
+    """
+    columns = list(dict.fromkeys(list(columns) + CUBE_COLUMNS))
+    limit = memory_limit_mb * 1e6
+    chunksize = chunksize or chunksize_for(path, memory_limit_mb)
+    if stats is None:
+        stats = load_stats()
+    stats_source = 'given' if stats is not None else None
+
+    encoders = {col: _Categories() for col in columns if col in CATEGORICAL_COLS}
+    parts = {col: [] for col in columns}
+    pending, pending_rows = [], 0
+    report = {'rows': 0, 'chunks': 0, 'chunksize': chunksize, 'retained_mb': 0.0}
+    retained = 0
+    peak = rss_mb()
+    start = time.perf_counter()
+
+    def cleaned_chunks():
+        nonlocal stats, stats_source, pending, pending_rows, retained, peak
+        for raw in pd.read_csv(path, chunksize=chunksize):
+            if stats is None:
+                stats = fit_imputation(clean(raw))
+                stats_source = 'first chunk'
+            df = clean_batch(raw, stats)
+
+            typed = {}
+            for col in columns:
+                if col in encoders:
+                    codes = encoders[col].encode(df[col])
+                    parts[col].append(codes)
+                    typed[col] = encoders[col].categorical(codes)
+                else:
+                    # A copy, so the chunk's 2-D blocks are not kept alive by a view
+                    values = df[col].to_numpy(copy=True)
+                    parts[col].append(values)
+                    typed[col] = values
+                retained += _nbytes(parts[col][-1])
+            cells = build_cells(pd.DataFrame(typed))
+            pending.append(cells)
+            pending_rows += len(cells)
+            if pending_rows > MAX_PENDING_CELLS:
+                pending = [merge_cells([_align(c, encoders) for c in pending])]
+                pending_rows = len(pending[0])
+
+            report['rows'] += len(df)
+            report['chunks'] += 1
+            peak = max(peak, rss_mb())
+            # Assembling the columns at the end briefly holds them twice
+            cells_bytes = sum(c.memory_usage(index=False).sum() for c in pending)
+            if 2 * retained + cells_bytes > (1 - CHUNK_SHARE) * limit:
+                raise MemoryLimitExceeded(
+                    f"{path}: {report['rows']:,} rows already need "
+                    f"{(2 * retained + cells_bytes) / 1e6:,.0f} MB, over the "
+                    f"{memory_limit_mb:,} MB limit; raise the limit or load fewer columns"
+                )
+            yield df
+
+    if parquet_path is not None:
+        write_parquet_chunks(cleaned_chunks(), parquet_path)
+    else:
+        for _ in cleaned_chunks():
+            pass
+
+    data = {}
+    for col in columns:
+        values = np.concatenate(parts.pop(col)) if report['chunks'] else np.array([])
+        data[col] = encoders[col].categorical(values) if col in encoders else values
+    df = pd.DataFrame(data)
+    cells = merge_cells([_align(c, encoders) for c in pending]) if pending else build_cells(df)
+    peak = max(peak, rss_mb())
+
+    seconds = time.perf_counter() - start
+    report.update({
+        'seconds': seconds,
+        'rows_per_sec': report['rows'] / seconds if seconds else 0.0,
+        'peak_rss_mb': peak,
+        'retained_mb': float(df.memory_usage(deep=True, index=False).sum()) / 1e6,
+        'stats_source': stats_source,
+    })
+    return StreamResult(df, cells, stats, report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load a raw extract with bounded memory.')
+    parser.add_argument('input', nargs='?', default=RAW_PATH)
+    parser.add_argument('--memory-limit', type=int, default=DEFAULT_MEMORY_LIMIT_MB, help='MB')
+    parser.add_argument('--chunksize', type=int, help='rows per chunk (default: derived from the limit)')
+    parser.add_argument('--parquet', help='also write the cleaned rows as a Parquet dataset')
+    args = parser.parse_args()
+
+    report = stream_load(args.input, memory_limit_mb=args.memory_limit, chunksize=args.chunksize,
+                         parquet_path=args.parquet).report
+    print(f"{report['rows']:,} rows in {report['chunks']} chunks of {report['chunksize']:,}, "
+          f"{report['seconds']:.1f}s ({report['rows_per_sec']:,.0f} rows/sec)")
+    print(f"retained {report['retained_mb']:,.0f} MB, peak RSS {report['peak_rss_mb']:,.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Synthetic admissions with the schema and skew of the healthcare extract.
+
+The data files ship as empty placeholders. This generates rows with the raw
+extract's 15 columns in chunks, so any size (e.g. 100M rows) is written in
+bounded memory:
+
+    python synthetic.py --rows 100000000 --out healthcare_dataset_parquet
+    python synthetic.py --rows 1000000 --format csv --out healthcare_dataset.csv
+
+CSV output is raw, as the notebook and ``pipeline.py`` expect it. Parquet
+output is the dashboard's dataset: each chunk goes through
+``preprocessing.clean_batch`` with imputation statistics fitted on the first
+100,000 rows (saved with --stats). Chunks are seeded independently and
+generated in --workers processes.
+
+Distributions follow the public extract (55,500 rows):
+
+- hospital: very high cardinality (39,876 names in the extract); here
+  --hospitals names with weights falling off as rank ** -skew, so a few
+  large hospitals and a long tail;
+- 6 conditions, 5 insurers, 8 blood types, 3 admission types, 5 medications
+  and 3 test results, each uniform;
+- admissions from 2019-05-08 over five years, stays of 1-30 days, ages
+  13-89, rooms 101-500, billing uniform over about -2,000 to 53,000 (the
+  few negative amounts included);
+- patient names in the extract's random letter case ("bobby JacksOn").
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import preprocessing
+from storage import PARQUET_PATH, write_parquet_chunks
+from chunks import ordered_map
+from streaming import RAW_PATH
+
+HOSPITALS = 40_000
+SKEW = 0.6
+CHUNKSIZE = 1_000_000
+NAME_POOL = 50_000
+DOCTOR_POOL = 40_000
+FIRST_ADMISSION = pd.Timestamp('2019-05-08')
+ADMISSION_DAYS = 1826
+# Rows the imputation statistics are fitted on
+STATS_ROWS = 100_000
+
+# Name pools of this process, by (seed, hospitals)
+_POOLS = {}
+
+FIRST_NAMES = [
+    'Aaron', 'Adrienne', 'Alexander', 'Amanda', 'Andrew', 'Angela', 'Anthony', 'Ashley',
+    'Benjamin', 'Bobby', 'Brandon', 'Brian', 'Christina', 'Christopher', 'Daniel', 'Danny',
+    'David', 'Elizabeth', 'Emily', 'Eric', 'Jacob', 'James', 'Jennifer', 'Jessica', 'John',
+    'Jonathan', 'Joseph', 'Joshua', 'Karen', 'Kelly', 'Kevin', 'Laura', 'Leslie', 'Linda',
+    'Lisa', 'Mark', 'Matthew', 'Melissa', 'Michael', 'Michelle', 'Nicole', 'Patricia',
+    'Rachel', 'Richard', 'Robert', 'Ryan', 'Samantha', 'Sarah', 'Stephanie', 'Tiffany',
+]
+LAST_NAMES = [
+    'Adams', 'Allen', 'Anderson', 'Baker', 'Bennett', 'Brown', 'Campbell', 'Carter', 'Clark',
+    'Collins', 'Cook', 'Davis', 'Edwards', 'Evans', 'Garcia', 'Gonzalez', 'Green', 'Hall',
+    'Harris', 'Hernandez', 'Hill', 'Jackson', 'Johnson', 'Jones', 'Kim', 'King', 'Lee',
+    'Lewis', 'Lopez', 'Martin', 'Martinez', 'Miller', 'Mitchell', 'Moore', 'Morris',
+    'Nelson', 'Parker', 'Perez', 'Phillips', 'Roberts', 'Robinson', 'Rodriguez', 'Scott',
+    'Smith', 'Stewart', 'Taylor', 'Terry', 'Thomas', 'Thompson', 'Turner', 'Walker', 'Watts',
+    'White', 'Williams', 'Wilson', 'Wright', 'Young', 'Vang', 'Rogers',
+]
+HOSPITAL_PATTERNS = [
+    '{a}, {b} and {c}', '{a} {b} and {c}', '{a}-{b} {c} Ltd', '{a} {b} {c} PLC', '{a} {b} {c} Group',
+]
+TITLES = ['', '', '', '', 'Mr. ', 'Mrs. ', 'Dr. ']
+SUFFIXES = ['', '', '', '', '', ' MD', ' PhD', ' DDS']
+
+CONDITIONS = ['Arthritis', 'Asthma', 'Cancer', 'Diabetes', 'Hypertension', 'Obesity']
+INSURERS = ['Aetna', 'Blue Cross', 'Cigna', 'Medicare', 'UnitedHealthcare']
+BLOOD_TYPES = ['A+', 'A-', 'AB+', 'AB-', 'B+', 'B-', 'O+', 'O-']
+ADMISSION_TYPES = ['Elective', 'Emergency', 'Urgent']
+MEDICATIONS = ['Aspirin', 'Ibuprofen', 'Lipitor', 'Paracetamol', 'Penicillin']
+TEST_RESULTS = ['Abnormal', 'Inconclusive', 'Normal']
+GENDERS = ['Female', 'Male']
+
+
+def hospital_names(count):
+    """``count`` distinct hospital names in the extract's style."""
+    n = len(LAST_NAMES)
+    if count > len(HOSPITAL_PATTERNS) * n ** 3:
+        raise ValueError(f'at most {len(HOSPITAL_PATTERNS) * n ** 3:,} hospital names')
+    names = []
+    for i in range(count):
+        j, pattern = divmod(i, len(HOSPITAL_PATTERNS))
+        # A bijection of 0..n**3 - 1, so consecutive names share no surnames
+        j = (j + 1) * 7919 % n ** 3
+        a, b, c = j % n, j // n % n, j // n ** 2
+        names.append(HOSPITAL_PATTERNS[pattern].format(a=LAST_NAMES[a], b=LAST_NAMES[b], c=LAST_NAMES[c]))
+    return names
+
+
+def _random_case(rng, names):
+    # Each letter lower or upper case at random, as in the extract
+    return [''.join(ch.upper() if up else ch.lower() for ch, up in zip(name, rng.random(len(name)) < 0.3))
+            for name in names]
+
+
+def _pools(seed, hospitals):
+    key = (seed, hospitals)
+    if key not in _POOLS:
+        rng = np.random.default_rng(seed)
+        first = rng.choice(FIRST_NAMES, NAME_POOL)
+        last = rng.choice(LAST_NAMES, NAME_POOL)
+        titles = rng.choice(TITLES, NAME_POOL)
+        suffixes = rng.choice(SUFFIXES, NAME_POOL)
+        patients = _random_case(rng, [f'{t}{f} {l}{s}' for t, f, l, s in zip(titles, first, last, suffixes)])
+        doctors = [f'{f} {l}' for f, l in zip(rng.choice(FIRST_NAMES, DOCTOR_POOL), rng.choice(LAST_NAMES, DOCTOR_POOL))]
+        weights = np.arange(1, hospitals + 1, dtype='float64') ** -SKEW
+        _POOLS[key] = {
+            'Name': pd.Index(patients),
+            'Doctor': pd.Index(doctors),
+            # Shuffled, so the largest hospitals are not the first names
+            'Hospital': pd.Index(hospital_names(hospitals)).take(rng.permutation(hospitals)),
+            'hospital_cdf': np.cumsum(weights / weights.sum()),
+        }
+    return _POOLS[key]
+
+
+def _uniform(rng, values, n):
+    return pd.Categorical.from_codes(rng.integers(0, len(values), n), values)
+
+
+def _chunk(task):
+    """Raw rows of chunk ``i``, cleaned when imputation statistics are given."""
+    seed, i, n, hospitals, stats = task
+    rng = np.random.default_rng([seed, i])
+    pools = _pools(seed, hospitals)
+    admission = FIRST_ADMISSION + pd.to_timedelta(rng.integers(0, ADMISSION_DAYS, n), unit='D')
+    stay = pd.to_timedelta(rng.integers(1, 31, n), unit='D')
+    hospital = np.searchsorted(pools['hospital_cdf'], rng.random(n), side='right')
+    hospital = np.minimum(hospital, hospitals - 1)
+    raw = pd.DataFrame({
+        'Name': pools['Name'].take(rng.integers(0, NAME_POOL, n)),
+        'Age': rng.integers(13, 90, n),
+        'Gender': _uniform(rng, GENDERS, n),
+        'Blood Type': _uniform(rng, BLOOD_TYPES, n),
+        'Medical Condition': _uniform(rng, CONDITIONS, n),
+        'Date of Admission': admission,
+        'Doctor': pools['Doctor'].take(rng.integers(0, DOCTOR_POOL, n)),
+        'Hospital': pools['Hospital'].take(hospital),
+        'Insurance Provider': _uniform(rng, INSURERS, n),
+        'Billing Amount': rng.uniform(-2_000, 53_000, n),
+        'Room Number': rng.integers(101, 501, n),
+        'Admission Type': _uniform(rng, ADMISSION_TYPES, n),
+        'Discharge Date': admission + stay,
+        'Medication': _uniform(rng, MEDICATIONS, n),
+        'Test Results': _uniform(rng, TEST_RESULTS, n),
+    })
+    return raw if stats is None else preprocessing.clean_batch(raw, stats)
+
+
+def _tasks(rows, seed, hospitals, chunksize, stats=None):
+    return ((seed, i, min(chunksize, rows - lo), hospitals, stats) for i, lo in enumerate(range(0, rows, chunksize)))
+
+
+def generate(rows, seed=0, hospitals=HOSPITALS, chunksize=CHUNKSIZE, workers=1):
+    """Raw rows in chunks of ``chunksize``; the same arguments give the same rows.
+
+    Chunks are generated independently, ``workers`` at a time.
+    """
+    return ordered_map(_chunk, _tasks(rows, seed, hospitals, chunksize), workers)
+
+
+def fit_stats(seed=0, hospitals=HOSPITALS):
+    """Imputation statistics of the first STATS_ROWS generated rows."""
+    return preprocessing.fit_imputation(preprocessing.clean(_chunk((seed, 0, STATS_ROWS, hospitals, None))))
+
+
+def generate_clean(rows, seed=0, hospitals=HOSPITALS, chunksize=CHUNKSIZE, workers=1, stats=None):
+    """Chunks of ``generate`` cleaned like the preprocessed dataset."""
+    stats = stats or fit_stats(seed, hospitals)
+    return ordered_map(_chunk, _tasks(rows, seed, hospitals, chunksize, stats), workers)
+
+
+def write_csv(path, rows, **kwargs):
+    written = 0
+    for i, chunk in enumerate(generate(rows, **kwargs)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False, date_format='%Y-%m-%d')
+        written += len(chunk)
+    return written
+
+
+def write_parquet(path, rows, stats_path=None, seed=0, hospitals=HOSPITALS, **kwargs):
+    stats = fit_stats(seed, hospitals)
+    written = write_parquet_chunks(generate_clean(rows, seed, hospitals, stats=stats, **kwargs), path)
+    if stats_path:
+        preprocessing.save_stats(stats, stats_path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--out', help='output path (default: the dashboard\'s dataset path for the format)')
+    parser.add_argument('--hospitals', type=int, default=HOSPITALS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--stats', help='also save the imputation statistics (Parquet output)')
+    args = parser.parse_args()
+
+    kwargs = dict(seed=args.seed, hospitals=args.hospitals, chunksize=args.chunksize, workers=args.workers)
+    start = time.perf_counter()
+    if args.format == 'csv':
+        out = args.out or RAW_PATH
+        rows = write_csv(out, args.rows, **kwargs)
+    else:
+        out = args.out or PARQUET_PATH
+        rows = write_parquet(out, args.rows, stats_path=args.stats, **kwargs)
+    seconds = time.perf_counter() - start
+    print(f"{rows:,} rows written to {out} in {seconds:.1f}s ({rows / seconds:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Server-side pages of the filtered patient list.
+
+The dashboard's patient table never sends the filtered rows to the
+browser: only the requested page of rows, with the chosen columns, is
+gathered from the store. Sorting uses one ascending order per sortable
+column over all held rows, computed on first use and kept until a batch
+arrives. A filter state's rows are put in that order either by walking the
+global order and keeping the selected rows (large selections, O(rows)
+without a sort) or by sorting their ranks (small selections). The sorted
+selection is cached per filter state, sort column and search, so moving
+between pages only slices it and costs the same at any dataset size.
+
+Name search is a case-insensitive substring match over the held names,
+computed once per search text.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from row_index import position_dtype
+
+TABLE_COLUMNS = [
+    'name', 'age', 'gender', 'medical_condition', 'hospital', 'date_of_admission',
+    'insurance_provider', 'billing_amount', 'room_number', 'length_of_stay', 'test_results'
+]
+DEFAULT_COLUMNS = ['name', 'age', 'gender', 'medical_condition', 'hospital', 'date_of_admission']
+SORT_COLUMNS = ['date_of_admission', 'name', 'age', 'hospital', 'billing_amount', 'length_of_stay', 'room_number']
+PAGE_SIZES = [25, 50, 100, 250]
+# Selections holding at least this share of the rows walk the global order
+SCAN_SHARE = 1 / 16
+
+
+def _text(values):
+    return pa.array(values, type=pa.string(), from_pandas=True)
+
+
+def sort_order(values):
+    """Stable ascending order of a column's positions; missing values last.
+
+    Text sorts case-insensitively (names are held in random letter case)
+    and categories by label.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Rank of each category's label; missing values (code -1) last
+        label_rank = np.argsort(np.argsort(values.cat.categories.astype(str), kind='stable'))
+        codes = values.cat.codes.to_numpy()
+        keys = np.where(codes >= 0, label_rank[codes], len(label_rank))
+        return np.argsort(keys, kind='stable')
+    if values.dtype.kind in 'iufMm':
+        return np.argsort(values.to_numpy(), kind='stable')
+    # Nulls sort last by default
+    return pc.sort_indices(pc.utf8_lower(_text(values))).to_numpy()
+
+
+class SortOrders:
+    """Ascending orders (and ranks) of the sortable columns, built on demand."""
+
+    def __init__(self, df):
+        self.reset(df)
+
+    def reset(self, df):
+        """Forget the orders of a previous version of the rows."""
+        self.df = df
+        self._orders = {}
+        self._ranks = {}
+
+    def order(self, col):
+        if col not in self._orders:
+            self._orders[col] = sort_order(self.df[col]).astype(position_dtype(len(self.df)))
+        return self._orders[col]
+
+    def rank(self, col):
+        if col not in self._ranks:
+            order = self.order(col)
+            rank = np.empty(len(order), dtype=order.dtype)
+            rank[order] = np.arange(len(order))
+            self._ranks[col] = rank
+        return self._ranks[col]
+
+    def sort(self, rows, col):
+        """``rows`` (positions) in ascending order of ``col``."""
+        n = len(self.df)
+        if len(rows) >= n * SCAN_SHARE:
+            selected = np.zeros(n, dtype=bool)
+            selected[rows] = True
+            order = self.order(col)
+            return order[selected[order]]
+        return rows[np.argsort(self.rank(col)[rows], kind='stable')]
+
+
+def name_matches(df, text):
+    """Mask of the rows whose name contains ``text``, ignoring case."""
+    mask = pc.match_substring(_text(df['name']), text, ignore_case=True)
+    return pc.fill_null(mask, False).to_numpy(zero_copy_only=False)
+
+
+def page(store, filters, sort='date_of_admission', descending=False, search='',
+         columns=DEFAULT_COLUMNS, number=1, size=PAGE_SIZES[1]):
+    """Rows of page ``number`` (from 1) and the number of matching rows.
+
+    Only the page's rows and ``columns`` are gathered from the store.
+    """
+    rows = store.table_rows(filters, sort, search)
+    total = len(rows)
+    lo = (number - 1) * size
+    hi = min(lo + size, total)
+    if descending:
+        positions = rows[total - hi:total - lo][::-1] if lo < total else rows[:0]
+    else:
+        positions = rows[lo:hi]
+    return store.df.iloc[positions][list(columns)], total
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import KEYS, ShardedAggregator
+from cube import MEASURES
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 1_000
+    df = pd.DataFrame({key: pd.Categorical(rng.choice(['a', 'b', 'c'], n)) for key in KEYS})
+    for m in MEASURES:
+        values = rng.uniform(1, 100, n)
+        values[rng.random(n) < 0.2] = np.nan
+        df[m] = values
+    return df
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_means_skip_missing_measures(df, workers):
+    aggregator = ShardedAggregator(df, workers=workers, min_rows=0)
+    rows = np.arange(0, len(df), 3)
+    try:
+        totals, breakdowns = aggregator.aggregate(rows)
+    finally:
+        aggregator.close()
+    selected = df.iloc[rows]
+    assert totals['count'] == len(selected)
+    for m in MEASURES:
+        assert totals[f'{m}_count'] == selected[m].count()
+        assert totals[f'{m}_mean'] == pytest.approx(selected[m].mean())
+    for key in KEYS:
+        expected = selected.groupby(key, observed=True)[MEASURES].agg(['count', 'mean'])
+        for m in MEASURES:
+            np.testing.assert_array_equal(breakdowns[key][f'{m}_count'], expected[(m, 'count')])
+            np.testing.assert_allclose(breakdowns[key][f'{m}_mean'], expected[(m, 'mean')])
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cube
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 1_000
+    df = pd.DataFrame({
+        'date_of_admission': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+        'age': rng.integers(1, 90, n),
+    })
+    for col in ['gender', 'hospital', 'medical_condition', 'insurance_provider', 'test_results']:
+        df[col] = pd.Categorical(rng.choice(['a', 'b', 'c'], n))
+    for m in cube.MEASURES:
+        values = rng.integers(1, 30, n).astype('float64')
+        values[rng.random(n) < 0.2] = np.nan
+        df[m] = values
+    return df
+
+
+def test_means_skip_missing_measures(df):
+    cells = cube.AggregateCube(df).select(start='2023-02-10', end='2023-11-20')
+    selected = df[df['date_of_admission'].between('2023-02-10', '2023-11-20')]
+    totals = cube.totals(cells)
+    by_condition = cube.rollup(cells, 'medical_condition')
+    expected = selected.groupby('medical_condition', observed=True)
+    for m in cube.MEASURES:
+        assert totals[f'{m}_count'] == selected[m].count()
+        assert totals[f'{m}_mean'] == pytest.approx(selected[m].mean())
+        np.testing.assert_allclose(by_condition[f'{m}_mean'], expected[m].mean())
+        np.testing.assert_allclose(by_condition[f'{m}_std'], expected[m].std())
@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+import pyarrow.parquet as pq
+
+import features
+import synthetic
+
+ROWS = 1_000
+
+
+def test_build_encodes_a_part_with_an_all_null_column(tmp_path):
+    path = str(tmp_path / 'data')
+    synthetic.write_parquet(path, ROWS)
+    # An appended batch without any medication
+    first = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)[0]
+    batch = pq.read_table(first).to_pandas().head(50)
+    batch['medication'] = None
+    batch.to_parquet(os.path.join(os.path.dirname(first), 'batch-0.parquet'), index=False)
+
+    result = features.build(path, str(tmp_path / 'features'), str(tmp_path / 'cache'), workers=1)
+    onehot, codes, numeric, meta = features.load(str(tmp_path / 'features'))
+
+    assert result['rows'] == ROWS + 50
+    medication = codes[:, features.CODE_COLS.index('medication')]
+    assert (medication == meta['missing_code']).sum() == 50
+    assert onehot.shape[0] == ROWS + 50
+    assert np.isin(medication[medication != meta['missing_code']],
+                   np.arange(len(meta['vocabulary']['medication']))).all()
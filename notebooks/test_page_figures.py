@@ -0,0 +1,30 @@
+import pytest
+
+import page_figures
+import synthetic
+from storage import load_parquet
+from store import DASHBOARD_COLUMNS, DataStore
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('data') / 'data')
+    synthetic.write_parquet(path, 2_000)
+    store = DataStore(load_parquet(path, DASHBOARD_COLUMNS))
+    yield store
+    store.aggregator.close()
+
+
+@pytest.mark.parametrize('page', ['general', 'clinical', 'financial'])
+def test_empty_selection_shows_dashes(store, page):
+    # No admissions after the last one
+    start = store.df['date_of_admission'].max() + (store.df['date_of_admission'].max() - store.df['date_of_admission'].min())
+    filters = {'start': start, 'end': start}
+    view = page_figures.view(store, page, filters)
+    assert view['figures'] == {}
+    for name, value in view.get('metrics', {}).items():
+        assert 'nan' not in value.lower(), name
+    if page == 'general':
+        assert view['metrics']['Patients per Hospital'] == '–'
+    if page == 'financial':
+        assert view['metrics']['Patients per Condition'] == '–'
@@ -0,0 +1,10 @@
+from reports import report_names
+
+
+def test_report_names_are_unique_for_colliding_slugs():
+    values = ['Evans, Green and Anderson', 'Evans Green and Anderson', 'Smith Ltd']
+    names = report_names('hospital', values)
+    assert sorted(names.values()) == sorted(values)
+    assert names['hospital-smith-ltd'] == 'Smith Ltd'
+    assert all(name.startswith('hospital-evans-green-and-anderson-') for name, value in names.items()
+               if value != 'Smith Ltd')
@@ -0,0 +1,101 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import shared
+import synthetic
+from storage import load_parquet
+from store import DASHBOARD_COLUMNS, DataStore, prepare_frame
+
+ROWS = 2_000
+BATCH_ROWS = 500
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / 'data')
+    synthetic.write_parquet(path, ROWS)
+    store = DataStore(load_parquet(path, DASHBOARD_COLUMNS), parquet_path=path)
+    yield store
+    store.aggregator.close()
+
+
+def test_concurrent_ingest_pending_ingests_each_batch_once(store, tmp_path):
+    incoming = tmp_path / 'incoming'
+    incoming.mkdir()
+    synthetic.write_csv(str(incoming / 'batch.csv'), BATCH_ROWS, seed=1)
+    errors = []
+
+    def poll():
+        try:
+            store.ingest_pending(str(incoming))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=poll) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(store.df) == ROWS + BATCH_ROWS
+    assert len(load_parquet(store.parquet_path, DASHBOARD_COLUMNS)) == ROWS + BATCH_ROWS
+    assert os.listdir(incoming / 'processed') == ['batch.csv']
+    assert not any(name.endswith('.csv') for name in os.listdir(incoming))
+
+
+def test_refresh_merges_batches_another_process_appended(store, tmp_path):
+    # A second server process's store over the same dataset
+    other = DataStore(load_parquet(store.parquet_path, DASHBOARD_COLUMNS), parquet_path=store.parquet_path)
+    try:
+        synthetic.write_csv(str(tmp_path / 'batch.csv'), BATCH_ROWS, seed=1)
+        store.ingest(pd.read_csv(tmp_path / 'batch.csv'))
+
+        assert [batch['rows'] for batch in other.refresh()] == [BATCH_ROWS]
+        assert other.refresh() == []
+        assert store.refresh() == []
+        assert len(other.df) == ROWS + BATCH_ROWS
+        assert other.parts == store.parts
+        # The batch's rows are held in another order, so sums may differ in the last bits
+        totals, breakdowns = store.breakdowns({})
+        other_totals, other_breakdowns = other.breakdowns({})
+        assert other_totals == pytest.approx(totals, nan_ok=True)
+        for key, frame in breakdowns.items():
+            pd.testing.assert_frame_equal(other_breakdowns[key], frame)
+    finally:
+        other.aggregator.close()
+
+
+def test_republished_frame_holds_the_merged_batches(tmp_path, monkeypatch):
+    monkeypatch.setenv(shared.SHARED_DIR_ENV, str(tmp_path))
+    path = str(tmp_path / 'data')
+    synthetic.write_parquet(path, ROWS)
+    df, parts = shared.load(path, DASHBOARD_COLUMNS, prepare_frame)
+    store = DataStore(df, parquet_path=path, parts=parts)
+    synthetic.write_csv(str(tmp_path / 'batch.csv'), BATCH_ROWS, seed=1)
+    store.ingest(pd.read_csv(tmp_path / 'batch.csv'))
+    store.aggregator.close()
+
+    df, parts = store.snapshot()
+    assert shared.republish(df, parts, path, DASHBOARD_COLUMNS, prepare_frame) is not None
+    # A process started now attaches the merged rows, with nothing left to refresh
+    df, parts = shared.load(path, DASHBOARD_COLUMNS, prepare_frame)
+    assert len(df) == ROWS + BATCH_ROWS
+    assert parts == sorted(store.parts)
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.arrow')] == [
+        os.path.basename(shared.published_path(path, DASHBOARD_COLUMNS))]
+
+
+def test_merged_batch_drops_cached_heavy_hitter_views(store, tmp_path):
+    # The batch's hospitals and dates do not overlap this filter state
+    filters = {'hospital': 'No Such Hospital'}
+    for top_mode in ('exact', 'streaming'):
+        store.cached(('page', 'financial', 'auto', top_mode, 'M'), filters, lambda: 'before')
+    synthetic.write_csv(str(tmp_path / 'batch.csv'), BATCH_ROWS, seed=1)
+    store.ingest(pd.read_csv(tmp_path / 'batch.csv'))
+
+    assert store.cached(('page', 'financial', 'auto', 'exact', 'M'), filters, lambda: 'after') == 'before'
+    assert store.cached(('page', 'financial', 'auto', 'streaming', 'M'), filters, lambda: 'after') == 'after'
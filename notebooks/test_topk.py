@@ -0,0 +1,14 @@
+from topk import HeavyHitters
+
+
+def test_heavy_hitters_top_ranks_clipped_estimates():
+    hitters = HeavyHitters(capacity=2)
+    hitters.update(['a'], [5.0])
+    hitters.update(['b'], [3.0])
+    # 'c' evicts 'b' and inherits its count: Space-Saving ranks it first with
+    # 7, the sketch bounds it by its true total of 4
+    hitters.update(['c'], [4.0])
+    top = hitters.top(2)
+    assert list(top.index) == ['a', 'c']
+    assert top['estimate'].tolist() == [5.0, 4.0]
+    assert top['lower'].tolist() == [5.0, 4.0]
@@ -0,0 +1,161 @@
+"""Daily admission counts and billing sums behind the dashboard's trend charts.
+
+Admissions are counted once per day: a dense array over (day, gender,
+medical condition), and sparse cells per (hospital, day, gender) for the
+financial page's hospital filter. A trend for a filter state slices the
+days of its date range and rolls them up to the selected granularity
+(daily, weekly, monthly or quarterly), so its cost depends on the number
+of days rather than rows. New batches are added to the days they touch.
+"""
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = 'date_of_admission'
+# Trend granularities offered by the pages: label -> pandas period frequency
+FREQUENCIES = {'Daily': 'D', 'Weekly': 'W', 'Monthly': 'M', 'Quarterly': 'Q'}
+PERIOD_NAMES = {'D': 'Day', 'W': 'Week', 'M': 'Month', 'Q': 'Quarter'}
+# Axis labels of each granularity's periods; weeks are labelled by their Monday
+LABEL_FORMATS = {'D': '%Y-%m-%d', 'W': '%Y-%m-%d', 'M': '%Y-%m', 'Q': '%Y Q%q'}
+CELL_DTYPES = {'hospital': 'int32', 'day': 'int32', 'gender': 'int8', 'count': 'int32', 'billing': 'float64'}
+
+
+def _codes(labels, values):
+    # Codes of ``values`` in ``labels``, extended with any new values; -1
+    # (the last slot of the dense arrays) for missing values
+    new = pd.Index(pd.unique(values.dropna())).difference(labels)
+    if len(new):
+        labels = labels.append(new) if len(labels) else new
+    return labels, labels.get_indexer(values)
+
+
+def _slots(labels, value):
+    # [code] of a label, or no slots for an unknown one
+    code = labels.get_indexer([value])[0]
+    return [code] if code >= 0 else []
+
+
+def period_labels(index):
+    """Axis labels for a PeriodIndex returned by ``DailySeries.series``."""
+    fmt = LABEL_FORMATS.get(index.freqstr.split('-')[0], '%Y-%m-%d')
+    return index.strftime(fmt) if '%q' in fmt else index.start_time.strftime(fmt)
+
+
+class DailySeries:
+    """Admissions and billing per day, gender, condition and hospital."""
+
+    def __init__(self, df):
+        self.first_day = None
+        self.genders = pd.Index([])
+        self.conditions = pd.Index([])
+        self.hospitals = pd.Index([])
+        self.counts = np.zeros((0, 1, 1), dtype='int64')
+        self.billing = np.zeros((0, 1, 1), dtype='float64')
+        # Sparse (hospital, day, gender) cells, sorted by hospital code
+        self.cells = {key: np.zeros(0, dtype=dtype) for key, dtype in CELL_DTYPES.items()}
+        self.append(df)
+
+    @property
+    def days(self):
+        return self.counts.shape[0]
+
+    def _resize(self, first_day, days):
+        # Grow the dense arrays to cover ``days`` days from ``first_day`` and
+        # every known gender and condition (plus one slot for missing values)
+        shape = (days, len(self.genders) + 1, len(self.conditions) + 1)
+        shift = 0 if self.first_day is None else (self.first_day - first_day).days
+        for name in ('counts', 'billing'):
+            old = getattr(self, name)
+            new = np.zeros(shape, dtype=old.dtype)
+            g, c = old.shape[1] - 1, old.shape[2] - 1
+            # Known labels keep their codes; the missing slot moves to the end
+            new[shift:shift + old.shape[0], :g, :c] = old[:, :g, :c]
+            new[shift:shift + old.shape[0], -1, :c] = old[:, -1, :c]
+            new[shift:shift + old.shape[0], :g, -1] = old[:, :g, -1]
+            new[shift:shift + old.shape[0], -1, -1] = old[:, -1, -1]
+            setattr(self, name, new)
+        self.cells['day'] += shift
+        self.first_day = first_day
+
+    def append(self, rows):
+        """Add the admissions of ``rows`` to their days."""
+        dates = rows[DATE_COLUMN]
+        dated = dates.notna().to_numpy()
+        if not dated.any():
+            return
+        rows = rows[dated]
+        day = rows[DATE_COLUMN].to_numpy().astype('datetime64[D]')
+        self.genders, gender = _codes(self.genders, rows['gender'])
+        self.conditions, condition = _codes(self.conditions, rows['medical_condition'])
+        self.hospitals, hospital = _codes(self.hospitals, rows['hospital'])
+
+        lo, hi = pd.Timestamp(day.min()), pd.Timestamp(day.max())
+        first = lo if self.first_day is None else min(lo, self.first_day)
+        last = hi if self.first_day is None else max(hi, self.first_day + pd.Timedelta(days=self.days - 1))
+        self._resize(first, (last - first).days + 1)
+        day = (day - np.datetime64(first, 'D')).astype('int64')
+
+        billing = rows['billing_amount'].to_numpy(dtype='float64', na_value=0.0)
+        shape = self.counts.shape
+        flat = np.ravel_multi_index((day, gender % shape[1], condition % shape[2]), shape)
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(shape)
+        self.billing += np.bincount(flat, billing, minlength=self.billing.size).reshape(shape)
+
+        # Cells of the batch, merged with the held ones and kept sorted
+        keys = pd.DataFrame({'hospital': hospital, 'day': day, 'gender': gender, 'billing': billing})
+        new = keys.groupby(['hospital', 'day', 'gender'], sort=False)['billing'].agg(['size', 'sum'])
+        new = new.reset_index().rename(columns={'size': 'count', 'sum': 'billing'})
+        cells = {
+            key: np.concatenate([self.cells[key], new[key].to_numpy().astype(dtype)])
+            for key, dtype in CELL_DTYPES.items()
+        }
+        order = np.argsort(cells['hospital'], kind='stable')
+        self.cells = {key: values[order] for key, values in cells.items()}
+
+    def _day(self, ts):
+        return (pd.Timestamp(ts).normalize() - self.first_day).days
+
+    def series(self, start=None, end=None, gender=None, hospital=None, condition=None, freq='M'):
+        """Admissions (``count``) and ``billing_amount_sum`` per period of ``freq``.
+
+        Indexed by period, from the first to the last period with
+        admissions; periods in between without any are zero. ``condition``
+        cannot be combined with ``hospital``.
+        """
+        empty = pd.DataFrame({'count': [], 'billing_amount_sum': []},
+                             index=pd.PeriodIndex([], freq=freq))
+        if self.first_day is None:
+            return empty
+        lo = 0 if start is None else max(self._day(start), 0)
+        hi = self.days if end is None else min(self._day(end) + 1, self.days)
+        if lo >= hi:
+            return empty
+
+        if hospital is None:
+            # Selected gender and condition slots; all of them (with the
+            # missing-value slot) when not filtered
+            genders = slice(None) if gender is None else _slots(self.genders, gender)
+            conditions = slice(None) if condition is None else _slots(self.conditions, condition)
+            counts = self.counts[lo:hi][:, genders][:, :, conditions].sum(axis=(1, 2))
+            billing = self.billing[lo:hi][:, genders][:, :, conditions].sum(axis=(1, 2))
+        else:
+            h = self.hospitals.get_indexer([hospital])[0]
+            a, b = np.searchsorted(self.cells['hospital'], [h, h + 1]) if h >= 0 else (0, 0)
+            day = self.cells['day'][a:b]
+            mask = (day >= lo) & (day < hi)
+            if gender is not None:
+                mask &= np.isin(self.cells['gender'][a:b], _slots(self.genders, gender))
+            counts = np.bincount(day[mask] - lo, self.cells['count'][a:b][mask], minlength=hi - lo)
+            billing = np.bincount(day[mask] - lo, self.cells['billing'][a:b][mask], minlength=hi - lo)
+
+        # Roll the days up into periods: sums between period boundaries
+        periods = pd.period_range(self.first_day + pd.Timedelta(days=lo), periods=hi - lo, freq='D').asfreq(freq)
+        starts = np.flatnonzero(np.r_[True, periods.asi8[1:] != periods.asi8[:-1]])
+        counts = np.add.reduceat(counts, starts).astype('int64')
+        billing = np.add.reduceat(billing, starts)
+        # Trimmed to the periods with admissions
+        nonzero = np.flatnonzero(counts)
+        if not len(nonzero):
+            return empty
+        keep = slice(nonzero[0], nonzero[-1] + 1)
+        return pd.DataFrame({'count': counts[keep], 'billing_amount_sum': billing[keep]},
+                            index=periods[starts][keep])
@@ -0,0 +1,166 @@
+"""Top-K selection over aggregates and heavy hitters over the admission stream.
+
+``top_k`` picks the K largest values of a per-group aggregate by partial
+selection, without sorting every group.
+
+``HeavyHitters`` keeps an approximate top-K of a key (e.g. room usage or
+billing per hospital) over an unbounded stream of batches, in fixed memory.
+It combines two summaries:
+
+- a weighted Space-Saving summary of ``capacity`` counters, whose estimates
+  overcount an item by at most its recorded error, itself at most
+  total / capacity;
+- a Count-Min sketch of ``depth`` x ``width`` cells, whose estimates
+  overcount by at most e / width * total with probability 1 - exp(-depth).
+
+A key's reported range is [Space-Saving estimate - error,
+min(Space-Saving estimate, Count-Min estimate)].
+"""
+import heapq
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_K = 10
+SS_CAPACITY = 1_000
+CM_WIDTH = 2 ** 11
+CM_DEPTH = 4
+
+
+def top_k(values, k=DEFAULT_K):
+    """The ``k`` largest entries of a Series, largest first.
+
+    Partial selection (O(n)) instead of a full sort; ties keep the order of
+    ``values``.
+    """
+    if len(values) <= k:
+        return values.sort_values(ascending=False, kind='stable')
+    data = values.to_numpy(dtype='float64')
+    data = np.where(np.isnan(data), -np.inf, data)
+    threshold = np.partition(data, len(data) - k)[len(data) - k]
+    above = np.flatnonzero(data > threshold)
+    ties = np.flatnonzero(data == threshold)[:k - len(above)]
+    chosen = np.concatenate([above, ties])
+    chosen = chosen[np.argsort(-data[chosen], kind='stable')]
+    return values.iloc[chosen]
+
+
+def _aggregate(keys, weights):
+    keys = pd.Series(np.asarray(keys))
+    if weights is None:
+        return keys.value_counts(dropna=True, sort=False).sort_index()
+    weights = pd.Series(np.nan_to_num(np.asarray(weights, dtype='float64')), index=keys.index)
+    return weights.groupby(keys, dropna=True, sort=True).sum()
+
+
+class SpaceSaving:
+    def __init__(self, capacity=SS_CAPACITY):
+        self.capacity = capacity
+        self.total = 0.0
+        self.counts = {}
+        self.errors = {}
+        # (count, key) min-heap; entries whose count is outdated are skipped
+        self._heap = []
+
+    def update(self, keys, weights=None):
+        """Add a batch of keys (with optional weights) to the summary."""
+        for key, weight in _aggregate(keys, weights).items():
+            self._add(key, float(weight))
+
+    def _add(self, key, weight):
+        self.total += weight
+        if key in self.counts:
+            self.counts[key] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = weight
+            self.errors[key] = 0.0
+        else:
+            floor, evicted = self._pop_min()
+            del self.counts[evicted], self.errors[evicted]
+            self.counts[key] = floor + weight
+            self.errors[key] = floor
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, k) for k, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                return count, key
+
+    @property
+    def bound(self):
+        """Largest possible overcount of any estimate."""
+        return self.total / self.capacity
+
+
+class CountMinSketch:
+    def __init__(self, width=CM_WIDTH, depth=CM_DEPTH, seed=0):
+        if width & (width - 1):
+            raise ValueError('width must be a power of two')
+        self.width = width
+        self.depth = depth
+        self.total = 0.0
+        self.table = np.zeros((depth, width))
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: odd multipliers, top bits of the product
+        self._multipliers = rng.integers(1, 2 ** 63, depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._shift = np.uint64(64 - int(math.log2(width)))
+
+    def _cells(self, keys):
+        hashed = pd.util.hash_array(np.asarray(keys, dtype=object))
+        return (hashed[None, :] * self._multipliers[:, None]) >> self._shift
+
+    def update(self, keys, weights=None):
+        batch = _aggregate(keys, weights)
+        cells = self._cells(batch.index.to_numpy()).astype(np.intp)
+        offsets = (np.arange(self.depth) * self.width)[:, None]
+        self.table += np.bincount(
+            (cells + offsets).ravel(), weights=np.tile(batch.to_numpy(), self.depth),
+            minlength=self.depth * self.width
+        ).reshape(self.depth, self.width)
+        self.total += float(batch.sum())
+
+    def estimate(self, keys):
+        cells = self._cells(keys).astype(np.intp)
+        return self.table[np.arange(self.depth)[:, None], cells].min(axis=0)
+
+    @property
+    def bound(self):
+        """Overcount exceeded with probability at most exp(-depth)."""
+        return math.e / self.width * self.total
+
+
+class HeavyHitters:
+    def __init__(self, capacity=SS_CAPACITY, width=CM_WIDTH, depth=CM_DEPTH):
+        self.summary = SpaceSaving(capacity)
+        self.sketch = CountMinSketch(width, depth)
+
+    def update(self, keys, weights=None):
+        keys = np.asarray(keys, dtype=object)
+        self.summary.update(keys, weights)
+        self.sketch.update(keys, weights)
+
+    @property
+    def total(self):
+        return self.summary.total
+
+    def top(self, k=DEFAULT_K):
+        """Estimated top ``k`` keys, largest first.
+
+        ``estimate`` is an upper bound on a key's true total and ``lower`` a
+        lower bound.
+        """
+        counts = pd.Series(self.summary.counts, dtype='float64').sort_index()
+        # Every counter is clipped to the sketch's estimate before ranking,
+        # so the keys are in the order of the estimates reported
+        estimates = np.minimum(counts.to_numpy(), self.sketch.estimate(counts.index.to_numpy()))
+        top = top_k(pd.Series(estimates, index=counts.index), k)
+        errors = pd.Series(self.summary.errors, dtype='float64')[top.index]
+        return pd.DataFrame({
+            'estimate': top.to_numpy(),
+            'lower': (counts[top.index] - errors).to_numpy(),
+        }, index=top.index)
@@ -0,0 +1,155 @@
+"""Background warm-up of the dashboard: data load and page aggregates.
+
+Started by the first script run of the server process. Stages run in a
+small thread pool:
+
+- ``summary``: the home page figures, read from three columns of the
+  Parquet dataset, so the home page can show them before the load finishes;
+- ``load``: the full store (dataset, cube, indexes);
+- one stage per analysis page, which computes that page's view for the
+  default filters once the store is loaded.
+
+Each stage's state and duration are kept for the status element and
+logged. With DASHBOARD_HEALTH_PORT set, ``GET /health`` on that port
+returns the same status as JSON: 200 once every stage has finished and
+the data is loaded, 503 otherwise.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger('warmup')
+if not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+
+WORKERS = 3
+HEALTH_PORT_ENV = 'DASHBOARD_HEALTH_PORT'
+
+
+class Warmup:
+    def __init__(self, load, summary=None, pages=None, workers=WORKERS):
+        """``load()`` returns the store, ``summary()`` the home figures and
+        ``pages`` maps a page name to a function of the store."""
+        self._load_fn = load
+        self._summary_fn = summary
+        self._pages = pages or {}
+        self.stages = {}
+        for name in (['summary'] if summary else []) + ['load'] + list(self._pages):
+            self.stages[name] = {'state': 'pending', 'seconds': None, 'error': None}
+        self.summary = None
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='warmup')
+        self._lock = threading.Lock()
+        self._started = None
+        self._load = None
+        self._summary = None
+
+    def start(self):
+        with self._lock:
+            if self._started is None:
+                self._started = time.perf_counter()
+                log.info('starting %s', ', '.join(self.stages))
+                if self._summary_fn:
+                    self._summary = self._pool.submit(self._run, 'summary', self._set_summary)
+                self._load = self._pool.submit(self._run, 'load', self._load_fn)
+                self._load.add_done_callback(self._warm_pages)
+        return self
+
+    def _set_summary(self):
+        self.summary = self._summary_fn()
+
+    def _warm_pages(self, future):
+        for name, fn in self._pages.items():
+            if future.exception() is None:
+                self._pool.submit(self._run, name, lambda fn=fn: fn(future.result()))
+            else:
+                self.stages[name].update(state='failed', error='load failed')
+
+    def _run(self, name, fn):
+        stage = self.stages[name]
+        stage['state'] = 'running'
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as exc:
+            stage['error'] = repr(exc)
+            stage['state'] = 'failed'
+            log.exception('stage %s failed after %.2fs', name, time.perf_counter() - start)
+            raise
+        finally:
+            stage['seconds'] = time.perf_counter() - start
+        stage['state'] = 'done'
+        log.info('stage %s done in %.2fs (%.2fs since start)', name, stage['seconds'],
+                 time.perf_counter() - self._started)
+        if self.ready:
+            log.info('ready in %.2fs', time.perf_counter() - self._started)
+        return result
+
+    def store(self, timeout=None):
+        """The loaded store, waiting for the load stage if necessary."""
+        return self.start()._load.result(timeout)
+
+    def partial(self, timeout=None):
+        """The home figures, waiting up to ``timeout`` seconds; None if not ready."""
+        if self.start()._summary is not None:
+            try:
+                self._summary.exception(timeout)
+            except TimeoutError:
+                pass
+        return self.summary
+
+    @property
+    def loaded(self):
+        return self.stages['load']['state'] == 'done'
+
+    @property
+    def ready(self):
+        return all(stage['state'] in ('done', 'failed') for stage in self.stages.values())
+
+    def status(self):
+        done = sum(stage['state'] == 'done' for stage in self.stages.values())
+        return {
+            'ready': self.ready,
+            'loaded': self.loaded,
+            'progress': done / len(self.stages),
+            'elapsed': time.perf_counter() - self._started if self._started else 0.0,
+            'stages': {name: dict(stage) for name, stage in self.stages.items()},
+        }
+
+    def serve_health(self, port=None):
+        """Serve ``GET /health`` in a daemon thread; port from the environment by default."""
+        port = port if port is not None else int(os.environ.get(HEALTH_PORT_ENV, 0))
+        if not port:
+            return None
+        warmup = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/health':
+                    self.send_error(404)
+                    return
+                status = warmup.status()
+                body = json.dumps(status).encode()
+                self.send_response(200 if status['ready'] and status['loaded'] else 503)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer(('', port), Handler)
+        except OSError as exc:
+            log.warning('health endpoint not started on port %s: %s', port, exc)
+            return None
+        threading.Thread(target=server.serve_forever, name='warmup-health', daemon=True).start()
+        log.info('health endpoint on port %s', server.server_port)
+        return server